@@ -0,0 +1,249 @@
+"""
+asyncio run mode for the Square to Google Sheets sync.
+
+The next order page is fetched while catalog objects for the current page are
+resolved, several locations are paged concurrently, catalog batch_get calls for
+a page run concurrently, and the Sheets write runs off the event loop.
+"""
+
+import asyncio
+import queue
+import sys
+import threading
+
+import square_orders
+from config import Config
+from rate_limit import SQUARE_REQUEST_OPTIONS, execute_async
+from run_metrics import httpx_async_event_hooks, metrics
+from square_orders import (
+    extract_order_data,
+    filter_changed_orders,
+    find_missing_modifiers,
+    find_missing_modifier_lists,
+    index_modifier_lists,
+    merge_catalog_results,
+    parse_catalog_result,
+    plan_catalog_fetch,
+    store_order_page,
+    trim_modifier_details
+)
+
+
+def create_async_client(search_connections=1):
+    """Create an AsyncSquare client backed by a pooled httpx.AsyncClient, with room for concurrent searches"""
+    import httpx
+    from square import AsyncSquare
+    from square.environment import SquareEnvironment
+
+    event_hooks = httpx_async_event_hooks('square')
+    if square_orders.response_capture is not None:
+        event_hooks['response'].append(square_orders.response_capture.on_response_async)
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=Config.CATALOG_MAX_WORKERS + search_connections,
+            max_keepalive_connections=Config.CATALOG_MAX_WORKERS + search_connections
+        ),
+        timeout=60,
+        event_hooks=event_hooks
+    )
+    async_client = AsyncSquare(
+        environment=SquareEnvironment.PRODUCTION,
+        token=Config.SQUARE_ACCESS_TOKEN,
+        base_url=Config.SQUARE_BASE_URL or None,
+        httpx_client=http_client
+    )
+    return async_client, http_client
+
+
+async def produce_order_pages(async_client, queue, page_size=None, query=None, location_id=None):
+    """Fetch one location's order pages following the cursor and put them on queue, then None"""
+    search_kwargs = {
+        'location_ids': [location_id or Config.SQUARE_LOCATION_ID],
+        'limit': page_size or square_orders.FETCH_LIMIT
+    }
+    if query:
+        search_kwargs['query'] = query
+
+    try:
+        while True:
+            # As in iter_order_pages(), a failed search fails the run rather than ending the stream early
+            try:
+                with metrics.span('orders_search'):
+                    result = await execute_async(
+                        'square.orders.search', async_client.orders.search,
+                        request_options=SQUARE_REQUEST_OPTIONS, **search_kwargs
+                    )
+            except Exception as e:
+                print(f"Error fetching orders: {e}", file=sys.stderr)
+                raise
+
+            if hasattr(result, 'errors') and result.errors:
+                raise RuntimeError(f"API returned errors: {result.errors}")
+
+            orders = result.orders if hasattr(result, 'orders') and result.orders else []
+            if orders:
+                metrics.add_rows('orders_fetched', len(orders))
+                square_orders.record_order_locations(orders)
+                await queue.put(orders)
+
+            cursor = result.cursor if hasattr(result, 'cursor') else None
+            if not cursor:
+                square_orders.completed_locations.add(search_kwargs['location_ids'][0])
+                return
+            search_kwargs['cursor'] = cursor
+    finally:
+        await queue.put(None)
+
+
+async def fetch_catalog_chunk_async(async_client, semaphore, catalog_version, object_ids, description):
+    """Make one batch_get call, holding a semaphore slot while it is in flight"""
+    async with semaphore:
+        try:
+            result = await execute_async(
+                'square.catalog.batch_get', async_client.catalog.batch_get,
+                object_ids=object_ids,
+                catalog_version=catalog_version,
+                request_options=SQUARE_REQUEST_OPTIONS
+            )
+            return parse_catalog_result(result, catalog_version)
+        except Exception as e:
+            print(f"Error fetching {description} for catalog version {catalog_version}: {e}", file=sys.stderr)
+            return []
+
+
+async def resolve_catalog_objects_async(async_client, semaphore, catalog_versions_dict, description='catalog objects'):
+    """Async counterpart of square_orders.resolve_catalog_objects()"""
+    resolved, tasks = plan_catalog_fetch(catalog_versions_dict)
+    # gather() keeps task order, so the merge matches the serial result
+    results = await asyncio.gather(*(
+        fetch_catalog_chunk_async(async_client, semaphore, catalog_version, chunk, description)
+        for catalog_version, chunk in tasks
+    ))
+    return merge_catalog_results(resolved, tasks, results)
+
+
+async def collect_order_rows(async_client, page_size=None, query=None, watermark=None, next_watermark=None,
+                             on_rows=None, location_ids=None):
+    """
+    Fetch, resolve and transform every order page, returning the order data rows
+
+    A queue with one slot per location lets the producers fetch their next
+    page while this coroutine resolves the current one, without buffering
+    more than one page per location. Each of location_ids (the configured
+    location by default) gets its own producer; pages already waiting are
+    merged and resolved together in one shared catalog step.
+    When a watermark is given, pages are filtered as in incremental mode.
+    When on_rows is given, each page's rows are awaited through it instead of
+    being collected, and an empty list is returned.
+    """
+    location_ids = location_ids or [Config.SQUARE_LOCATION_ID]
+    queue = asyncio.Queue(maxsize=len(location_ids))
+    semaphore = asyncio.Semaphore(Config.CATALOG_MAX_WORKERS)
+    producers = [
+        asyncio.create_task(produce_order_pages(async_client, queue, page_size, query, location_id))
+        for location_id in location_ids
+    ]
+    remaining = len(producers)
+
+    modifier_details = {}
+    modifier_list_details = {}
+    order_data = []
+
+    while remaining:
+        orders = []
+        page = await queue.get()
+        while True:
+            if page is None:
+                remaining -= 1
+            else:
+                orders.extend(page)
+            try:
+                page = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+        if not orders:
+            continue
+
+        if watermark is not None:
+            orders = filter_changed_orders(orders, watermark, next_watermark)
+            if not orders:
+                continue
+
+        with metrics.span('catalog_resolve'):
+            # Only look up modifiers that earlier pages have not already resolved
+            resolved = await resolve_catalog_objects_async(
+                async_client, semaphore, find_missing_modifiers(orders, modifier_details), 'modifier details'
+            )
+            for objects in resolved.values():
+                modifier_details.update(objects)
+
+            missing_lists = find_missing_modifier_lists(orders, modifier_details, modifier_list_details)
+            modifier_list_details.update(index_modifier_lists(await resolve_catalog_objects_async(
+                async_client, semaphore, missing_lists, 'modifier list details'
+            )))
+
+        with metrics.span('row_build'):
+            rows = extract_order_data(orders, modifier_details, modifier_list_details)
+        metrics.add_rows('rows_built', len(rows))
+        store_order_page(orders, modifier_details, modifier_list_details, rows)
+        trim_modifier_details(modifier_details)
+        if on_rows is None:
+            order_data.extend(rows)
+        else:
+            await on_rows(rows)
+
+    await asyncio.gather(*producers)
+    return order_data
+
+
+def stream_order_rows(query=None, watermark=None, next_watermark=None, max_pages=2, location_ids=None):
+    """
+    Yield order data rows from the async pipeline as each page is transformed
+
+    The pipeline runs on its own event loop in a background thread and hands
+    pages over through a queue of at most max_pages pages, so a slow consumer
+    (a CSV export, say) holds the pipeline back instead of letting rows pile up.
+    """
+    pages = queue.Queue(maxsize=max_pages)
+    done = object()
+    errors = []
+
+    async def run():
+        async_client, http_client = create_async_client(len(location_ids or [None]))
+        async with http_client:
+            await collect_order_rows(
+                async_client, query=query, watermark=watermark, next_watermark=next_watermark,
+                on_rows=lambda rows: asyncio.to_thread(pages.put, rows), location_ids=location_ids
+            )
+
+    def run_in_thread():
+        try:
+            asyncio.run(run())
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            pages.put(done)
+
+    threading.Thread(target=run_in_thread, daemon=True).start()
+    while True:
+        rows = pages.get()
+        if rows is done:
+            break
+        yield from rows
+    if errors:
+        raise errors[0]
+
+
+async def write_sheets_async(order_data, write_mode=None):
+    """
+    Write the data range and the LastUpdate timestamp without blocking the event loop
+
+    The Sheets client is synchronous, so the write runs on a thread with that
+    thread's cached service. The timestamp goes out in the same request as
+    the data, so it is only updated when the data write succeeds.
+    """
+    from google_sheets import write_to_google_sheet
+
+    write_kwargs = {'write_mode': write_mode} if write_mode else {}
+    return await asyncio.to_thread(write_to_google_sheet, order_data, log_update=True, **write_kwargs)
@@ -0,0 +1,248 @@
+"""
+Historical backfill of every order created in a date range.
+
+The range is split into shards of --shard-days days for each location. Each
+shard is its own orders.search, filtered and sorted on created_at and paged
+with its own cursor, and up to SQUARE_MAX_CONCURRENCY shards are fetched at
+once through the shared rate limiter. Pages from all shards go through the
+usual catalog resolution and row building into the order store, and outputs
+are read back from the store afterwards.
+
+Progress is checkpointed to BACKFILL_STATE_PATH once each page is in the
+store: the cursor each started shard continues from and the shards that are
+done. A run that is interrupted, or stopped by --time-limit, resumes from the
+checkpoint. Pages fetched again after a crash are upserted over the copies
+already stored. The checkpoint is removed when every shard is done and the
+output is written.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import square_orders
+from config import Config
+from rate_limit import SQUARE_REQUEST_OPTIONS, execute
+from run_metrics import metrics
+from square_orders import iter_concurrently, iter_order_rows, record_order_locations
+from sync_state import BackfillCheckpoint, load_backfill_checkpoint, save_backfill_checkpoint
+
+# Orders per backfill search page; SearchOrders allows up to 1000
+BACKFILL_PAGE_SIZE = 500
+
+DEFAULT_SHARD_DAYS = 30
+
+# Exit status of a backfill stopped by --time-limit before every shard was done
+BACKFILL_INCOMPLETE_EXIT = 3
+
+
+def parse_timestamp(value):
+    """Parse a date or RFC 3339 timestamp as an aware UTC datetime; a bare date is midnight UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def format_timestamp(value):
+    """Format a UTC datetime as an RFC 3339 timestamp for a search filter"""
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def plan_shards(since, until, shard_days):
+    """Split [since, until) into (start_at, end_at) ranges of shard_days days, the last one shorter"""
+    start, end = parse_timestamp(since), parse_timestamp(until)
+    step = timedelta(days=shard_days)
+    shards = []
+    while start < end:
+        shards.append((format_timestamp(start), format_timestamp(min(start + step, end))))
+        start += step
+    return shards
+
+
+def shard_key(location_id, start_at):
+    return f"{location_id} {start_at}"
+
+
+def build_created_range_query(start_at, end_at):
+    """Build a search query for orders created between start_at and end_at, oldest first"""
+    return {
+        'filter': {
+            'date_time_filter': {
+                'created_at': {'start_at': start_at, 'end_at': end_at}
+            }
+        },
+        # Square requires the sort field to match the date-time filter
+        'sort': {
+            'sort_field': 'CREATED_AT',
+            'sort_order': 'ASC'
+        }
+    }
+
+
+def iter_shard_pages(location_id, start_at, end_at, cursor=None, page_size=BACKFILL_PAGE_SIZE):
+    """
+    Yield (orders, next cursor) for each page of one location's orders created in [start_at, end_at)
+
+    The last page has no next cursor. Errors are raised rather than ending the
+    shard early, so a shard is never recorded as done with pages missing.
+    Orders exactly at end_at belong to the next shard and are dropped here.
+    """
+    start, end = parse_timestamp(start_at), parse_timestamp(end_at)
+    search_kwargs = {
+        'location_ids': [location_id],
+        'limit': page_size,
+        'query': build_created_range_query(start_at, end_at)
+    }
+    if cursor:
+        search_kwargs['cursor'] = cursor
+
+    while True:
+        try:
+            with metrics.span('orders_search'):
+                result = execute(
+                    'square.orders.search', square_orders.get_client().orders.search,
+                    request_options=SQUARE_REQUEST_OPTIONS, **search_kwargs
+                )
+        except Exception as e:
+            # A saved cursor may have expired between runs; start the shard over
+            if not cursor or search_kwargs.get('cursor') != cursor or getattr(e, 'status_code', None) != 400:
+                raise
+            print(f"Saved cursor for {location_id} from {start_at} was rejected, restarting the shard: {e}",
+                  file=sys.stderr)
+            del search_kwargs['cursor']
+            cursor = None
+            continue
+
+        if getattr(result, 'errors', None):
+            raise RuntimeError(f"API returned errors: {result.errors}")
+
+        orders = [
+            order for order in getattr(result, 'orders', None) or []
+            if not order.created_at or start <= parse_timestamp(order.created_at) < end
+        ]
+        if orders:
+            metrics.add_rows('orders_fetched', len(orders))
+            record_order_locations(orders)
+
+        next_cursor = getattr(result, 'cursor', None)
+        yield orders, next_cursor
+        if not next_cursor:
+            return
+        search_kwargs['cursor'] = next_cursor
+
+
+def iter_backfill_pages(checkpoint, path, page_size=BACKFILL_PAGE_SIZE, deadline=None):
+    """
+    Yield pages of orders for the checkpoint's unfinished shards, fetching shards concurrently
+
+    Each page's shard progress is saved to path when the consumer asks for the
+    next page, by which time iter_order_rows() has stored the page. Once
+    deadline (a time.monotonic() value) passes no further pages are taken;
+    shards still in flight continue from their saved cursor next run.
+    """
+    sources = []
+    for location_id in checkpoint.location_ids:
+        for start_at, end_at in plan_shards(checkpoint.since, checkpoint.until, checkpoint.shard_days):
+            key = shard_key(location_id, start_at)
+            if checkpoint.is_done(key):
+                continue
+            sources.append(
+                lambda key=key, location_id=location_id, start_at=start_at, end_at=end_at,
+                cursor=checkpoint.cursor(key): (
+                    (key, orders, next_cursor) for orders, next_cursor in
+                    iter_shard_pages(location_id, start_at, end_at, cursor, page_size)
+                )
+            )
+    if not sources:
+        return
+
+    for pages in iter_concurrently(sources, Config.SQUARE_MAX_CONCURRENCY):
+        orders = [order for _, page, _ in pages for order in page]
+        if orders:
+            yield orders
+        # Pages of one shard arrive in order, so its latest cursor wins
+        for key, _, next_cursor in pages:
+            checkpoint.advance(key, next_cursor)
+        save_backfill_checkpoint(path, checkpoint)
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+
+
+def count_shards(checkpoint):
+    """Return (shards done, total shards) for the checkpoint's range and locations"""
+    keys = [
+        shard_key(location_id, start_at)
+        for location_id in checkpoint.location_ids
+        for start_at, _ in plan_shards(checkpoint.since, checkpoint.until, checkpoint.shard_days)
+    ]
+    return sum(checkpoint.is_done(key) for key in keys), len(keys)
+
+
+def open_checkpoint(args, path, location_ids):
+    """
+    Return the checkpoint to run: the saved one if there is one, else a new one for args
+
+    Exits if the saved checkpoint is for a different range or set of locations,
+    since resuming it would not produce what was asked for.
+    """
+    checkpoint = load_backfill_checkpoint(path)
+    if checkpoint is None:
+        if not args.since:
+            print("backfill needs --since (no unfinished backfill to resume)", file=sys.stderr)
+            sys.exit(1)
+        until = args.until or format_timestamp(datetime.now(timezone.utc))
+        return BackfillCheckpoint(
+            format_timestamp(parse_timestamp(args.since)), format_timestamp(parse_timestamp(until)),
+            args.shard_days or DEFAULT_SHARD_DAYS, location_ids
+        )
+
+    requested = {
+        'since': args.since and format_timestamp(parse_timestamp(args.since)),
+        'until': args.until and format_timestamp(parse_timestamp(args.until)),
+        'shard_days': args.shard_days,
+        'location_ids': location_ids
+    }
+    saved = checkpoint.to_dict()
+    conflicts = [name for name, value in requested.items() if value and value != saved[name]]
+    if conflicts:
+        print(f"An unfinished backfill in {path} has a different {', '.join(conflicts)} "
+              f"({checkpoint.since} to {checkpoint.until} for {', '.join(checkpoint.location_ids)}). "
+              f"Run without those options to resume it, or delete {path} to start over.", file=sys.stderr)
+        sys.exit(1)
+    return checkpoint
+
+
+def run_backfill(args):
+    """
+    Fetch every order in the backfill range into the order store
+
+    Returns the checkpoint. It has every shard done unless --time-limit ran out first.
+    """
+    path = Config.BACKFILL_STATE_PATH
+    deadline = time.monotonic() + args.time_limit * 60 if args.time_limit else None
+    checkpoint = open_checkpoint(args, path, Config.location_ids())
+
+    done, total = count_shards(checkpoint)
+    print(f"Backfilling orders created from {checkpoint.since} to {checkpoint.until}: "
+          f"{total} shards of {checkpoint.shard_days} days, {done} already done", file=sys.stderr)
+    save_backfill_checkpoint(path, checkpoint)
+
+    # Pages are saved to the store as they are processed; outputs are read back from it
+    for _ in iter_order_rows(iter_backfill_pages(checkpoint, path, args.page_size or BACKFILL_PAGE_SIZE, deadline)):
+        pass
+    return checkpoint
+
+
+def finish_backfill(checkpoint):
+    """Remove the checkpoint of a completed backfill, or report how far an unfinished one got; True if complete"""
+    done, total = count_shards(checkpoint)
+    if done < total:
+        print(f"Backfill stopped at the time limit with {done} of {total} shards done. "
+              f"Run the same command again to resume.", file=sys.stderr)
+        return False
+    if os.path.exists(Config.BACKFILL_STATE_PATH):
+        os.remove(Config.BACKFILL_STATE_PATH)
+    print(f"Backfill complete: {total} shards", file=sys.stderr)
+    return True
@@ -0,0 +1,440 @@
+"""
+Benchmark suite for the Square order pipeline using synthetic orders built from mock_square_data.
+
+Each stage (modifier ID extraction, catalog resolution against a fake client
+with simulated latency, row extraction, CSV and Sheets row building) is timed
+separately and reported as throughput and peak traced memory.
+
+Run with: python benchmark.py [--orders 100 1000 10000] [--save-baseline PATH] [--baseline PATH]
+
+python benchmark.py --replay PATH times the same stages on orders and
+catalog objects recorded with square_orders.py --capture PATH.
+
+python benchmark.py --startup instead measures module import time in fresh
+interpreters with python -X importtime, and which heavy SDKs each import loads.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import os
+import time
+import tracemalloc
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_square_data import (
+    MockCatalogAPI,
+    MockCatalogObject,
+    MockLineItem,
+    MockModifier,
+    MockModifierData,
+    MockModifierListData,
+    MockMoney,
+    MockOrder
+)
+import rate_limit
+import square_orders
+from google_sheets import build_sheet_rows
+from square_orders import (
+    extract_modifier_list_ids,
+    extract_order_data,
+    get_modifier_details,
+    prefetch_modifier_list_details,
+    write_csv_to_stdout
+)
+
+FIRST_NAMES = ['John', 'Jane', 'Bob', 'Alice', 'Sam', 'Maria', 'Lee', 'Priya']
+LAST_NAMES = ['Smith', 'Doe', 'Garcia', 'Nguyen', 'Patel', 'Brown']
+RANKS = ['Scout', 'Tenderfoot', 'Second Class', 'First Class', 'Star', 'Life', 'Eagle']
+PATROLS = ['Eagle Patrol', 'Hawk Patrol', 'Wolf Patrol', 'Bear Patrol']
+
+# Imports timed by --startup, and the SDKs they should only load on first use
+STARTUP_IMPORTS = ['square_orders', 'google_sheets', 'async_pipeline', 'benchmark']
+HEAVY_MODULES = ['square', 'googleapiclient', 'google.oauth2', 'httpx', 'pydantic']
+
+
+def generate_workload(num_orders, modifiers_per_item=4, catalog_versions=1, seed=0):
+    """
+    Build synthetic orders and the catalog objects they reference
+
+    Returns (orders, modifier_details, modifier_list_details) in the shapes
+    extract_order_data() expects. Free-text answers use plain modifiers,
+    Rank and Patrol are picked from modifier lists, and orders are spread
+    evenly across catalog_versions versions.
+    """
+    rng = random.Random(seed)
+    modifier_details = {}
+    modifier_list_details = {}
+
+    def catalog_modifier(object_id, version, name, modifier_list_id=None):
+        if object_id not in modifier_details:
+            modifier_details[object_id] = MockCatalogObject(
+                id=object_id,
+                type='MODIFIER',
+                version=version,
+                modifier_data=MockModifierData(name=name, modifier_list_id=modifier_list_id)
+            )
+        return object_id
+
+    for version in range(1, catalog_versions + 1):
+        modifier_list_details[(version, 'LIST_RANK')] = MockCatalogObject(
+            id='LIST_RANK', type='MODIFIER_LIST', version=version,
+            modifier_list_data=MockModifierListData(name='Rank')
+        )
+        modifier_list_details[(version, 'LIST_PATROL')] = MockCatalogObject(
+            id='LIST_PATROL', type='MODIFIER_LIST', version=version,
+            modifier_list_data=MockModifierListData(name='Patrol: Troop 125')
+        )
+
+    free_text_questions = ['Scout Name', 'Emergency Contact', 'Emergency Contact Phone Number', 'Cell phone number']
+
+    orders = []
+    for order_number in range(num_orders):
+        version = order_number % catalog_versions + 1
+        modifiers = []
+        for modifier_number in range(modifiers_per_item):
+            uid = f'MOD_{order_number}_{modifier_number}'
+            kind = modifier_number % 6
+            if kind == 4:
+                rank = rng.choice(RANKS)
+                object_id = catalog_modifier(f'RANK_{rank}', version, rank, 'LIST_RANK')
+                modifiers.append(MockModifier(uid, rank, object_id))
+            elif kind == 5:
+                patrol = rng.choice(PATROLS)
+                object_id = catalog_modifier(f'PATROL_{patrol}', version, patrol, 'LIST_PATROL')
+                modifiers.append(MockModifier(uid, patrol, object_id))
+            else:
+                question = free_text_questions[kind]
+                answer = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+                name = f'{question}: {answer}'
+                object_id = catalog_modifier(f'TEXT_{order_number}_{modifier_number}', version, name)
+                modifiers.append(MockModifier(uid, name, object_id))
+
+        orders.append(MockOrder(
+            id=f'ORDER_{order_number}',
+            total_money=MockMoney(rng.choice([10000, 15000, 25000]), 'USD'),
+            line_items=[
+                MockLineItem(
+                    uid=f'LINE_ITEM_{order_number}_1',
+                    name='Camp Registration',
+                    catalog_object_id='CATALOG_ITEM_1',
+                    catalog_version=version,
+                    variation_name='Basic Registration',
+                    modifiers=modifiers
+                )
+            ]
+        ))
+
+    return orders, modifier_details, modifier_list_details
+
+
+class LatencyCatalogAPI(MockCatalogAPI):
+    """MockCatalogAPI that sleeps for latency seconds per batch_get, like a remote call"""
+    def __init__(self, objects, latency):
+        super().__init__(objects=objects)
+        self.latency = latency
+
+    def batch_get(self, object_ids, catalog_version=None, **kwargs):
+        time.sleep(self.latency)
+        return super().batch_get(object_ids=object_ids, catalog_version=catalog_version)
+
+
+class FakeSquareClient:
+    """Square client stand-in whose catalog serves a generated workload"""
+    def __init__(self, catalog_objects, latency):
+        self.catalog = LatencyCatalogAPI(catalog_objects, latency)
+
+
+def resolve_catalog(orders, catalog_objects, latency):
+    """
+    Run the catalog resolution stage against a fake client with the given latency
+
+    The rate limiter's token buckets are switched off for the stage, so it
+    measures the pipeline rather than waiting on the process-wide request rate.
+    """
+    original_client = square_orders.client
+    original_cache = square_orders.catalog_cache
+    original_buckets = {name: policy.bucket for name, policy in rate_limit.ENDPOINTS.items()}
+    square_orders.client = FakeSquareClient(catalog_objects, latency)
+    square_orders.catalog_cache = None
+    for policy in rate_limit.ENDPOINTS.values():
+        policy.bucket = None
+    try:
+        modifier_details = get_modifier_details(extract_modifier_list_ids(orders))
+        modifier_list_details = prefetch_modifier_list_details(orders, modifier_details)
+        return modifier_details, modifier_list_details, len(square_orders.client.catalog.calls)
+    finally:
+        square_orders.client = original_client
+        square_orders.catalog_cache = original_cache
+        for name, bucket in original_buckets.items():
+            rate_limit.ENDPOINTS[name].bucket = bucket
+
+
+def write_csv(order_data):
+    """Run write_csv_to_stdout() into an in-memory buffer"""
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        write_csv_to_stdout(order_data)
+    return buffer.tell()
+
+
+def measure(stage, trace_memory, repeat=3):
+    """Run stage() and return (result, best seconds over repeat runs, peak traced bytes or None)"""
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        run_time = time.perf_counter() - start
+        elapsed = run_time if elapsed is None else min(elapsed, run_time)
+
+    peak = None
+    if trace_memory:
+        # Tracing slows Python down a lot, so memory is measured in a second run
+        gc.collect()
+        tracemalloc.start()
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def record_stage(stages, name, stage, trace_memory, repeat, items=None):
+    """
+    Measure stage() and store its timings in stages[name]; returns the stage result
+
+    items is the number of items processed, or a function of the result
+    giving it; by default the length of the result.
+    """
+    result, elapsed, peak = measure(stage, trace_memory, repeat)
+    if items is None:
+        items = len(result)
+    elif callable(items):
+        items = items(result)
+    stages[name] = {
+        'seconds': round(elapsed, 6),
+        'items': items,
+        'items_per_sec': round(items / elapsed, 1) if elapsed else None,
+        'peak_bytes': peak
+    }
+    return result
+
+
+def run_workload(num_orders, modifiers_per_item, catalog_versions, latency, trace_memory=True, repeat=3):
+    """Time each pipeline stage on one synthetic workload and return the results"""
+    orders, modifier_details, modifier_list_details = generate_workload(
+        num_orders, modifiers_per_item, catalog_versions
+    )
+    catalog_objects = list(modifier_details.values()) + list({
+        obj.id: obj for obj in modifier_list_details.values()
+    }.values())
+
+    stages = {}
+
+    def record(name, stage, items=None):
+        return record_stage(stages, name, stage, trace_memory, repeat, items)
+
+    record('extract_modifier_list_ids', lambda: extract_modifier_list_ids(orders), num_orders)
+    resolved = record(
+        'catalog_resolution',
+        lambda: resolve_catalog(orders, catalog_objects, latency),
+        len(modifier_details)
+    )
+    stages['catalog_resolution']['api_calls'] = resolved[2]
+    order_data = record(
+        'extract_order_data',
+        lambda: extract_order_data(orders, resolved[0], resolved[1])
+    )
+    record('csv_rows', lambda: write_csv(order_data), len(order_data))
+    record('sheets_rows', lambda: build_sheet_rows(order_data), len(order_data))
+
+    return {
+        'orders': num_orders,
+        'modifiers_per_item': modifiers_per_item,
+        'catalog_versions': catalog_versions,
+        'catalog_latency_ms': latency * 1000,
+        'stages': stages
+    }
+
+
+def run_replay(path, trace_memory=True, repeat=3):
+    """Time decoding a --capture file and each pipeline stage on the orders it holds"""
+    from response_capture import iter_captured_order_pages, load_captured_catalog
+
+    stages = {}
+
+    def record(name, stage, items=None):
+        return record_stage(stages, name, stage, trace_memory, repeat, items)
+
+    pages = record(
+        'replay_orders', lambda: list(iter_captured_order_pages(path)),
+        lambda pages: sum(len(page) for page in pages)
+    )
+    orders = [order for page in pages for order in page]
+    modifier_details, modifier_list_details = record(
+        'replay_catalog', lambda: load_captured_catalog(path),
+        lambda catalog: len(catalog[0]) + len(catalog[1])
+    )
+
+    record('extract_modifier_list_ids', lambda: extract_modifier_list_ids(orders), len(orders))
+    order_data = record(
+        'extract_order_data',
+        lambda: extract_order_data(orders, modifier_details, modifier_list_details)
+    )
+    record('csv_rows', lambda: write_csv(order_data), len(order_data))
+    record('sheets_rows', lambda: build_sheet_rows(order_data), len(order_data))
+
+    return {'capture': os.path.basename(path), 'orders': len(orders), 'stages': stages}
+
+
+def workload_key(result):
+    if 'capture' in result:
+        return result['capture']
+    return f"{result['orders']}x{result['modifiers_per_item']}x{result['catalog_versions']}"
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Print throughput changes against a baseline and return the regressed stages"""
+    baseline_by_key = {workload_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+
+    for result in results:
+        previous = baseline_by_key.get(workload_key(result))
+        if not previous:
+            continue
+        for stage, metrics in result['stages'].items():
+            old = previous['stages'].get(stage, {}).get('items_per_sec')
+            new = metrics['items_per_sec']
+            if not old or not new:
+                continue
+            change = (new - old) / old
+            marker = ''
+            if change < -tolerance:
+                marker = '  <-- regression'
+                regressions.append((workload_key(result), stage, change))
+            print(f"  {workload_key(result):>16} {stage:<26} {change:+7.1%}{marker}")
+
+    return regressions
+
+
+def print_results(results):
+    print(f"{'workload':>16} {'stage':<26} {'items/sec':>14} {'seconds':>9} {'peak MiB':>9}")
+    for result in results:
+        for stage, metrics in result['stages'].items():
+            peak = metrics['peak_bytes']
+            peak_text = f"{peak / (1024 * 1024):9.1f}" if peak is not None else f"{'-':>9}"
+            print(f"{workload_key(result):>16} {stage:<26} {metrics['items_per_sec'] or 0:14,.0f} "
+                  f"{metrics['seconds']:9.3f} {peak_text}")
+
+
+def measure_import(module, repeat=3):
+    """
+    Import module in fresh interpreters under python -X importtime
+
+    Returns (best cumulative import seconds, heavy modules it loaded). A first
+    untimed run warms the bytecode cache.
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    command = [sys.executable, '-X', 'importtime', '-c', code]
+    directory = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run(command, cwd=directory, capture_output=True, check=True)
+
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(command, cwd=directory, capture_output=True, text=True, check=True)
+        # Lines look like "import time: self [us] | cumulative | name", nested names indented
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2] == f" {module}":
+                seconds = int(fields[1]) / 1e6
+                best = seconds if best is None else min(best, seconds)
+    return best, result.stdout.split()
+
+
+def measure_startup(repeat=3):
+    """Return {module: {'seconds': ..., 'heavy_modules': [...]}} for STARTUP_IMPORTS"""
+    results = {}
+    for module in STARTUP_IMPORTS:
+        seconds, heavy_modules = measure_import(module, repeat)
+        results[module] = {'seconds': round(seconds, 6), 'heavy_modules': heavy_modules}
+    return results
+
+
+def print_startup(results):
+    print(f"{'import':<16} {'ms':>8}  heavy modules loaded")
+    for module, result in results.items():
+        print(f"{module:<16} {result['seconds'] * 1000:8.1f}  {' '.join(result['heavy_modules']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Square order pipeline stages')
+    parser.add_argument('--orders', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Order counts to benchmark, e.g. --orders 100 1000000')
+    parser.add_argument('--modifiers', type=int, nargs='+', default=[6],
+                        help='Modifiers per line item')
+    parser.add_argument('--catalog-versions', type=int, nargs='+', default=[1, 5],
+                        help='Number of catalog versions the orders are spread across')
+    parser.add_argument('--catalog-latency-ms', type=float, default=20,
+                        help='Simulated latency of each catalog batch_get call')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per stage; the fastest is reported')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc pass that measures peak memory')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='Write the results to PATH as the new baseline')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='Compare throughput against a baseline written by --save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Fractional slowdown against the baseline that counts as a regression')
+    parser.add_argument('--replay', metavar='PATH', nargs='+',
+                        help='Benchmark orders recorded with square_orders.py --capture instead of synthetic ones')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure import time of the pipeline modules instead of the pipeline stages')
+    args = parser.parse_args()
+
+    if args.startup:
+        print_startup(measure_startup(args.repeat))
+        return
+
+    results = []
+    for path in args.replay or []:
+        results.append(run_replay(path, trace_memory=not args.no_memory, repeat=args.repeat))
+    for num_orders in [] if args.replay else args.orders:
+        for modifiers_per_item in args.modifiers:
+            for catalog_versions in args.catalog_versions:
+                results.append(run_workload(
+                    num_orders, modifiers_per_item, catalog_versions,
+                    args.catalog_latency_ms / 1000,
+                    trace_memory=not args.no_memory, repeat=args.repeat
+                ))
+
+    print_results(results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nThroughput change against {args.baseline}:")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'results': results}, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import time
+from types import SimpleNamespace
+
+
+def serialize_catalog_object(obj):
+    """Reduce a catalog object to the fields the order pipeline reads"""
+    modifier_data = getattr(obj, 'modifier_data', None)
+    modifier_list_data = getattr(obj, 'modifier_list_data', None)
+
+    data = {
+        'id': obj.id,
+        'type': getattr(obj, 'type', None),
+        'version': getattr(obj, 'version', None),
+        'modifier_data': None,
+        'modifier_list_data': None
+    }
+    if modifier_data is not None:
+        data['modifier_data'] = {
+            'name': getattr(modifier_data, 'name', None),
+            'modifier_list_id': getattr(modifier_data, 'modifier_list_id', None)
+        }
+    if modifier_list_data is not None:
+        data['modifier_list_data'] = {
+            'name': getattr(modifier_list_data, 'name', None)
+        }
+    return json.dumps(data, separators=(',', ':'))
+
+
+def deserialize_catalog_object(payload):
+    """Rebuild a lightweight catalog object from serialize_catalog_object() output"""
+    data = json.loads(payload)
+    if data['modifier_data'] is not None:
+        data['modifier_data'] = SimpleNamespace(**data['modifier_data'])
+    if data['modifier_list_data'] is not None:
+        data['modifier_list_data'] = SimpleNamespace(**data['modifier_list_data'])
+    return SimpleNamespace(**data)
+
+
+class CatalogCache:
+    """
+    Persistent SQLite cache of catalog objects keyed by (object_id, catalog_version)
+
+    Catalog objects never change once a catalog version is published, so entries
+    never go stale. The cache is trimmed to max_bytes by evicting the least
+    recently used entries. When persist is False the file is removed on close.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, persist=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        # The --async pipeline uses the cache from its event loop thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS catalog_objects ('
+            ' object_id TEXT NOT NULL,'
+            ' catalog_version INTEGER NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (object_id, catalog_version))'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_catalog_objects_last_used ON catalog_objects (last_used)'
+        )
+        self.conn.commit()
+
+    def get_many(self, catalog_version, object_ids):
+        """Return {object_id: obj} for the IDs found at catalog_version"""
+        found = {}
+        if catalog_version is None or not object_ids:
+            return found
+
+        now = time.time()
+        unique_object_ids = list(dict.fromkeys(object_ids))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique_object_ids), 500):
+            chunk = unique_object_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT object_id, payload FROM catalog_objects'
+                f' WHERE catalog_version = ? AND object_id IN ({placeholders})',
+                [catalog_version, *chunk]
+            ).fetchall()
+            for object_id, payload in rows:
+                found[object_id] = deserialize_catalog_object(payload)
+            self.conn.executemany(
+                'UPDATE catalog_objects SET last_used = ? WHERE object_id = ? AND catalog_version = ?',
+                [(now, object_id, catalog_version) for object_id, _ in rows]
+            )
+        self.conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique_object_ids) - len(found)
+        return found
+
+    def put_many(self, catalog_version, objects):
+        """Store catalog objects fetched at catalog_version"""
+        if catalog_version is None:
+            return
+
+        now = time.time()
+        rows = []
+        for obj in objects:
+            payload = serialize_catalog_object(obj)
+            rows.append((obj.id, catalog_version, payload, len(payload), now))
+        if not rows:
+            return
+
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO catalog_objects'
+            ' (object_id, catalog_version, payload, size, last_used) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+        self.evict()
+        self.conn.commit()
+
+    def size(self):
+        """Total payload bytes currently stored"""
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM catalog_objects').fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = 0
+        rows = self.conn.execute(
+            'SELECT object_id, catalog_version, size FROM catalog_objects ORDER BY last_used'
+        ).fetchall()
+        doomed = []
+        for object_id, catalog_version, size in rows:
+            if evicted >= excess:
+                break
+            doomed.append((object_id, catalog_version))
+            evicted += size
+        self.conn.executemany(
+            'DELETE FROM catalog_objects WHERE object_id = ? AND catalog_version = ?',
+            doomed
+        )
+
+    def close(self):
+        """Close the database, removing the file unless the cache should persist"""
+        self.conn.close()
+        if not self.persist and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,149 @@
+"""
+Index of the current catalog's modifiers and modifier lists.
+
+Resolving modifiers from orders takes batch_get calls whose number depends on
+the orders. With --prewarm-catalog every MODIFIER and MODIFIER_LIST object is
+listed once, in paginated ListCatalog calls, into this index: object ID to
+name and modifier_list_id, plus each modifier list's modifiers. The index is
+saved to CATALOG_INDEX_PATH and later runs load it.
+
+Orders reference the catalog version they were placed at. An indexed object
+answers for catalog version C when its own version is at most C and C is at
+most the newest version the index has seen. Any later change to the object
+would carry a newer version, so the object was unchanged at C. Item
+variations are listed alongside, only for their versions, so orders for an
+item edited after the last modifier change still fall within the index.
+Other versions, and objects created or deleted since the index was built,
+are misses and are fetched with targeted batch_get calls as before.
+"""
+
+import json
+import os
+import sys
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sync_state import write_json_atomic
+
+# Catalog object types held in the index; other listed objects only advance its catalog version
+INDEXED_TYPES = ('MODIFIER', 'MODIFIER_LIST')
+
+
+def index_entry(obj):
+    """Return (id, type, version, name, modifier_list_id) for a catalog object"""
+    modifier_data = getattr(obj, 'modifier_data', None)
+    modifier_list_data = getattr(obj, 'modifier_list_data', None)
+    data = modifier_data if modifier_data is not None else modifier_list_data
+    return (
+        obj.id,
+        getattr(obj, 'type', None),
+        getattr(obj, 'version', None),
+        getattr(data, 'name', None),
+        getattr(modifier_data, 'modifier_list_id', None)
+    )
+
+
+def entry_object(entry):
+    """Rebuild a lightweight catalog object, shaped like the SDK's, from an index entry"""
+    object_id, object_type, version, name, modifier_list_id = entry
+    obj = SimpleNamespace(id=object_id, type=object_type, version=version,
+                          modifier_data=None, modifier_list_data=None)
+    if object_type == 'MODIFIER_LIST':
+        obj.modifier_list_data = SimpleNamespace(name=name)
+    else:
+        obj.modifier_data = SimpleNamespace(name=name, modifier_list_id=modifier_list_id)
+    return obj
+
+
+class CatalogIndex:
+    """
+    In-memory index of modifier and modifier list objects by ID
+
+    catalog_version is the newest object version seen while building it,
+    item variations included. The reverse index maps each modifier list ID
+    to the IDs of its modifiers.
+    """
+
+    def __init__(self, entries=(), catalog_version=None):
+        self.objects = {}
+        self.entries = {}
+        self.list_modifiers = defaultdict(list)
+        self.catalog_version = catalog_version
+        self.hits = 0
+        self.misses = 0
+        for entry in entries:
+            self.add_entry(tuple(entry))
+
+    def add_entry(self, entry):
+        object_id, _, version, _, modifier_list_id = entry
+        if object_id in self.entries:
+            return
+        self.entries[object_id] = entry
+        self.objects[object_id] = entry_object(entry)
+        if modifier_list_id:
+            self.list_modifiers[modifier_list_id].append(object_id)
+        self.add_version(version)
+
+    def add_version(self, version):
+        """Record that the catalog had reached version when the index was built"""
+        if version is not None and (self.catalog_version is None or version > self.catalog_version):
+            self.catalog_version = version
+
+    def add(self, obj):
+        """Index a listed catalog object, and the modifiers nested in a modifier list"""
+        if getattr(obj, 'type', None) not in INDEXED_TYPES:
+            self.add_version(getattr(obj, 'version', None))
+            return
+        self.add_entry(index_entry(obj))
+        modifier_list_data = getattr(obj, 'modifier_list_data', None)
+        for modifier in getattr(modifier_list_data, 'modifiers', None) or []:
+            self.add_entry(index_entry(modifier))
+
+    def is_current_at(self, obj, catalog_version):
+        """Return True if obj is the object as it was at catalog_version"""
+        if catalog_version is None:
+            # No version means the current catalog, which the index was built from
+            return True
+        if obj.version is None or self.catalog_version is None:
+            return False
+        return obj.version <= catalog_version <= self.catalog_version
+
+    def get_many(self, catalog_version, object_ids):
+        """Return {object_id: obj} for the IDs the index can answer at catalog_version"""
+        found = {}
+        for object_id in dict.fromkeys(object_ids):
+            obj = self.objects.get(object_id)
+            if obj is not None and self.is_current_at(obj, catalog_version):
+                found[object_id] = obj
+            else:
+                self.misses += 1
+        self.hits += len(found)
+        return found
+
+    def modifiers_in_list(self, modifier_list_id):
+        """Return the indexed modifiers of a modifier list"""
+        return [self.objects[object_id] for object_id in self.list_modifiers.get(modifier_list_id, [])]
+
+    def to_dict(self):
+        return {
+            'catalog_version': self.catalog_version,
+            'objects': [list(entry) for entry in self.entries.values()]
+        }
+
+
+def load_catalog_index(path):
+    """Load a saved catalog index, or None if there is none"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return CatalogIndex(data['objects'], data['catalog_version'])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading catalog index from {path}, resolving the catalog by ID: {e}", file=sys.stderr)
+        return None
+
+
+def save_catalog_index(path, index):
+    """Atomically persist the catalog index"""
+    write_json_atomic(path, index.to_dict())
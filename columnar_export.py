@@ -0,0 +1,154 @@
+"""
+Columnar export of order data rows to Parquet or Arrow IPC files.
+
+Columns follow the CSV output schema, but typed: the order total becomes
+integer cents plus a currency code, and values that repeat across
+registrations (line item, rank, patrol, travel plans, currency) are
+dictionary-encoded. Rows are written in record batches as they arrive.
+
+pyarrow is an optional dependency, imported only when a columnar format is
+requested.
+"""
+
+import sys
+
+# Rows buffered per record batch (and Parquet row group)
+BATCH_ROWS = 10000
+
+# Output columns, in order; 'name' and 'patrol' carry the same defaults as the CSV
+COLUMNS = (
+    'order_id', 'total_money', 'currency', 'line_item_name', 'name', 'rank', 'patrol',
+    'emergency_contact', 'emergency_contact_phone', 'cell_phone', 'travel_to_campout'
+)
+
+# Low-cardinality columns stored as dictionary indices
+DICTIONARY_COLUMNS = ('currency', 'line_item_name', 'rank', 'patrol', 'travel_to_campout')
+
+FORMATS = ('parquet', 'arrow')
+
+
+def require_pyarrow():
+    """Exit with an error if pyarrow is not installed"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("Error: pyarrow is required for parquet and arrow output (pip install pyarrow)", file=sys.stderr)
+        sys.exit(1)
+
+
+def parse_money(total_money):
+    """Split an order total such as '15000 USD' into (15000, 'USD'); amounts are in cents"""
+    amount, _, currency = total_money.partition(' ')
+    return int(amount), currency
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    types = {column: pa.string() for column in COLUMNS}
+    types['total_money'] = pa.int64()
+    for column in DICTIONARY_COLUMNS:
+        types[column] = dictionary
+    return pa.schema([pa.field(column, types[column], nullable=False) for column in COLUMNS])
+
+
+class DictionaryEncoder:
+    """
+    Dictionary-encode one column across record batches
+
+    The dictionary only ever grows, so each batch's dictionary extends the
+    previous one; Arrow IPC files accept that as a delta, not a replacement.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def encode(self, values):
+        import pyarrow as pa
+
+        index = self.index
+        indices = []
+        for value in values:
+            try:
+                indices.append(index[value])
+            except KeyError:
+                index[value] = len(self.values)
+                indices.append(len(self.values))
+                self.values.append(value)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, pa.string()))
+
+
+class ColumnarWriter:
+    """Buffer order data rows into record batches and write them to a Parquet or Arrow IPC file"""
+
+    def __init__(self, path, format='parquet', batch_rows=None):
+        import pyarrow as pa
+
+        if format not in FORMATS:
+            raise ValueError(f"Unknown columnar format '{format}'")
+        self.schema = arrow_schema()
+        self.batch_rows = batch_rows or BATCH_ROWS
+        self.encoders = {column: DictionaryEncoder() for column in DICTIONARY_COLUMNS}
+        self.pending = []
+        # Order totals repeat, so each distinct string is parsed once
+        self.money = {}
+        self.rows_written = 0
+
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            # Left uncompressed so readers can memory-map the file and scan it in place
+            self.writer = pa.ipc.new_file(
+                path, self.schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            )
+
+    def write_rows(self, rows):
+        pending = self.pending
+        for row in rows:
+            pending.append(row.output_values())
+            if len(pending) >= self.batch_rows:
+                self.flush()
+
+    def flush(self):
+        import pyarrow as pa
+
+        if not self.pending:
+            return
+        # Transpose the buffered rows (in output_values() order) into columns
+        order_ids, totals, *others = zip(*self.pending)
+        money = self.money
+        for total in set(totals) - money.keys():
+            money[total] = parse_money(total)
+        values = {
+            'order_id': order_ids,
+            'total_money': [money[total][0] for total in totals],
+            'currency': [money[total][1] for total in totals]
+        }
+        values.update(zip(COLUMNS[3:], others))
+
+        arrays = []
+        for field in self.schema:
+            if field.name in self.encoders:
+                arrays.append(self.encoders[field.name].encode(values[field.name]))
+            else:
+                arrays.append(pa.array(values[field.name], field.type))
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows_written += len(self.pending)
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def write_columnar(order_data, path, format='parquet', batch_rows=None):
+    """Write order data rows to a Parquet or Arrow IPC file; returns the number of rows"""
+    writer = ColumnarWriter(path, format, batch_rows)
+    try:
+        writer.write_rows(order_data)
+    finally:
+        writer.close()
+    return writer.rows_written
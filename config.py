@@ -1,32 +1,98 @@
 import os
 import sys
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+
+def find_env_file():
+    """Return the path of the nearest .env file in this directory or a parent, or None"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Load environment variables from .env file; python-dotenv is only imported when there is one
+env_file = find_env_file()
+if env_file:
+    from dotenv import load_dotenv
+    load_dotenv(env_file)
 
 class Config:
     """Configuration management for Square and Google Sheets integration"""
 
     # Square API Configuration
     SQUARE_ACCESS_TOKEN = os.getenv('SQUARE_ACCESS_TOKEN', '')
-    SQUARE_LOCATION_ID = os.getenv('SQUARE_LOCATION_ID', '')
-    SQUARE_FETCH_LIMIT = int(os.getenv('SQUARE_FETCH_LIMIT', '70'))
+    SQUARE_LOCATION_ID = os.getenv('SQUARE_LOCATION_ID', '')  # one location ID, or several separated by commas
+    SQUARE_FETCH_LIMIT = int(os.getenv('SQUARE_FETCH_LIMIT', '70'))  # orders per search page
+    SQUARE_BASE_URL = os.getenv('SQUARE_BASE_URL', '')  # overrides production, e.g. fake_api_server.py
+
+    # Request rate, concurrency and retry limits shared by all API calls
+    SQUARE_MAX_QPS = float(os.getenv('SQUARE_MAX_QPS', '10'))
+    SQUARE_MAX_CONCURRENCY = int(os.getenv('SQUARE_MAX_CONCURRENCY', '4'))
+    SHEETS_MAX_QPS = float(os.getenv('SHEETS_MAX_QPS', '1'))
+    SHEETS_MAX_CONCURRENCY = int(os.getenv('SHEETS_MAX_CONCURRENCY', '2'))
+    API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '5'))
+
+    # Maximum concurrent catalog batch_get requests
+    CATALOG_MAX_WORKERS = int(os.getenv('CATALOG_MAX_WORKERS', '4'))
+
+    # Catalog cache Configuration (empty path disables the cache)
+    CATALOG_CACHE_PATH = os.getenv('CATALOG_CACHE_PATH', '.catalog_cache.sqlite')
+    CATALOG_CACHE_MAX_MB = int(os.getenv('CATALOG_CACHE_MAX_MB', '50'))
+    CATALOG_CACHE_PERSIST = os.getenv('CATALOG_CACHE_PERSIST', 'true').lower() == 'true'
+
+    # Index of every current modifier and modifier list, built with --prewarm-catalog (empty disables it)
+    CATALOG_INDEX_PATH = os.getenv('CATALOG_INDEX_PATH', '.catalog_index.json')
+
+    # Optional JSON file of modifier-to-column rules (built-in rules when empty)
+    MODIFIER_RULES_FILE = os.getenv('MODIFIER_RULES_FILE', '')
+
+    # Worker processes for rebuilding stored rows (--from-store); 1 rebuilds in-process, 0 uses one per CPU
+    TRANSFORM_WORKERS = int(os.getenv('TRANSFORM_WORKERS', '1'))
+
+    # Incremental sync state file (stores the updated_at watermark)
+    SYNC_STATE_PATH = os.getenv('SYNC_STATE_PATH', '.sync_state.json')
+
+    # Checkpoint of an unfinished backfill (shard cursors), removed when the backfill completes
+    BACKFILL_STATE_PATH = os.getenv('BACKFILL_STATE_PATH', '.backfill_state.json')
+
+    # Local SQLite store of synced orders that outputs are generated from (empty disables it)
+    ORDER_STORE_PATH = os.getenv('ORDER_STORE_PATH', '.order_store.sqlite')
+
+    # Run report outputs (JSON report and Prometheus textfile); empty disables each
+    METRICS_REPORT_PATH = os.getenv('METRICS_REPORT_PATH', '')
+    METRICS_PROMETHEUS_PATH = os.getenv('METRICS_PROMETHEUS_PATH', '')
 
     # Google Sheets Configuration
     GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID', '')
     GOOGLE_CREDENTIALS_JSON = os.getenv('GOOGLE_CREDENTIALS_JSON', '')
+    SHEETS_API_ENDPOINT = os.getenv('SHEETS_API_ENDPOINT', '')  # overrides sheets.googleapis.com
     SHEET_NAME = os.getenv('SHEET_NAME', 'Sheet1')
-    WRITE_MODE = os.getenv('WRITE_MODE', 'overwrite')  # 'overwrite' or 'append'
+    WRITE_MODE = os.getenv('WRITE_MODE', 'overwrite')  # 'overwrite', 'append' or 'upsert'
+
+    # Optional file of digests of the tables last written to each tab; overwrites then skip unchanged rows
+    SHEET_DIGEST_PATH = os.getenv('SHEET_DIGEST_PATH', '')
+
+    # Optional JSON file routing each location's rows to its own sheet/tab (all rows go to SHEET_NAME when empty)
+    LOCATION_ROUTES_FILE = os.getenv('LOCATION_ROUTES_FILE', '')
+
+    @classmethod
+    def location_ids(cls):
+        """Return the configured Square location IDs as a list"""
+        return [location_id.strip() for location_id in cls.SQUARE_LOCATION_ID.split(',') if location_id.strip()]
 
     @classmethod
     def validate_square_config(cls):
         """Validate required Square API configuration"""
         if not cls.SQUARE_ACCESS_TOKEN:
-            print("Error: SQUARE_ACCESS_TOKEN is required")
+            print("Error: SQUARE_ACCESS_TOKEN is required", file=sys.stderr)
             sys.exit(1)
-        if not cls.SQUARE_LOCATION_ID:
-            print("Error: SQUARE_LOCATION_ID is required")
+        if not cls.location_ids():
+            print("Error: SQUARE_LOCATION_ID is required", file=sys.stderr)
             sys.exit(1)
 
     @classmethod
@@ -35,9 +101,9 @@ class Config:
         if not cls.GOOGLE_SHEET_ID:
             print("Error: GOOGLE_SHEET_ID environment variable is required for Google Sheets output")
             sys.exit(1)
-        if not cls.GOOGLE_CREDENTIALS_JSON:
+        if not cls.GOOGLE_CREDENTIALS_JSON and not cls.SHEETS_API_ENDPOINT:
             print("Error: GOOGLE_CREDENTIALS_JSON environment variable is required for Google Sheets output")
             sys.exit(1)
-        if cls.WRITE_MODE not in ['overwrite', 'append']:
-            print(f"Error: WRITE_MODE must be 'overwrite' or 'append', got '{cls.WRITE_MODE}'")
+        if cls.WRITE_MODE not in ['overwrite', 'append', 'upsert']:
+            print(f"Error: WRITE_MODE must be 'overwrite', 'append' or 'upsert', got '{cls.WRITE_MODE}'")
             sys.exit(1)
@@ -0,0 +1,80 @@
+"""
+Streaming CSV export of order data rows to stdout or a file, optionally gzip-compressed.
+
+Rows are written as they are produced, so memory use does not grow with the
+number of orders exported.
+"""
+
+import csv
+import gzip
+import io
+import sys
+
+from order_row import OUTPUT_HEADERS
+
+# Write buffer for file output
+BUFFER_SIZE = 1024 * 1024
+
+
+def open_csv_output(path=None, compress=None):
+    """
+    Open a text stream for CSV output
+
+    path None or '-' means stdout. compress defaults to whether path ends in
+    '.gz'. The caller closes the returned stream; stdout is wrapped so that
+    closing it only flushes.
+    """
+    if not path or path == '-':
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), newline='')
+        return StdoutStream()
+
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, 'wt', newline='', compresslevel=6)
+    return open(path, 'w', newline='', buffering=BUFFER_SIZE)
+
+
+class StdoutStream:
+    """sys.stdout, looked up on each write, with close() that only flushes"""
+
+    def write(self, text):
+        return sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
+
+
+class CsvRowWriter:
+    """Write order data rows to a text stream, with the header before the first row"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        self.rows_written = 0
+
+    def write_rows(self, rows):
+        writerow = self.writer.writerow
+        for row in rows:
+            if not self.rows_written:
+                writerow(OUTPUT_HEADERS)
+            writerow(row.output_values())
+            self.rows_written += 1
+            if self.rows_written == 1:
+                # Let the first row show up right away; later rows stay buffered
+                self.stream.flush()
+
+
+def write_csv(order_data, path=None, compress=None):
+    """Stream order data rows as CSV to path (stdout by default); returns the number of rows"""
+    stream = open_csv_output(path, compress)
+    try:
+        writer = CsvRowWriter(stream)
+        writer.write_rows(order_data)
+    finally:
+        stream.close()
+    return writer.rows_written
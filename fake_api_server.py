@@ -0,0 +1,489 @@
+"""
+Local stand-in for the Square and Google Sheets HTTP APIs, for offline load testing.
+
+Serves Orders search (with cursors, per location, filtered and sorted by
+created_at or updated_at), Catalog batch-retrieve and list, the
+Sheets values endpoints and the spreadsheets get / batchUpdate calls used to
+replace whole tabs, over plain HTTP. Latency, error rates and 429 throttling can
+be injected. Point the real clients at it with SQUARE_BASE_URL and
+SHEETS_API_ENDPOINT:
+
+    python fake_api_server.py --orders 5000 --latency-ms 30 --throttle-rate 0.05
+    SQUARE_BASE_URL=http://127.0.0.1:8765 SHEETS_API_ENDPOINT=http://127.0.0.1:8765 \\
+        SQUARE_ACCESS_TOKEN=fake SQUARE_LOCATION_ID=FAKE GOOGLE_SHEET_ID=fake \\
+        python square_orders.py --output sheets
+"""
+
+import argparse
+import copy
+import json
+import random
+import re
+import sys
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def order_to_json(order, location_id=None):
+    """Render a mock order in the Orders API JSON shape"""
+    data = {
+        'id': order.id,
+        'location_id': location_id or getattr(order, 'location_id', None) or 'FAKE_LOCATION',
+        'line_items': [
+            {
+                'uid': line_item.uid,
+                'name': line_item.name,
+                'quantity': '1',
+                'catalog_object_id': line_item.catalog_object_id,
+                'catalog_version': line_item.catalog_version,
+                'variation_name': line_item.variation_name,
+                'modifiers': [
+                    {
+                        'uid': modifier.uid,
+                        'name': modifier.name,
+                        'catalog_object_id': modifier.catalog_object_id
+                    }
+                    for modifier in line_item.modifiers
+                ]
+            }
+            for line_item in order.line_items
+        ]
+    }
+    if order.total_money:
+        data['total_money'] = {'amount': order.total_money.amount, 'currency': order.total_money.currency}
+    if getattr(order, 'created_at', None):
+        data['created_at'] = order.created_at
+    if getattr(order, 'updated_at', None):
+        data['updated_at'] = order.updated_at
+    return data
+
+
+def parse_time(value):
+    """Parse an RFC 3339 timestamp as Square sends it"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def catalog_object_to_json(obj):
+    """Render a mock catalog object in the Catalog API JSON shape"""
+    data = {'type': obj.type, 'id': obj.id, 'version': obj.version}
+    if obj.modifier_data is not None:
+        data['modifier_data'] = {'name': obj.modifier_data.name}
+        if obj.modifier_data.modifier_list_id:
+            data['modifier_data']['modifier_list_id'] = obj.modifier_data.modifier_list_id
+    if obj.modifier_list_data is not None:
+        data['modifier_list_data'] = {'name': obj.modifier_list_data.name}
+    return data
+
+
+# ListCatalog page size, fixed by Square
+CATALOG_LIST_PAGE_SIZE = 100
+
+# Grid size of a new fake tab, as in a new Google Sheet
+DEFAULT_GRID = (1000, 26)
+
+
+class FakeAPIError(Exception):
+    """An error response from a fake endpoint"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_a1(range_name):
+    """Split 'Tab!A5' into ('Tab', 4); a bare tab name starts at row index 0"""
+    tab, _, cell = range_name.partition('!')
+    match = re.match(r'[A-Z]+(\d+)', cell)
+    return tab, (int(match.group(1)) - 1 if match else 0)
+
+
+class FakeAPIState:
+    """Orders, catalog objects and sheet contents served by the fake API, plus fault settings"""
+
+    def __init__(self, orders, catalog_objects, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, seed=0, locations=None, tabs=('Sheet1', 'LastUpdate'), history_days=None):
+        # With locations, orders are dealt out to them in turn and searches are
+        # filtered by location_ids; without, every search sees every order
+        self.locations = locations
+        self.orders = [
+            order_to_json(order, locations[index % len(locations)] if locations else None)
+            for index, order in enumerate(orders)
+        ]
+        if history_days:
+            # Orders without a created_at are spread evenly over the last history_days days, oldest first
+            now = datetime.now(timezone.utc).replace(microsecond=0)
+            step = timedelta(days=history_days) / max(len(self.orders), 1)
+            for index, order in enumerate(self.orders):
+                created_at = now - step * (len(self.orders) - index)
+                order.setdefault('created_at', created_at.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z')
+        # Catalog objects are served at any requested version; the last one given for an ID is listed as current
+        self.catalog = {obj.id: catalog_object_to_json(obj) for obj in catalog_objects}
+        self.sheets = {}
+        # Tab title -> [sheetId, rows, columns]; values writes create tabs on demand
+        self.grids = {}
+        for tab in tabs:
+            self.sheet(tab)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.faults = Counter()
+
+    def inject_fault(self, endpoint):
+        """Return (status, headers) for an injected failure, or None to serve normally"""
+        with self.lock:
+            self.requests[endpoint] += 1
+            roll = self.random.random()
+        if roll < self.throttle_rate:
+            with self.lock:
+                self.faults[(endpoint, 429)] += 1
+            return 429, {'Retry-After': str(self.retry_after)}
+        if roll < self.throttle_rate + self.error_rate:
+            with self.lock:
+                self.faults[(endpoint, 500)] += 1
+            return 500, {}
+        return None
+
+    def search_orders(self, body):
+        limit = body.get('limit') or 500
+        start = int(body.get('cursor') or 0)
+        orders = self.orders
+        if self.locations:
+            location_ids = set(body.get('location_ids') or [])
+            orders = [order for order in orders if order['location_id'] in location_ids]
+        query = body.get('query') or {}
+        # Time ranges are inclusive at both ends; orders without the field never match
+        for field, time_range in ((query.get('filter') or {}).get('date_time_filter') or {}).items():
+            start_at = parse_time(time_range['start_at']) if time_range.get('start_at') else None
+            end_at = parse_time(time_range['end_at']) if time_range.get('end_at') else None
+            orders = [
+                order for order in orders
+                if order.get(field) and (start_at is None or parse_time(order[field]) >= start_at)
+                and (end_at is None or parse_time(order[field]) <= end_at)
+            ]
+        sort = query.get('sort')
+        if sort:
+            field = sort['sort_field'].lower()
+            orders = sorted(orders, key=lambda order: parse_time(order.get(field) or '1970-01-01T00:00:00Z'),
+                            reverse=sort.get('sort_order') == 'DESC')
+        page = orders[start:start + limit]
+        response = {'orders': page}
+        if start + limit < len(orders):
+            response['cursor'] = str(start + limit)
+        return response
+
+    def list_catalog(self, query):
+        """ListCatalog: the requested types at their current versions, 100 objects per page"""
+        types = {name.strip().upper() for name in (query.get('types') or [''])[0].split(',') if name.strip()}
+        start = int((query.get('cursor') or ['0'])[0])
+        objects = [obj for obj in self.catalog.values() if not types or obj['type'] in types]
+        response = {'objects': objects[start:start + CATALOG_LIST_PAGE_SIZE]}
+        if start + CATALOG_LIST_PAGE_SIZE < len(objects):
+            response['cursor'] = str(start + CATALOG_LIST_PAGE_SIZE)
+        return response
+
+    def batch_retrieve(self, body):
+        objects = []
+        for object_id in body.get('object_ids', []):
+            obj = self.catalog.get(object_id)
+            if obj is not None:
+                obj = dict(obj)
+                if body.get('catalog_version') is not None:
+                    obj['version'] = body['catalog_version']
+                objects.append(obj)
+        return {'objects': objects}
+
+    def sheet(self, tab):
+        if tab not in self.grids:
+            self.grids[tab] = [len(self.grids), *DEFAULT_GRID]
+        return self.sheets.setdefault(tab, [])
+
+    def write_values(self, range_name, values):
+        tab, start = parse_a1(range_name)
+        with self.lock:
+            rows = self.sheet(tab)
+            while len(rows) < start + len(values):
+                rows.append([])
+            for offset, row in enumerate(values):
+                rows[start + offset] = [str(value) for value in row]
+            grid = self.grids[tab]
+            grid[1] = max(grid[1], len(rows))
+        return sum(len(row) for row in values)
+
+    def sheet_properties(self):
+        with self.lock:
+            return {'sheets': [
+                {'properties': {
+                    'sheetId': sheet_id, 'title': tab,
+                    'gridProperties': {'rowCount': row_count, 'columnCount': column_count}
+                }}
+                for tab, (sheet_id, row_count, column_count) in self.grids.items()
+            ]}
+
+    def batch_update_spreadsheet(self, body):
+        """Apply appendDimension and updateCells requests, all or nothing"""
+        with self.lock:
+            sheets = copy.deepcopy(self.sheets)
+            grids = copy.deepcopy(self.grids)
+            tabs = {grid[0]: tab for tab, grid in grids.items()}
+            for request in body.get('requests', []):
+                if 'appendDimension' in request:
+                    append = request['appendDimension']
+                    grid = grids[tabs[append['sheetId']]]
+                    grid[1 if append['dimension'] == 'ROWS' else 2] += append['length']
+                elif 'updateCells' in request:
+                    update = request['updateCells']
+                    grid_range = update['range']
+                    tab = tabs[grid_range['sheetId']]
+                    values = [
+                        [cell.get('userEnteredValue', {}).get('stringValue', '') for cell in row.get('values', [])]
+                        for row in update.get('rows', [])
+                    ]
+                    start_row = grid_range.get('startRowIndex', 0)
+                    if (start_row + len(values) > grids[tab][1] or
+                            any(len(row) > grids[tab][2] for row in values)):
+                        raise FakeAPIError(400, f'Range ({tab}) exceeds grid limits')
+                    rows = sheets[tab]
+                    if 'endRowIndex' not in grid_range:
+                        # The rest of an open-ended range is cleared
+                        del rows[start_row:]
+                    while len(rows) < start_row + len(values):
+                        rows.append([])
+                    for offset, row in enumerate(values):
+                        if 'endColumnIndex' in grid_range:
+                            current = rows[start_row + offset]
+                            current.extend([''] * (len(row) - len(current)))
+                            current[:len(row)] = row
+                        else:
+                            rows[start_row + offset] = row
+                else:
+                    raise FakeAPIError(400, f'Unsupported request {sorted(request)}')
+            self.sheets = sheets
+            self.grids = grids
+        return {'replies': [{} for _ in body.get('requests', [])]}
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        path = url.path
+        self.query = parse_qs(url.query)
+        body = self.read_body() if method in ('POST', 'PUT') else {}
+        route = self.route(method, path)
+        if route is None:
+            self.send_json(404, {'error': {'code': 404, 'message': f'No fake route for {method} {path}'}})
+            return
+
+        endpoint, handler = route
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        fault = self.state.inject_fault(endpoint)
+        if fault:
+            status, headers = fault
+            self.send_json(status, {
+                'errors': [{'category': 'RATE_LIMIT_ERROR' if status == 429 else 'API_ERROR', 'code': str(status)}],
+                'error': {'code': status, 'message': 'Injected fault'}
+            }, headers)
+            return
+
+        try:
+            response = handler(body)
+        except FakeAPIError as e:
+            self.send_json(e.status, {'error': {'code': e.status, 'message': str(e)}})
+            return
+        self.send_json(200, response)
+
+    def route(self, method, path):
+        state = self.state
+        if method == 'POST' and path == '/v2/orders/search':
+            return 'orders.search', state.search_orders
+        if method == 'POST' and path == '/v2/catalog/batch-retrieve':
+            return 'catalog.batch_get', state.batch_retrieve
+        if method == 'GET' and path == '/v2/catalog/list':
+            return 'catalog.list', lambda body: state.list_catalog(self.query)
+
+        match = re.match(r'/v4/spreadsheets/([^/:]+)(:batchUpdate)?$', path)
+        if match and method == 'GET' and not match.group(2):
+            return 'sheets.get', lambda body: state.sheet_properties()
+        if match and method == 'POST' and match.group(2):
+            return 'sheets.batchUpdate', state.batch_update_spreadsheet
+
+        match = re.match(r'/v4/spreadsheets/([^/]+)/values(?::(batchUpdate|batchClear|batchGet)|/(.+))$', path)
+        if not match:
+            return None
+        batch_method = match.group(2)
+        range_part = unquote(match.group(3)) if match.group(3) else None
+
+        if batch_method == 'batchUpdate' and method == 'POST':
+            def batch_update(body):
+                cells = sum(state.write_values(entry['range'], entry['values']) for entry in body.get('data', []))
+                rows = sum(len(entry['values']) for entry in body.get('data', []))
+                return {'totalUpdatedRows': rows, 'totalUpdatedCells': cells}
+            return 'sheets.values.batchUpdate', batch_update
+
+        if batch_method == 'batchClear' and method == 'POST':
+            def batch_clear(body):
+                tabs = [parse_a1(range_name)[0] for range_name in body.get('ranges', [])]
+                with state.lock:
+                    for tab in tabs:
+                        state.sheet(tab).clear()
+                return {'clearedRanges': tabs}
+            return 'sheets.values.batchClear', batch_clear
+
+        if batch_method == 'batchGet' and method == 'GET':
+            ranges = self.query.get('ranges', [])
+
+            def batch_get(body):
+                value_ranges = []
+                for range_name in ranges:
+                    tab, start = parse_a1(range_name)
+                    value_ranges.append({
+                        'range': range_name,
+                        'values': [list(row) for row in state.sheet(tab)[start:]]
+                    })
+                return {'valueRanges': value_ranges}
+            return 'sheets.values.batchGet', batch_get
+
+        if range_part is None:
+            return None
+
+        if range_part.endswith(':clear') and method == 'POST':
+            tab, _ = parse_a1(range_part[:-len(':clear')])
+
+            def clear(body):
+                with state.lock:
+                    state.sheet(tab).clear()
+                return {'clearedRange': tab}
+            return 'sheets.values.clear', clear
+
+        if range_part.endswith(':append') and method == 'POST':
+            tab, _ = parse_a1(range_part[:-len(':append')])
+
+            def append(body):
+                start = len(state.sheet(tab))
+                cells = state.write_values(f'{tab}!A{start + 1}', body.get('values', []))
+                return {'updates': {'updatedCells': cells}}
+            return 'sheets.values.append', append
+
+        if method == 'PUT':
+            return 'sheets.values.update', lambda body: {
+                'updatedCells': state.write_values(range_part, body.get('values', []))
+            }
+
+        if method == 'GET':
+            tab, start = parse_a1(range_part)
+            return 'sheets.values.get', lambda body: {
+                'range': range_part,
+                'values': [list(row) for row in state.sheet(tab)[start:]]
+            }
+
+        return None
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+
+def start_server(state, host='127.0.0.1', port=0):
+    """Start the fake API on a background thread and return the server; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), FakeAPIHandler)
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}'
+
+
+def main():
+    from benchmark import generate_workload
+
+    parser = argparse.ArgumentParser(description='Run a fake Square and Google Sheets API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--orders', type=int, default=1000, help='Number of synthetic orders to serve')
+    parser.add_argument('--modifiers', type=int, default=6, help='Modifiers per line item')
+    parser.add_argument('--catalog-versions', type=int, default=1)
+    parser.add_argument('--locations', type=int, default=0,
+                        help='Spread orders over this many locations (FAKE_LOCATION_1, ...) and filter searches by them')
+    parser.add_argument('--history-days', type=float, default=0,
+                        help='Spread the orders\' created_at over this many past days, for backfills')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every request')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    args = parser.parse_args()
+
+    orders, modifier_details, modifier_list_details = generate_workload(
+        args.orders, args.modifiers, args.catalog_versions
+    )
+    catalog_objects = list(modifier_details.values()) + list(modifier_list_details.values())
+    state = FakeAPIState(
+        orders, catalog_objects,
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        locations=[f'FAKE_LOCATION_{n}' for n in range(1, args.locations + 1)] or None,
+        history_days=args.history_days or None
+    )
+    server = start_server(state, args.host, args.port)
+    print(f"Fake Square and Sheets API listening on {server_url(server)} ({args.orders} orders)")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\nRequests served:")
+        for endpoint, count in sorted(state.requests.items()):
+            print(f"  {endpoint}: {count}")
+        for (endpoint, status), count in sorted(state.faults.items()):
+            print(f"  injected {status} on {endpoint}: {count}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,70 @@
 import json
 import sys
+import threading
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from config import Config
+from order_row import OUTPUT_HEADERS
+from rate_limit import execute
+from run_metrics import metrics, timed
+from sheet_digest import changed_row_runs, digest_key, digest_rows, forget_digests, load_digests, save_digests
+
+
+# The Google client libraries are imported where they are first used, so
+# importing this module for its row helpers stays cheap.
+# Credentials are shared process-wide; services are cached per thread because
+# the underlying httplib2 transport is not thread-safe
+_credentials = None
+_credentials_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_credentials():
+    """Return the process-wide service account credentials, refreshing them if expired"""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None and Config.SHEETS_API_ENDPOINT and not Config.GOOGLE_CREDENTIALS_JSON:
+            # A local stand-in API (fake_api_server.py) needs no real credentials
+            from google.auth.credentials import AnonymousCredentials
+            _credentials = AnonymousCredentials()
+        elif _credentials is None:
+            from google.oauth2 import service_account
+
+            # Parse credentials from environment variable
+            credentials_info = json.loads(Config.GOOGLE_CREDENTIALS_JSON)
+
+            # Create credentials object
+            _credentials = service_account.Credentials.from_service_account_info(
+                credentials_info,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+        elif _credentials.expired:
+            # Refresh once under the lock so threads don't all mint new tokens
+            from google.auth.transport.requests import Request
+            _credentials.refresh(Request())
+        return _credentials
 
 
 def get_sheets_service():
-    """Create and return a Google Sheets API service instance"""
+    """Return a cached Google Sheets API service instance for the current thread"""
     try:
-        # Parse credentials from environment variable
-        credentials_info = json.loads(Config.GOOGLE_CREDENTIALS_JSON)
+        credentials = get_credentials()
 
-        # Create credentials object
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
+        service = getattr(_thread_local, 'service', None)
+        if service is None:
+            from googleapiclient.discovery import build
 
-        # Build and return the service
-        service = build('sheets', 'v4', credentials=credentials)
+            # Use the discovery document bundled with googleapiclient so building
+            # the service needs no network round trip
+            client_options = {'api_endpoint': Config.SHEETS_API_ENDPOINT} if Config.SHEETS_API_ENDPOINT else None
+            service = build(
+                'sheets', 'v4',
+                credentials=credentials,
+                client_options=client_options,
+                static_discovery=True,
+                cache_discovery=False
+            )
+            _thread_local.service = service
         return service
 
     except json.JSONDecodeError as e:
@@ -32,7 +75,267 @@ def get_sheets_service():
         sys.exit(1)
 
 
-def write_to_google_sheet(data, sheet_id=None, sheet_name=None, write_mode='overwrite'):
+def reset_sheets_service():
+    """Drop cached credentials and this thread's service so the next call rebuilds them"""
+    global _credentials
+    with _credentials_lock:
+        _credentials = None
+    _thread_local.service = None
+
+
+def run_request(request):
+    """Execute a Sheets API request under the shared rate limit and retry policy"""
+    postproc = request.postproc
+
+    # Count body bytes for the run report; postproc only sees successful responses
+    def count_response(resp, content):
+        metrics.add_bytes('sheets', received=len(content or b''))
+        return postproc(resp, content)
+
+    def send():
+        metrics.add_bytes('sheets', sent=len(request.body or ''))
+        return request.execute()
+
+    request.postproc = count_response
+    return execute('sheets', send)
+
+
+# Headers match the CSV output
+SHEET_HEADERS = OUTPUT_HEADERS
+
+# Tab and cell holding the time of the last successful sync
+LAST_UPDATE_TAB = 'LastUpdate'
+LAST_UPDATE_RANGE = f'{LAST_UPDATE_TAB}!A1'
+
+
+def build_sheet_rows(data):
+    """Convert order data rows into sheet values, starting with the header row"""
+    rows = [SHEET_HEADERS]
+    rows.extend(row.output_values() for row in data)
+    return rows
+
+
+def row_keys(rows):
+    """
+    Yield the upsert key for each sheet row
+
+    A line item is identified by its Order ID, its Line Item Name and how many
+    earlier rows of the same order share that name, so repeated registrations
+    within one order keep distinct keys.
+    """
+    seen = {}
+    for row in rows:
+        order_id = str(row[0]) if len(row) > 0 else ''
+        line_item_name = str(row[2]) if len(row) > 2 else ''
+        occurrence = seen.get((order_id, line_item_name), 0)
+        seen[(order_id, line_item_name)] = occurrence + 1
+        yield (order_id, line_item_name, occurrence)
+
+
+def normalize_row(row, width):
+    """Render a row the way the Sheets API returns it: strings, padded to width"""
+    values = ['' if value is None else str(value) for value in row]
+    return values + [''] * (width - len(values))
+
+
+def plan_upsert(existing, rows, sheet_name):
+    """
+    Work out the value ranges needed to upsert rows into existing sheet values
+
+    existing is the sheet's current values (header included) and rows the new
+    values (header included). Returns a list of {'range', 'values'} entries for
+    changed rows plus one contiguous block of new rows after the last existing
+    row. Rows whose values are unchanged are left out.
+    """
+    width = len(SHEET_HEADERS)
+
+    if not existing:
+        return [{'range': f'{sheet_name}!A1', 'values': rows}]
+
+    # Build the key -> sheet row number index once (row 1 is the header)
+    index = {}
+    for offset, key in enumerate(row_keys(existing[1:])):
+        index[key] = offset + 2
+
+    updates = []
+    new_rows = []
+    for key, row in zip(row_keys(rows[1:]), rows[1:]):
+        row_number = index.get(key)
+        if row_number is None:
+            new_rows.append(row)
+        elif normalize_row(existing[row_number - 1], width) != normalize_row(row, width):
+            updates.append({'range': f'{sheet_name}!A{row_number}', 'values': [row]})
+
+    if normalize_row(existing[0], width) != normalize_row(rows[0], width):
+        updates.insert(0, {'range': f'{sheet_name}!A1', 'values': [rows[0]]})
+
+    if new_rows:
+        updates.append({'range': f'{sheet_name}!A{len(existing) + 1}', 'values': new_rows})
+
+    return updates
+
+
+def last_update_timestamp():
+    """Return the current time as written to LastUpdate!A1"""
+    return datetime.now(ZoneInfo('America/Chicago')).strftime('%Y-%m-%d %H:%M:%S %Z')
+
+
+def cell_rows(rows):
+    """
+    Convert sheet values into updateCells row data, stored as strings like valueInputOption RAW
+
+    Empty values are sent as empty cells, which clear the cell and keep the
+    request small.
+    """
+    return [
+        {'values': [
+            {'userEnteredValue': {'stringValue': str(value)}} if value not in (None, '') else {} for value in row
+        ]}
+        for row in rows
+    ]
+
+
+def plan_replace_requests(tab_rows, properties, timestamp=None, previous=None):
+    """
+    Build spreadsheets.batchUpdate requests that replace the contents of whole tabs
+
+    tab_rows maps tab names to sheet values and properties maps tab names to
+    their sheet properties. Each tab gets one updateCells over its entire
+    grid, which also clears whatever the new rows do not cover (the stale
+    rows left over from a longer table), after growing grids that are too
+    small. With timestamp, LastUpdate!A1 is set by the same batch.
+
+    previous maps tab names to (old row digests, new row digests) for tabs
+    whose last written contents are known. Those tabs only get updateCells
+    for the runs of rows that changed, plus one that clears rows past the
+    end of the new table.
+    """
+    previous = previous or {}
+    requests = []
+    for sheet_name, rows in tab_rows.items():
+        tab = properties[sheet_name]
+        grid = tab.get('gridProperties', {})
+        width = max(len(row) for row in rows)
+        for dimension, needed, current in (
+            ('ROWS', len(rows), grid.get('rowCount', 0)),
+            ('COLUMNS', width, grid.get('columnCount', 0))
+        ):
+            if needed > current:
+                requests.append({'appendDimension': {
+                    'sheetId': tab['sheetId'], 'dimension': dimension, 'length': needed - current
+                }})
+
+        if sheet_name not in previous:
+            requests.append({'updateCells': {
+                'range': {'sheetId': tab['sheetId']},
+                'rows': cell_rows(rows),
+                'fields': 'userEnteredValue'
+            }})
+            continue
+
+        old_digests, new_digests = previous[sheet_name]
+        for start, end in changed_row_runs(old_digests, new_digests):
+            requests.append({'updateCells': {
+                'range': {'sheetId': tab['sheetId'], 'startRowIndex': start, 'endRowIndex': end},
+                'rows': cell_rows(rows[start:end]),
+                'fields': 'userEnteredValue'
+            }})
+        if len(rows) < len(old_digests):
+            # No rows over an open-ended range clears it
+            requests.append({'updateCells': {
+                'range': {'sheetId': tab['sheetId'], 'startRowIndex': len(rows)},
+                'fields': 'userEnteredValue'
+            }})
+
+    if timestamp is not None:
+        requests.append({'updateCells': {
+            'range': {
+                'sheetId': properties[LAST_UPDATE_TAB]['sheetId'],
+                'startRowIndex': 0, 'endRowIndex': 1, 'startColumnIndex': 0, 'endColumnIndex': 1
+            },
+            'rows': cell_rows([[timestamp]]),
+            'fields': 'userEnteredValue'
+        }})
+    return requests
+
+
+def replace_tabs(service, sheet_id, tab_rows, log_update=False):
+    """
+    Replace the contents of whole tabs, and optionally LastUpdate!A1, in one spreadsheets.batchUpdate
+
+    The batch is applied atomically, so viewers go straight from the old
+    contents to the new ones without an empty sheet in between. Tab IDs and
+    grid sizes are looked up first with one small spreadsheets.get.
+
+    With SHEET_DIGEST_PATH set, tabs whose table digest matches the last
+    write are left alone, and only changed rows of the others are sent; when
+    nothing changed no request is made at all, LastUpdate included.
+
+    Returns the names of the tabs written, or None, after printing why, if
+    a tab does not exist.
+    """
+    digest_path = Config.SHEET_DIGEST_PATH
+    digests = load_digests(digest_path) if digest_path else None
+    new_digests = {}
+    previous = {}
+    if digests is not None:
+        changed = {}
+        for sheet_name, rows in tab_rows.items():
+            new = digest_rows(rows)
+            old = digests.get(digest_key(sheet_id, sheet_name))
+            if old and old['table'] == new['table']:
+                continue
+            changed[sheet_name] = rows
+            new_digests[sheet_name] = new
+            if old:
+                previous[sheet_name] = (old['rows'], new['rows'])
+        tab_rows = changed
+        if not tab_rows:
+            return []
+
+    result = run_request(service.spreadsheets().get(
+        spreadsheetId=sheet_id,
+        fields='sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))'
+    ))
+    properties = {sheet['properties']['title']: sheet['properties'] for sheet in result.get('sheets', [])}
+
+    missing = [sheet_name for sheet_name in tab_rows if sheet_name not in properties]
+    if missing:
+        print(f"Error: tab(s) {', '.join(missing)} not found in Google Sheet {sheet_id}")
+        return None
+
+    timestamp = None
+    if log_update:
+        if LAST_UPDATE_TAB in properties:
+            timestamp = last_update_timestamp()
+        else:
+            print(f"Error logging update timestamp: tab {LAST_UPDATE_TAB} not found")
+
+    requests = plan_replace_requests(tab_rows, properties, timestamp, previous)
+    run_request(service.spreadsheets().batchUpdate(
+        spreadsheetId=sheet_id,
+        body={'requests': requests}
+    ))
+    metrics.add_rows('sheet_rows_written', sum(
+        len(request['updateCells'].get('rows', [])) for request in requests if 'updateCells' in request
+    ))
+    if timestamp is not None:
+        print(f"Logged last update timestamp: {timestamp}")
+
+    if digests is not None:
+        for sheet_name, digest in new_digests.items():
+            digests[digest_key(sheet_id, sheet_name)] = digest
+        save_digests(digest_path, digests)
+    return list(tab_rows)
+
+
+def last_update_data(timestamp):
+    """Return a values.batchUpdate entry that writes timestamp to LastUpdate!A1"""
+    return {'range': LAST_UPDATE_RANGE, 'values': [[timestamp]]}
+
+
+@timed('sheets_write')
+def write_to_google_sheet(data, sheet_id=None, sheet_name=None, write_mode='overwrite', log_update=False):
     """
     Write data to a Google Sheet
 
@@ -40,12 +343,15 @@ def write_to_google_sheet(data, sheet_id=None, sheet_name=None, write_mode='over
         data: List of dictionaries containing row data
         sheet_id: Google Sheet ID (defaults to Config.GOOGLE_SHEET_ID)
         sheet_name: Sheet name/tab (defaults to Config.SHEET_NAME)
-        write_mode: 'overwrite' or 'append' (defaults to Config.WRITE_MODE)
+        write_mode: 'overwrite', 'append' or 'upsert' (defaults to Config.WRITE_MODE)
+        log_update: Also write the LastUpdate!A1 timestamp, in the same request as the data where possible
     """
     if not data:
         print("No data to write to Google Sheets.")
         return False
 
+    from googleapiclient.errors import HttpError
+
     sheet_id = sheet_id or Config.GOOGLE_SHEET_ID
     sheet_name = sheet_name or Config.SHEET_NAME
     write_mode = write_mode or Config.WRITE_MODE
@@ -53,92 +359,88 @@ def write_to_google_sheet(data, sheet_id=None, sheet_name=None, write_mode='over
     try:
         service = get_sheets_service()
 
-        # Define headers matching the CSV output
-        headers = ['Order ID', 'Total Money', 'Line Item Name', 'Name', 'Rank', 'Patrol',
-                   'Emergency Contact', 'Emergency Contact Phone', 'Cell Phone', 'Travel to Campout']
-
-        # Prepare rows
-        rows = [headers]
-        for row_data in data:
-            # Combine scout_name and scouter_name into a single Name field
-            name = row_data['scout_name'] if row_data['scout_name'] else row_data['scouter_name']
-            patrol = row_data['patrol'] if row_data['patrol'] else 'Rocking Chair'
-
-            row = [
-                row_data['order_id'],
-                row_data['total_money'],
-                row_data['line_item_name'],
-                name,
-                row_data['rank'],
-                patrol,
-                row_data['emergency_contact'],
-                row_data['emergency_contact_phone'],
-                row_data['cell_phone'],
-                row_data['travel_to_campout']
-            ]
-            rows.append(row)
+        rows = build_sheet_rows(data)
 
         if write_mode == 'overwrite':
-            # Clear existing data and write new data
-            range_name = f'{sheet_name}!A1'
+            # Replace the tab, clearing stale trailing rows, in a single atomic request
+            written = replace_tabs(service, sheet_id, {sheet_name: rows}, log_update)
+            if written is None:
+                return False
+            if not written:
+                print("Google Sheet unchanged since the last write; nothing sent (overwrite mode)")
+                return True
+
+            print(f"Successfully wrote {sum(len(row) for row in rows)} cells to Google Sheet (overwrite mode)")
+            print(f"Sheet URL: https://docs.google.com/spreadsheets/d/{sheet_id}")
+            return True
 
-            # Clear the sheet first
-            service.spreadsheets().values().clear(
+        elif write_mode == 'append':
+            # Write after the last existing row (without headers if the sheet
+            # already has data). Unlike values.append, a positional write can
+            # be retried after a timeout or server error without adding the
+            # rows twice
+            existing = run_request(service.spreadsheets().values().get(
                 spreadsheetId=sheet_id,
                 range=sheet_name
-            ).execute()
+            )).get('values', [])
 
-            # Write new data
-            body = {
-                'values': rows
-            }
+            updates = plan_tab_writes({sheet_name: rows}, {sheet_name: existing}, 'append')
+            timestamp = None
+            if log_update:
+                timestamp = last_update_timestamp()
+                updates.append(last_update_data(timestamp))
 
-            result = service.spreadsheets().values().update(
+            result = run_request(service.spreadsheets().values().batchUpdate(
                 spreadsheetId=sheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+                body={
+                    'valueInputOption': 'RAW',
+                    'data': updates
+                }
+            ))
 
-            print(f"Successfully wrote {result.get('updatedCells')} cells to Google Sheet (overwrite mode)")
+            forget_digests(Config.SHEET_DIGEST_PATH, sheet_id, [sheet_name])
+            print(f"Successfully appended {result.get('totalUpdatedCells', 0)} cells to Google Sheet")
+            if timestamp is not None:
+                print(f"Logged last update timestamp: {timestamp}")
             print(f"Sheet URL: https://docs.google.com/spreadsheets/d/{sheet_id}")
             return True
 
-        elif write_mode == 'append':
-            # Append data (without headers if sheet already has data)
-            range_name = f'{sheet_name}!A1'
-
-            # Check if sheet has existing data
-            try:
-                existing = service.spreadsheets().values().get(
-                    spreadsheetId=sheet_id,
-                    range=range_name
-                ).execute()
-                has_data = bool(existing.get('values'))
-            except HttpError:
-                has_data = False
-
-            # If sheet has data, skip the header row
-            if has_data:
-                rows = rows[1:]  # Remove header row
-
-            body = {
-                'values': rows
-            }
+        elif write_mode == 'upsert':
+            # Read the current sheet once and only send rows that changed or are new
+            existing = run_request(service.spreadsheets().values().get(
+                spreadsheetId=sheet_id,
+                range=sheet_name
+            )).get('values', [])
 
-            result = service.spreadsheets().values().append(
+            updates = plan_upsert(existing, rows, sheet_name)
+            if not updates:
+                print("Google Sheet already up to date (upsert mode)")
+                if log_update:
+                    log_last_update(sheet_id)
+                return True
+            timestamp = None
+            if log_update:
+                timestamp = last_update_timestamp()
+                updates.append(last_update_data(timestamp))
+
+            result = run_request(service.spreadsheets().values().batchUpdate(
                 spreadsheetId=sheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+                body={
+                    'valueInputOption': 'RAW',
+                    'data': updates
+                }
+            ))
 
-            print(f"Successfully appended {result.get('updates', {}).get('updatedCells', 0)} cells to Google Sheet")
+            forget_digests(Config.SHEET_DIGEST_PATH, sheet_id, [sheet_name])
+            print(f"Successfully upserted {result.get('totalUpdatedRows', 0)} rows "
+                  f"({result.get('totalUpdatedCells', 0)} cells) to Google Sheet")
+            if timestamp is not None:
+                print(f"Logged last update timestamp: {timestamp}")
             print(f"Sheet URL: https://docs.google.com/spreadsheets/d/{sheet_id}")
             return True
 
         else:
-            print(f"Error: Invalid write_mode '{write_mode}'. Must be 'overwrite' or 'append'.")
+            print(f"Error: Invalid write_mode '{write_mode}'. Must be 'overwrite', 'append' or 'upsert'.")
             return False
 
     except HttpError as e:
@@ -152,18 +454,135 @@ def write_to_google_sheet(data, sheet_id=None, sheet_name=None, write_mode='over
         return False
 
 
+def plan_tab_writes(tab_rows, existing, write_mode):
+    """
+    Work out the value ranges that append or upsert each tab's rows in one batchUpdate
+
+    tab_rows maps tab names to sheet values (header included) and existing
+    maps them to the tab's current values. Appends start after the last
+    existing row and leave out the header when the tab already has data.
+    """
+    data = []
+    for sheet_name, rows in tab_rows.items():
+        if write_mode == 'append':
+            current = existing.get(sheet_name, [])
+            if current:
+                if len(rows) > 1:
+                    data.append({'range': f'{sheet_name}!A{len(current) + 1}', 'values': rows[1:]})
+            else:
+                data.append({'range': f'{sheet_name}!A1', 'values': rows})
+        else:
+            data.extend(plan_upsert(existing.get(sheet_name, []), rows, sheet_name))
+    return data
+
+
+@timed('sheets_write')
+def write_tabs_to_google_sheet(tab_data, sheet_id=None, write_mode='overwrite', log_update=False):
+    """
+    Write rows to several tabs of one Google Sheet with a single batchUpdate
+
+    Args:
+        tab_data: Dictionary mapping tab names to lists of order data rows
+        sheet_id: Google Sheet ID (defaults to Config.GOOGLE_SHEET_ID)
+        write_mode: 'overwrite', 'append' or 'upsert' (defaults to Config.WRITE_MODE)
+        log_update: Also write the LastUpdate!A1 timestamp in the same batchUpdate
+
+    Overwrites replace every tab in one spreadsheets.batchUpdate; appends and
+    upserts read every tab in one batchGet and write them in one
+    values.batchUpdate. Tabs must already exist in the sheet.
+    """
+    sheet_id = sheet_id or Config.GOOGLE_SHEET_ID
+    write_mode = write_mode or Config.WRITE_MODE
+    if write_mode not in ('overwrite', 'append', 'upsert'):
+        print(f"Error: Invalid write_mode '{write_mode}'. Must be 'overwrite', 'append' or 'upsert'.")
+        return False
+
+    # Only an overwrite has anything to do for a tab without rows: reset it to the header
+    tab_rows = {
+        sheet_name: build_sheet_rows(rows) for sheet_name, rows in tab_data.items()
+        if rows or write_mode == 'overwrite'
+    }
+    if not tab_rows:
+        print("No data to write to Google Sheets.")
+        return False
+
+    from googleapiclient.errors import HttpError
+
+    try:
+        service = get_sheets_service()
+
+        if write_mode == 'overwrite':
+            written = replace_tabs(service, sheet_id, tab_rows, log_update)
+            if written is None:
+                return False
+            if not written:
+                print("Google Sheet tabs unchanged since the last write; nothing sent (overwrite mode)")
+                return True
+            print(f"Successfully wrote {sum(len(tab_rows[tab]) for tab in written)} rows to {len(written)} tabs "
+                  f"of Google Sheet (overwrite mode)")
+            print(f"Sheet URL: https://docs.google.com/spreadsheets/d/{sheet_id}")
+            return True
+
+        values = service.spreadsheets().values()
+        existing = {}
+        result = run_request(values.batchGet(spreadsheetId=sheet_id, ranges=list(tab_rows)))
+        # valueRanges come back in request order
+        for sheet_name, value_range in zip(tab_rows, result.get('valueRanges', [])):
+            existing[sheet_name] = value_range.get('values', [])
+
+        data = plan_tab_writes(tab_rows, existing, write_mode)
+        if not data:
+            print(f"Google Sheet tabs already up to date ({write_mode} mode)")
+            if log_update:
+                log_last_update(sheet_id)
+            return True
+        timestamp = None
+        if log_update:
+            timestamp = last_update_timestamp()
+            data.append(last_update_data(timestamp))
+
+        result = run_request(values.batchUpdate(
+            spreadsheetId=sheet_id,
+            body={
+                'valueInputOption': 'RAW',
+                'data': data
+            }
+        ))
+
+        forget_digests(Config.SHEET_DIGEST_PATH, sheet_id, tab_rows)
+        print(f"Successfully wrote {result.get('totalUpdatedRows', 0)} rows to {len(tab_rows)} tabs "
+              f"of Google Sheet ({write_mode} mode)")
+        print(f"Sheet URL: https://docs.google.com/spreadsheets/d/{sheet_id}")
+        if timestamp is not None:
+            print(f"Logged last update timestamp: {timestamp}")
+        return True
+
+    except HttpError as e:
+        error_details = json.loads(e.content.decode('utf-8'))
+        print(f"Google Sheets API error: {error_details.get('error', {}).get('message', str(e))}")
+        print(f"Make sure the sheet ID is correct, every routed tab exists and the service account has access.")
+        return False
+
+    except Exception as e:
+        print(f"Error writing to Google Sheet: {e}")
+        return False
+
+
+@timed('sheets_last_update')
 def log_last_update(sheet_id=None):
     """Write the current UTC timestamp to LastUpdate!A1"""
+    from googleapiclient.errors import HttpError
+
     sheet_id = sheet_id or Config.GOOGLE_SHEET_ID
-    timestamp = datetime.now(ZoneInfo('America/Chicago')).strftime('%Y-%m-%d %H:%M:%S %Z')
+    timestamp = last_update_timestamp()
     try:
         service = get_sheets_service()
-        service.spreadsheets().values().update(
+        run_request(service.spreadsheets().values().update(
             spreadsheetId=sheet_id,
-            range='LastUpdate!A1',
+            range=LAST_UPDATE_RANGE,
             valueInputOption='RAW',
             body={'values': [[timestamp]]}
-        ).execute()
+        ))
         print(f"Logged last update timestamp: {timestamp}")
     except HttpError as e:
         error_details = json.loads(e.content.decode('utf-8'))
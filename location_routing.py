@@ -0,0 +1,54 @@
+"""
+Routing of order data rows to Google Sheets tabs by Square location.
+
+The routes file maps each location ID to a tab name, or to an object naming
+a different spreadsheet as well:
+
+    {
+        "LRG8TDY17X9VD": "Troop 12",
+        "L5KQ2Z0DWS7AE": {"sheet_id": "1AbC...", "sheet_name": "Pack 40"}
+    }
+
+Orders from locations without a route go to the default sheet and tab.
+"""
+
+import json
+import sys
+
+
+def load_location_routes(path=None):
+    """Return {location_id: (sheet_id or None, sheet_name)} from a JSON routes file, or {} if path is empty"""
+    if not path:
+        return {}
+
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+        routes = {}
+        for location_id, target in entries.items():
+            if isinstance(target, str):
+                routes[location_id] = (None, target)
+            else:
+                routes[location_id] = (target.get('sheet_id') or None, target['sheet_name'])
+        return routes
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        print(f"Error loading location routes from {path}: {e}")
+        sys.exit(1)
+
+
+def route_rows(rows, order_locations, routes, default_sheet_id, default_sheet_name):
+    """
+    Group order data rows by target spreadsheet and tab
+
+    Returns {sheet_id: {sheet_name: [rows]}} with rows in their original
+    order. Every routed tab is included, even when no rows reach it, so an
+    overwrite still leaves it with just the header row.
+    """
+    targets = {}
+    for sheet_id, sheet_name in routes.values():
+        targets.setdefault(sheet_id or default_sheet_id, {}).setdefault(sheet_name, [])
+
+    for row in rows:
+        sheet_id, sheet_name = routes.get(order_locations.get(row.order_id), (None, default_sheet_name))
+        targets.setdefault(sheet_id or default_sheet_id, {}).setdefault(sheet_name, []).append(row)
+    return targets
@@ -24,10 +24,13 @@ class MockLineItem:
         self.modifiers = modifiers or []
 
 class MockOrder:
-    def __init__(self, id, total_money, line_items=None):
+    def __init__(self, id, total_money, line_items=None, updated_at=None, location_id=None, created_at=None):
         self.id = id
         self.total_money = total_money
         self.line_items = line_items or []
+        self.updated_at = updated_at
+        self.location_id = location_id
+        self.created_at = created_at
 
 class MockModifierData:
     def __init__(self, name, modifier_list_id=None):
@@ -48,10 +51,11 @@ class MockCatalogObject:
         self.modifier_list_data = modifier_list_data
 
 class MockAPIResponse:
-    def __init__(self, orders=None, objects=None, errors=None):
+    def __init__(self, orders=None, objects=None, errors=None, cursor=None):
         self.orders = orders or []
         self.objects = objects or []
         self.errors = errors or []
+        self.cursor = cursor
 
 # Mock Orders API response
 mock_orders_response = MockAPIResponse(
@@ -299,6 +303,14 @@ mock_orders_with_errors_response = MockAPIResponse(
 def get_mock_orders_response():
     return mock_orders_response
 
+# Function to get mock orders response split into cursor-linked pages
+def get_mock_orders_page(cursor=None, page_size=1):
+    orders = mock_orders_response.orders
+    start = int(cursor) if cursor else 0
+    end = start + page_size
+    next_cursor = str(end) if end < len(orders) else None
+    return MockAPIResponse(orders=orders[start:end], cursor=next_cursor)
+
 # Function to get mock catalog modifiers response
 def get_mock_catalog_modifiers_response(object_ids, catalog_version=None):
     # In a real implementation, we would filter based on object_ids and catalog_version
@@ -310,3 +322,57 @@ def get_mock_catalog_modifier_lists_response(object_ids, catalog_version=None):
     # In a real implementation, we would filter based on object_ids and catalog_version
     # For simplicity in testing, we return the full mock response
     return mock_catalog_modifier_lists_response
+
+class MockOrdersAPI:
+    def __init__(self, page_size=1):
+        self.page_size = page_size
+        self.calls = []
+
+    def search(self, location_ids=None, limit=None, cursor=None, **kwargs):
+        self.calls.append({'location_ids': location_ids, 'limit': limit, 'cursor': cursor})
+        return get_mock_orders_page(cursor=cursor, page_size=self.page_size)
+
+class MockCatalogAPI:
+    def __init__(self, objects=None):
+        objects = objects if objects is not None else mock_catalog_modifiers_response.objects
+        self.objects = {obj.id: obj for obj in objects}
+        self.calls = []
+        self.list_calls = []
+
+    def batch_get(self, object_ids, catalog_version=None, **kwargs):
+        self.calls.append({'object_ids': list(object_ids), 'catalog_version': catalog_version})
+        return MockAPIResponse(objects=[self.objects[object_id] for object_id in object_ids if object_id in self.objects])
+
+    def list(self, types=None, cursor=None, page_size=100, **kwargs):
+        """Serve the objects of the requested types a page at a time, shaped like the SDK's pager"""
+        self.list_calls.append({'types': types, 'cursor': cursor})
+        wanted = set(types.split(',')) if types else None
+        objects = [obj for obj in self.objects.values() if wanted is None or obj.type in wanted]
+        start = int(cursor or 0)
+        next_cursor = str(start + page_size) if start + page_size < len(objects) else None
+        return MockCatalogPage(objects[start:start + page_size], MockAPIResponse(cursor=next_cursor))
+
+class MockCatalogPage:
+    def __init__(self, items, response):
+        self.items = items
+        self.response = response
+
+class MockSquareClient:
+    """Stand-in for the Square client that serves the mock responses above"""
+    def __init__(self, page_size=1, catalog_objects=None):
+        self.orders = MockOrdersAPI(page_size=page_size)
+        self.catalog = MockCatalogAPI(objects=catalog_objects)
+
+class MockAsyncOrdersAPI(MockOrdersAPI):
+    async def search(self, **kwargs):
+        return MockOrdersAPI.search(self, **kwargs)
+
+class MockAsyncCatalogAPI(MockCatalogAPI):
+    async def batch_get(self, **kwargs):
+        return MockCatalogAPI.batch_get(self, **kwargs)
+
+class MockAsyncSquareClient:
+    """Stand-in for the AsyncSquare client that serves the mock responses above"""
+    def __init__(self, page_size=1, catalog_objects=None):
+        self.orders = MockAsyncOrdersAPI(page_size=page_size)
+        self.catalog = MockAsyncCatalogAPI(objects=catalog_objects)
@@ -0,0 +1,144 @@
+import json
+import sys
+from collections import OrderedDict
+
+# Registration question (modifier or modifier list key) -> order data row field
+DEFAULT_COLUMNS = {
+    'Scout Name': 'scout_name',
+    'Scouter Name': 'scouter_name',
+    'Rank': 'rank',
+    'Patrol': 'patrol',
+    'Emergency Contact': 'emergency_contact',
+    'Emergency Contact Phone Number': 'emergency_contact_phone',
+    'Cell phone number': 'cell_phone',
+    'Will you travel with the troop to the campout?': 'travel_to_campout'
+}
+
+# Modifiers named exactly after one of these questions, with no answer, record this value
+DEFAULT_UNKNOWN_KEYS = ['Scout Name', 'Scouter Name', 'Rank', 'Patrol']
+DEFAULT_UNKNOWN_VALUE = 'Unknown'
+
+# Parsed names remembered per cache; free-text answers are mostly distinct, so
+# the least recently used are dropped to keep long exports in constant memory
+MAPPING_CACHE_MAX = 10000
+
+# Row fields a rule may target
+ROW_FIELDS = {
+    'scout_name', 'scouter_name', 'rank', 'patrol', 'emergency_contact',
+    'emergency_contact_phone', 'cell_phone', 'travel_to_campout'
+}
+
+
+def normalize_key(key):
+    """Normalize a question key for lookup: collapse whitespace and ignore case"""
+    return ' '.join(key.split()).casefold()
+
+
+def remember(cache, key, value):
+    """Add key to an LRU cache, dropping the least recently used entry once it holds MAPPING_CACHE_MAX"""
+    if len(cache) >= MAPPING_CACHE_MAX:
+        cache.popitem(last=False)
+    cache[key] = value
+
+
+class ModifierMapper:
+    """
+    Maps modifier and modifier list names to order data row fields
+
+    Rules are compiled into a dict from normalized question key to row field.
+    Parsing of recently seen names is memoized in bounded LRU caches, so
+    mapping a shared choice such as a rank or patrol is a dict lookup.
+    """
+
+    def __init__(self, columns=None, unknown_keys=None, unknown_value=DEFAULT_UNKNOWN_VALUE):
+        columns = DEFAULT_COLUMNS if columns is None else columns
+
+        for key, field in columns.items():
+            if field not in ROW_FIELDS:
+                raise ValueError(f"Unknown row field '{field}' for modifier key '{key}'")
+
+        self.columns = {normalize_key(key): field for key, field in columns.items()}
+
+        if unknown_keys is None:
+            # Default placeholder keys apply only to questions these rules map
+            unknown_keys = [key for key in DEFAULT_UNKNOWN_KEYS if normalize_key(key) in self.columns]
+        self.unknown_fields = {}
+        for key in unknown_keys:
+            if normalize_key(key) not in self.columns:
+                raise ValueError(f"Unknown key '{key}' has no column mapping")
+            self.unknown_fields[normalize_key(key)] = self.columns[normalize_key(key)]
+        self.unknown_value = unknown_value
+
+        self._modifier_cache = OrderedDict()
+        self._list_cache = OrderedDict()
+
+    def map_modifier(self, modifier_name):
+        """Return (field, value) for a modifier outside a modifier list, or None"""
+        try:
+            self._modifier_cache.move_to_end(modifier_name)
+            return self._modifier_cache[modifier_name]
+        except KeyError:
+            pass
+
+        mapping = None
+        if ':' in modifier_name:
+            key, value = modifier_name.split(':', 1)
+            field = self.columns.get(normalize_key(key))
+            if field:
+                mapping = (field, value.strip())
+        else:
+            field = self.unknown_fields.get(normalize_key(modifier_name))
+            if field:
+                mapping = (field, self.unknown_value)
+
+        remember(self._modifier_cache, modifier_name, mapping)
+        return mapping
+
+    def map_list_modifier(self, modifier_list_name, modifier_name):
+        """Return (field, value) for a modifier chosen from a modifier list, or None"""
+        cache_key = (modifier_list_name, modifier_name)
+        try:
+            self._list_cache.move_to_end(cache_key)
+            return self._list_cache[cache_key]
+        except KeyError:
+            pass
+
+        if ':' in modifier_list_name:
+            # The list name carries the question and part of the answer
+            key, value = modifier_list_name.split(':', 1)
+            value = value.strip()
+            # If modifier name is not already in the value, append it
+            combined_value = value if modifier_name in value else f"{value} - {modifier_name}"
+        else:
+            # If no colon in modifier list name, treat it as key and modifier name as value
+            key = modifier_list_name
+            combined_value = modifier_name
+
+        field = self.columns.get(normalize_key(key))
+        mapping = (field, combined_value) if field else None
+
+        remember(self._list_cache, cache_key, mapping)
+        return mapping
+
+
+def load_modifier_mapper(path=None):
+    """
+    Build a ModifierMapper from a JSON rules file, or the built-in rules if path is empty
+
+    The file holds {"columns": {question: row_field}, "unknown_keys": [...],
+    "unknown_value": "..."}; keys that are left out fall back to the defaults.
+    """
+    if not path:
+        return ModifierMapper()
+
+    try:
+        with open(path) as f:
+            rules = json.load(f)
+        return ModifierMapper(
+            columns=rules.get('columns'),
+            unknown_keys=rules.get('unknown_keys'),
+            unknown_value=rules.get('unknown_value', DEFAULT_UNKNOWN_VALUE)
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error loading modifier rules from {path}: {e}", file=sys.stderr)
+        sys.exit(1)
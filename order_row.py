@@ -0,0 +1,85 @@
+"""
+Compact order data row and the output schema shared by the CSV and Sheets writers.
+"""
+
+# Order data row fields, in storage order
+ORDER_ROW_FIELDS = (
+    'order_id', 'total_money', 'line_item_name', 'scout_name', 'scouter_name', 'rank', 'patrol',
+    'emergency_contact', 'emergency_contact_phone', 'cell_phone', 'travel_to_campout'
+)
+
+# Column headers for CSV and Google Sheets output, matching OrderRow.output_values()
+OUTPUT_HEADERS = ['Order ID', 'Total Money', 'Line Item Name', 'Name', 'Rank', 'Patrol',
+                  'Emergency Contact', 'Emergency Contact Phone', 'Cell Phone', 'Travel to Campout']
+
+# Patrol written for attendees who did not pick one (adult leaders)
+DEFAULT_PATROL = 'Rocking Chair'
+
+
+class OrderRow:
+    """
+    One line item of order data
+
+    Slotted to keep large exports small; rows still support row['field']
+    access so callers can treat them like the dicts they replace.
+    """
+
+    __slots__ = ORDER_ROW_FIELDS
+
+    def __init__(self, order_id, total_money, line_item_name, scout_name='', scouter_name='', rank='',
+                 patrol='', emergency_contact='', emergency_contact_phone='', cell_phone='',
+                 travel_to_campout=''):
+        self.order_id = order_id
+        self.total_money = total_money
+        self.line_item_name = line_item_name
+        self.scout_name = scout_name
+        self.scouter_name = scouter_name
+        self.rank = rank
+        self.patrol = patrol
+        self.emergency_contact = emergency_contact
+        self.emergency_contact_phone = emergency_contact_phone
+        self.cell_phone = cell_phone
+        self.travel_to_campout = travel_to_campout
+
+    def __getitem__(self, field):
+        if field not in ORDER_ROW_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in ORDER_ROW_FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def items(self):
+        """Return (field, value) pairs, as dict.items() would"""
+        return [(field, getattr(self, field)) for field in ORDER_ROW_FIELDS]
+
+    def __eq__(self, other):
+        if not isinstance(other, OrderRow):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in ORDER_ROW_FIELDS)
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}' for field in ORDER_ROW_FIELDS)
+        return f'OrderRow({values})'
+
+    def output_values(self):
+        """
+        Return the row's values in OUTPUT_HEADERS order
+
+        Scout and scouter names share the Name column, and a missing patrol
+        becomes DEFAULT_PATROL.
+        """
+        return (
+            self.order_id,
+            self.total_money,
+            self.line_item_name,
+            self.scout_name or self.scouter_name,
+            self.rank,
+            self.patrol or DEFAULT_PATROL,
+            self.emergency_contact,
+            self.emergency_contact_phone,
+            self.cell_phone,
+            self.travel_to_campout
+        )
@@ -0,0 +1,359 @@
+import sqlite3
+from types import SimpleNamespace
+
+from order_row import ORDER_ROW_FIELDS, OrderRow
+
+# Row fields filled in by the modifier mapping, stored in order_rows
+MAPPED_FIELDS = ORDER_ROW_FIELDS[3:]
+
+# Name column of the output: the scout's name, or the scouter's for adults
+NAME_EXPRESSION = "COALESCE(NULLIF(scout_name, ''), scouter_name)"
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    location_id TEXT,
+    updated_at TEXT,
+    total_amount INTEGER,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders (updated_at);
+
+CREATE TABLE IF NOT EXISTS line_items (
+    order_id TEXT NOT NULL REFERENCES orders (order_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    uid TEXT,
+    name TEXT,
+    catalog_object_id TEXT,
+    catalog_version INTEGER,
+    variation_name TEXT,
+    PRIMARY KEY (order_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS modifiers (
+    order_id TEXT NOT NULL,
+    line_item_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    uid TEXT,
+    name TEXT,
+    catalog_object_id TEXT,
+    PRIMARY KEY (order_id, line_item_position, position),
+    FOREIGN KEY (order_id, line_item_position) REFERENCES line_items (order_id, position) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS catalog_modifiers (
+    object_id TEXT PRIMARY KEY,
+    name TEXT,
+    modifier_list_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS catalog_modifier_lists (
+    list_id TEXT NOT NULL,
+    catalog_version INTEGER,
+    name TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_catalog_modifier_lists_key
+    ON catalog_modifier_lists (list_id, IFNULL(catalog_version, -1));
+
+CREATE TABLE IF NOT EXISTS order_rows (
+    order_id TEXT NOT NULL,
+    line_item_position INTEGER NOT NULL,
+    {', '.join(f'{field} TEXT NOT NULL' for field in MAPPED_FIELDS)},
+    PRIMARY KEY (order_id, line_item_position),
+    FOREIGN KEY (order_id, line_item_position) REFERENCES line_items (order_id, position) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_order_rows_patrol ON order_rows (patrol);
+CREATE INDEX IF NOT EXISTS idx_order_rows_name ON order_rows ({NAME_EXPRESSION});
+'''
+
+
+def order_row_keys(orders):
+    """Return the (order_id, line_item_position) key of each row built from orders, in row order"""
+    return [(order.id, position) for order in orders for position in range(len(order.line_items))]
+
+
+class OrderStore:
+    """
+    Local SQLite copy of synced orders, the catalog names they reference and
+    the order data rows built from them
+
+    Orders, line items and modifiers are stored as fetched, so order_rows can
+    be rebuilt under a new modifier mapping without calling Square. Rows come
+    back in the order their orders were first stored.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            # Transform workers only read; in WAL mode they can while the parent writes rows
+            self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            return
+        # The --async pipeline writes to the store from its event loop thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def upsert_orders(self, orders, modifier_details, modifier_list_details, rows):
+        """
+        Store a page of orders with their resolved catalog names and rows in one transaction
+
+        rows are extract_order_data() output for orders: one row per line
+        item, in order. Line items, modifiers and rows of an order that was
+        stored before are replaced.
+        """
+        order_values = []
+        line_item_values = []
+        modifier_values = []
+        row_keys = []
+        catalog_modifier_values = {}
+        catalog_list_keys = set()
+
+        for order in orders:
+            total_money = order.total_money
+            order_values.append((
+                order.id,
+                getattr(order, 'location_id', None),
+                getattr(order, 'updated_at', None),
+                total_money.amount if total_money else None,
+                total_money.currency if total_money else None
+            ))
+            for position, line_item in enumerate(getattr(order, 'line_items', None) or []):
+                line_item_values.append((
+                    order.id, position, line_item.uid, line_item.name,
+                    getattr(line_item, 'catalog_object_id', None), line_item.catalog_version,
+                    getattr(line_item, 'variation_name', None)
+                ))
+                row_keys.append((order.id, position))
+                for modifier_position, modifier in enumerate(getattr(line_item, 'modifiers', None) or []):
+                    modifier_values.append((
+                        order.id, position, modifier_position, modifier.uid, modifier.name,
+                        modifier.catalog_object_id
+                    ))
+                    modifier_data = getattr(modifier_details.get(modifier.catalog_object_id), 'modifier_data', None)
+                    if modifier_data is None:
+                        continue
+                    modifier_list_id = getattr(modifier_data, 'modifier_list_id', None)
+                    catalog_modifier_values[modifier.catalog_object_id] = (
+                        modifier.catalog_object_id, getattr(modifier_data, 'name', None), modifier_list_id
+                    )
+                    if modifier_list_id:
+                        catalog_list_keys.add((line_item.catalog_version, modifier_list_id))
+
+        catalog_list_values = []
+        for catalog_version, list_id in catalog_list_keys:
+            modifier_list_data = getattr(
+                modifier_list_details.get((catalog_version, list_id)), 'modifier_list_data', None
+            )
+            if modifier_list_data is not None:
+                catalog_list_values.append((list_id, catalog_version, getattr(modifier_list_data, 'name', None)))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO orders (order_id, location_id, updated_at, total_amount, currency)'
+                ' VALUES (?, ?, ?, ?, ?)'
+                ' ON CONFLICT (order_id) DO UPDATE SET location_id = excluded.location_id,'
+                ' updated_at = excluded.updated_at, total_amount = excluded.total_amount,'
+                ' currency = excluded.currency',
+                order_values
+            )
+            # Deleting line items cascades to their modifiers and rows
+            self.conn.executemany(
+                'DELETE FROM line_items WHERE order_id = ?', [(values[0],) for values in order_values]
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO line_items'
+                ' (order_id, position, uid, name, catalog_object_id, catalog_version, variation_name)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                line_item_values
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO modifiers'
+                ' (order_id, line_item_position, position, uid, name, catalog_object_id)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                modifier_values
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO catalog_modifiers (object_id, name, modifier_list_id) VALUES (?, ?, ?)',
+                catalog_modifier_values.values()
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO catalog_modifier_lists (list_id, catalog_version, name) VALUES (?, ?, ?)',
+                catalog_list_values
+            )
+            self.insert_rows(row_keys, rows)
+
+    def insert_rows(self, row_keys, rows):
+        columns = ', '.join(MAPPED_FIELDS)
+        placeholders = ', '.join('?' * (len(MAPPED_FIELDS) + 2))
+        self.conn.executemany(
+            f'INSERT OR REPLACE INTO order_rows (order_id, line_item_position, {columns}) VALUES ({placeholders})',
+            [
+                (order_id, position, *(getattr(row, field) for field in MAPPED_FIELDS))
+                for (order_id, position), row in zip(row_keys, rows)
+            ]
+        )
+
+    def load_catalog(self):
+        """Return (modifier_details, modifier_list_details) rebuilt from the stored catalog names"""
+        modifier_details = {
+            object_id: SimpleNamespace(
+                id=object_id, modifier_data=SimpleNamespace(name=name, modifier_list_id=modifier_list_id)
+            )
+            for object_id, name, modifier_list_id in self.conn.execute(
+                'SELECT object_id, name, modifier_list_id FROM catalog_modifiers'
+            )
+        }
+        modifier_list_details = {
+            (catalog_version, list_id): SimpleNamespace(id=list_id, modifier_list_data=SimpleNamespace(name=name))
+            for list_id, catalog_version, name in self.conn.execute(
+                'SELECT list_id, catalog_version, name FROM catalog_modifier_lists'
+            )
+        }
+        return modifier_details, modifier_list_details
+
+    def order_batches(self, batch_size=1000):
+        """Return (first rowid, last rowid) bounds of consecutive batches of batch_size stored orders"""
+        return self.conn.execute(
+            'SELECT MIN(rowid), MAX(rowid) FROM'
+            ' (SELECT rowid, (ROW_NUMBER() OVER (ORDER BY rowid) - 1) / ? AS batch FROM orders)'
+            ' GROUP BY batch ORDER BY batch',
+            (batch_size,)
+        ).fetchall()
+
+    def load_orders(self, bounds):
+        """Return the stored orders with rowids within bounds, rebuilt as lightweight order objects"""
+        orders = {}
+        for order_id, updated_at, total_amount, currency in self.conn.execute(
+            'SELECT order_id, updated_at, total_amount, currency FROM orders'
+            ' WHERE rowid BETWEEN ? AND ? ORDER BY rowid',
+            bounds
+        ):
+            total_money = None
+            if total_amount is not None:
+                total_money = SimpleNamespace(amount=total_amount, currency=currency)
+            orders[order_id] = SimpleNamespace(
+                id=order_id, updated_at=updated_at, total_money=total_money, line_items=[]
+            )
+
+        line_items = {}
+        for order_id, position, uid, name, catalog_object_id, catalog_version, variation_name in self.conn.execute(
+            'SELECT l.order_id, l.position, l.uid, l.name, l.catalog_object_id, l.catalog_version,'
+            ' l.variation_name FROM line_items l JOIN orders o ON o.order_id = l.order_id'
+            ' WHERE o.rowid BETWEEN ? AND ? ORDER BY l.order_id, l.position',
+            bounds
+        ):
+            line_item = SimpleNamespace(
+                uid=uid, name=name, catalog_object_id=catalog_object_id, catalog_version=catalog_version,
+                variation_name=variation_name, modifiers=[]
+            )
+            orders[order_id].line_items.append(line_item)
+            line_items[(order_id, position)] = line_item
+
+        for order_id, line_item_position, uid, name, catalog_object_id in self.conn.execute(
+            'SELECT m.order_id, m.line_item_position, m.uid, m.name, m.catalog_object_id'
+            ' FROM modifiers m JOIN orders o ON o.order_id = m.order_id'
+            ' WHERE o.rowid BETWEEN ? AND ? ORDER BY m.order_id, m.line_item_position, m.position',
+            bounds
+        ):
+            line_items[(order_id, line_item_position)].modifiers.append(
+                SimpleNamespace(uid=uid, name=name, catalog_object_id=catalog_object_id)
+            )
+
+        return list(orders.values())
+
+    def iter_orders(self, batch_size=1000):
+        """Yield lists of stored orders, rebuilt as lightweight order objects, in stored order"""
+        for bounds in self.order_batches(batch_size):
+            yield self.load_orders(bounds)
+
+    def rebuild_rows(self, build_rows):
+        """
+        Rebuild every stored row with build_rows(orders, modifier_details, modifier_list_details)
+
+        Used after the modifier mapping changes; no API calls are needed.
+        Returns the number of rows rebuilt.
+        """
+        modifier_details, modifier_list_details = self.load_catalog()
+        return self.replace_rows(
+            (order_row_keys(orders), build_rows(orders, modifier_details, modifier_list_details))
+            for orders in self.iter_orders()
+        )
+
+    def replace_rows(self, row_batches):
+        """
+        Replace every stored row with (row_keys, rows) batches in one transaction
+
+        Batches are consumed inside the transaction, so they may be built
+        lazily. Returns the number of rows written.
+        """
+        count = 0
+        with self.conn:
+            self.conn.execute('DELETE FROM order_rows')
+            for row_keys, rows in row_batches:
+                self.insert_rows(row_keys, rows)
+                count += len(rows)
+        return count
+
+    def iter_rows(self, order_ids=None, patrol=None, name=None, location_ids=None):
+        """
+        Yield stored rows as OrderRow objects, optionally only for some orders,
+        a patrol, an attendee name or some locations
+
+        patrol and name match the output columns (so a missing patrol is not
+        'Rocking Chair' here) and use the indexes on order_rows. The store may
+        hold orders of locations a run is not syncing, so runs pass their
+        location_ids.
+        """
+        conditions = []
+        params = []
+        if location_ids is not None:
+            conditions.append(f"o.location_id IN ({', '.join('?' * len(location_ids))})")
+            params.extend(location_ids)
+        if order_ids is not None:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS selected_orders (order_id TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM selected_orders')
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO selected_orders (order_id) VALUES (?)', [(order_id,) for order_id in order_ids]
+            )
+            conditions.append('r.order_id IN (SELECT order_id FROM selected_orders)')
+        if patrol is not None:
+            conditions.append('r.patrol = ?')
+            params.append(patrol)
+        if name is not None:
+            conditions.append(f'{NAME_EXPRESSION} = ?')
+            params.append(name)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        cursor = self.conn.execute(
+            f'SELECT r.order_id, o.total_amount, o.currency, l.name, {", ".join("r." + f for f in MAPPED_FIELDS)}'
+            ' FROM order_rows r'
+            ' JOIN orders o ON o.order_id = r.order_id'
+            ' JOIN line_items l ON l.order_id = r.order_id AND l.position = r.line_item_position'
+            f' {where} ORDER BY o.rowid, r.line_item_position',
+            params
+        )
+        for order_id, total_amount, currency, line_item_name, *mapped in cursor:
+            total_money = f"{total_amount} {currency}" if total_amount is not None else "0 USD"
+            yield OrderRow(order_id, total_money, line_item_name, *mapped)
+
+    def order_locations(self, location_ids=None):
+        """Return {order_id: location_id} for every stored order, optionally only of some locations"""
+        if location_ids is None:
+            return dict(self.conn.execute('SELECT order_id, location_id FROM orders'))
+        return dict(self.conn.execute(
+            f"SELECT order_id, location_id FROM orders WHERE location_id IN ({', '.join('?' * len(location_ids))})",
+            location_ids
+        ))
+
+    def count_orders(self, location_ids=None):
+        if location_ids is None:
+            return self.conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM orders WHERE location_id IN ({', '.join('?' * len(location_ids))})",
+            location_ids
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,219 @@
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+from run_metrics import metrics
+
+# HTTP statuses worth retrying: throttling, timeouts and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Square SDK calls are made with its own retries disabled so this layer owns them
+SQUARE_REQUEST_OPTIONS = {'max_retries': 0}
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing rate requests per second with bursts up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative; later callers queue up behind earlier ones
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        # asyncio is already loaded once an event loop is running; importing it here keeps startup fast
+        import asyncio
+
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class EndpointPolicy:
+    """Rate, concurrency and retry settings for one API endpoint"""
+
+    def __init__(self, name, rate, burst, max_concurrency, max_retries=None, base_delay=0.5, max_delay=30.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.max_retries = Config.API_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the endpoint's concurrency slots"""
+        if self.semaphore is None:
+            yield
+            return
+        with self.semaphore:
+            yield
+
+    def backoff_delay(self, attempt, error):
+        """Seconds to wait before retry number attempt + 1"""
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+ENDPOINTS = {
+    'square.orders.search': EndpointPolicy(
+        'square.orders.search', Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_CONCURRENCY
+    ),
+    'square.catalog.batch_get': EndpointPolicy(
+        'square.catalog.batch_get', Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_CONCURRENCY
+    ),
+    'square.catalog.list': EndpointPolicy(
+        'square.catalog.list', Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_QPS, Config.SQUARE_MAX_CONCURRENCY
+    ),
+    # Sheets quotas are counted per minute, so allow short bursts above the average rate
+    'sheets': EndpointPolicy(
+        'sheets', Config.SHEETS_MAX_QPS, 10, Config.SHEETS_MAX_CONCURRENCY
+    ),
+}
+
+
+def get_status_code(error):
+    """Return the HTTP status of a Square, Sheets or httpx error, or None"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        return int(resp.status)
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def get_retry_after(error):
+    """Return the Retry-After delay in seconds carried by an error, or None"""
+    headers = getattr(error, 'headers', None) or getattr(error, 'resp', None)
+    if headers is None:
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    value = None
+    for key in ('retry-after', 'Retry-After'):
+        if key in headers:
+            value = headers[key]
+            break
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    # Only HTTP-date values need the email package, which is slow to import
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """Return True for throttling, server errors and transient network failures"""
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # httpx loads with the Square client, so its errors can only occur once it is imported
+    httpx = sys.modules.get('httpx')
+    return httpx is not None and isinstance(error, (
+        httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError
+    ))
+
+
+def log_retry(policy, attempt, error, delay):
+    status_code = get_status_code(error)
+    reason = f"HTTP {status_code}" if status_code else type(error).__name__
+    print(f"{policy.name}: {reason}, retry {attempt + 1}/{policy.max_retries} in {delay:.1f}s", file=sys.stderr)
+
+
+def execute(endpoint, call, *args, **kwargs):
+    """
+    Call call(*args, **kwargs) under the endpoint's rate, concurrency and retry policy
+
+    Retryable failures are retried with exponential backoff and jitter, or after
+    the server's Retry-After delay. The last error is raised once retries run out.
+    """
+    policy = ENDPOINTS[endpoint]
+    attempt = 0
+
+    while True:
+        with policy.slot():
+            if policy.bucket is not None:
+                policy.bucket.acquire()
+            metrics.count_call(endpoint)
+            try:
+                return call(*args, **kwargs)
+            except Exception as e:
+                metrics.count_error(endpoint)
+                if attempt >= policy.max_retries or not is_retryable(e):
+                    raise
+                error = e
+
+        delay = policy.backoff_delay(attempt, error)
+        log_retry(policy, attempt, error, delay)
+        policy.retries += 1
+        metrics.count_retry(endpoint)
+        attempt += 1
+        time.sleep(delay)
+
+
+async def execute_async(endpoint, call, *args, **kwargs):
+    """
+    Async counterpart of execute() for coroutine functions
+
+    Concurrency is left to the caller's asyncio.Semaphore; blocking on the
+    thread semaphore here would stall the event loop.
+    """
+    import asyncio
+
+    policy = ENDPOINTS[endpoint]
+    attempt = 0
+
+    while True:
+        if policy.bucket is not None:
+            await policy.bucket.acquire_async()
+        metrics.count_call(endpoint)
+        try:
+            return await call(*args, **kwargs)
+        except Exception as e:
+            metrics.count_error(endpoint)
+            if attempt >= policy.max_retries or not is_retryable(e):
+                raise
+            error = e
+
+        delay = policy.backoff_delay(attempt, error)
+        log_retry(policy, attempt, error, delay)
+        policy.retries += 1
+        metrics.count_retry(endpoint)
+        attempt += 1
+        await asyncio.sleep(delay)
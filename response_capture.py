@@ -0,0 +1,172 @@
+"""
+Capture of raw Square API responses for offline replay.
+
+With --capture PATH, every successful orders.search and catalog.batch_get
+response is appended to PATH together with the request body that produced
+it. Records are length-prefixed, so concurrent requests and later runs can
+keep appending to the same file:
+
+    file   := MAGIC record*
+    record := kind (1 byte) request length (4 bytes LE) response length (4 bytes LE)
+              request body, response body
+
+Replay memory-maps the file and walks the record headers in place. A payload
+is only decoded when its kind is asked for, directly from the mapping. The
+decoded orders and catalog objects are ReplayObjects, with the same
+attributes as the SDK models, so extract_modifier_list_ids() and
+extract_order_data() can read them. A record cut short by an interrupted run
+is ignored on replay, and cut off the file by the next run that appends.
+"""
+
+import json
+import mmap
+import struct
+import threading
+
+MAGIC = b'SQUARE-CAPTURE 1\n'
+HEADER = struct.Struct('<BII')
+
+# Record kinds
+ORDERS_SEARCH = 1
+CATALOG_BATCH_GET = 2
+
+# Square API paths whose responses are captured, by record kind
+CAPTURED_PATHS = {
+    '/v2/orders/search': ORDERS_SEARCH,
+    '/v2/catalog/batch-retrieve': CATALOG_BATCH_GET
+}
+
+
+class ReplayObject:
+    """Attribute view of a decoded JSON object; fields the JSON leaves out read as None, as on SDK models"""
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name):
+        # Only called for missing attributes; dunder lookups (pickle, copy) must still fail
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return None
+
+    def __repr__(self):
+        return f"ReplayObject({self.__dict__!r})"
+
+
+class ResponseCapture:
+    """Append-only writer of captured responses, shared by all threads of a run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        self.file.seek(0)
+        magic = self.file.read(len(MAGIC))
+        if MAGIC.startswith(magic) and len(magic) < len(MAGIC):
+            # New file, or a run was interrupted before the magic was written
+            self.file.truncate(0)
+            self.file.write(MAGIC)
+            self.file.flush()
+        elif magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a Square response capture")
+        else:
+            # Drop a record cut short by an interrupted run, so this run's
+            # records are not appended after it where replay cannot reach them
+            self.file.truncate(complete_length(self.file))
+
+    def append(self, kind, request, response):
+        """Append one record; the whole record goes out in a single write and is flushed"""
+        record = HEADER.pack(kind, len(request), len(response)) + request + response
+        with self.lock:
+            self.file.write(record)
+            self.file.flush()
+            self.records += 1
+
+    def capture(self, response):
+        """Record an httpx response if it is a successful call to a captured endpoint"""
+        kind = CAPTURED_PATHS.get(response.request.url.path)
+        if kind and response.is_success:
+            self.append(kind, response.request.content, response.content)
+
+    def on_response(self, response):
+        """httpx.Client response event hook"""
+        response.read()
+        self.capture(response)
+
+    async def on_response_async(self, response):
+        """httpx.AsyncClient response event hook"""
+        await response.aread()
+        self.capture(response)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def complete_length(f):
+    """Return the length of the capture in f up to the end of its last complete record"""
+    size = f.seek(0, 2)
+    offset = len(MAGIC)
+    while offset + HEADER.size <= size:
+        f.seek(offset)
+        _, request_length, response_length = HEADER.unpack(f.read(HEADER.size))
+        end = offset + HEADER.size + request_length + response_length
+        if end > size:
+            break
+        offset = end
+    return offset
+
+
+def decode(payload):
+    """Decode a JSON payload straight from the mapping into ReplayObjects"""
+    return json.loads(str(payload, 'utf-8'), object_hook=ReplayObject)
+
+
+def iter_records(path, kinds):
+    """Yield (kind, request, response) for the records of the given kinds, decoded, in file order"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Square response capture")
+
+        offset = len(MAGIC)
+        size = len(mapped)
+        with memoryview(mapped) as view:
+            while offset + HEADER.size <= size:
+                kind, request_length, response_length = HEADER.unpack_from(mapped, offset)
+                start = offset + HEADER.size
+                end = start + request_length + response_length
+                if end > size:
+                    # Cut short by an interrupted run
+                    return
+                if kind in kinds:
+                    with view[start:start + request_length] as request, view[start + request_length:end] as response:
+                        decoded = (decode(request) if request_length else None, decode(response))
+                    yield (kind,) + decoded
+                offset = end
+
+
+def iter_captured_order_pages(path):
+    """Yield each captured orders.search page as a list of orders"""
+    for _, _, response in iter_records(path, {ORDERS_SEARCH}):
+        yield response.orders or []
+
+
+def load_captured_catalog(path):
+    """
+    Return (modifier_details, modifier_list_details) from the captured catalog responses
+
+    Keyed as the live pipeline keys them: modifiers by object ID, modifier
+    lists by (catalog_version, object ID) using the requested version.
+    """
+    modifier_details = {}
+    modifier_list_details = {}
+    for _, request, response in iter_records(path, {CATALOG_BATCH_GET}):
+        catalog_version = request.catalog_version if request is not None else None
+        for obj in response.objects or []:
+            if obj.type == 'MODIFIER_LIST':
+                modifier_list_details[(catalog_version, obj.id)] = obj
+            else:
+                modifier_details[obj.id] = obj
+    return modifier_details, modifier_list_details
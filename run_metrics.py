@@ -0,0 +1,251 @@
+"""
+Per-run instrumentation for the Square to Google Sheets sync.
+
+Records wall time per pipeline stage, API calls, errors and retries per
+endpoint, bytes sent and received per API, rows produced and cache hit
+rates. The totals are written as a JSON run report and, optionally, as a
+Prometheus textfile for the node_exporter textfile collector.
+"""
+
+import calendar
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from sync_state import write_json_atomic, write_text_atomic
+
+# Prefix for every metric in the Prometheus textfile
+PROMETHEUS_PREFIX = 'square_sync'
+
+
+class RunMetrics:
+    """Thread-safe counters and stage timings for one sync run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.started = time.perf_counter()
+            self.span_seconds = Counter()
+            self.span_counts = Counter()
+            self.api_calls = Counter()
+            self.api_errors = Counter()
+            self.api_retries = Counter()
+            self.bytes_sent = Counter()
+            self.bytes_received = Counter()
+            self.rows = Counter()
+            self.caches = {}
+
+    @contextmanager
+    def span(self, name):
+        """
+        Add the wall time of the with-block to the named stage
+
+        Stages entered repeatedly (once per page, say) accumulate, and stages
+        running concurrently in the async mode each count their own wall time.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.span_seconds[name] += elapsed
+                self.span_counts[name] += 1
+
+    def count_call(self, endpoint):
+        with self.lock:
+            self.api_calls[endpoint] += 1
+
+    def count_error(self, endpoint):
+        with self.lock:
+            self.api_errors[endpoint] += 1
+
+    def count_retry(self, endpoint):
+        with self.lock:
+            self.api_retries[endpoint] += 1
+
+    def add_bytes(self, api, sent=0, received=0):
+        with self.lock:
+            self.bytes_sent[api] += sent
+            self.bytes_received[api] += received
+
+    def add_rows(self, stage, count):
+        with self.lock:
+            self.rows[stage] += count
+
+    def set_cache(self, name, hits, misses):
+        with self.lock:
+            self.caches[name] = (hits, misses)
+
+    def report(self, status='ok'):
+        """Return the run report as a JSON-serializable dict"""
+        with self.lock:
+            caches = {}
+            for name, (hits, misses) in self.caches.items():
+                lookups = hits + misses
+                caches[name] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / lookups, 4) if lookups else None
+                }
+            endpoints = sorted(set(self.api_calls) | set(self.api_errors) | set(self.api_retries))
+            return {
+                'status': status,
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+                'duration_seconds': round(time.perf_counter() - self.started, 6),
+                'spans': {
+                    name: {'seconds': round(self.span_seconds[name], 6), 'count': self.span_counts[name]}
+                    for name in sorted(self.span_seconds)
+                },
+                'api': {
+                    endpoint: {
+                        'calls': self.api_calls[endpoint],
+                        'errors': self.api_errors[endpoint],
+                        'retries': self.api_retries[endpoint]
+                    }
+                    for endpoint in endpoints
+                },
+                'bytes': {
+                    api: {'sent': self.bytes_sent[api], 'received': self.bytes_received[api]}
+                    for api in sorted(set(self.bytes_sent) | set(self.bytes_received))
+                },
+                'rows': dict(sorted(self.rows.items())),
+                'caches': caches
+            }
+
+
+# Process-wide metrics for the current run
+metrics = RunMetrics()
+
+
+def timed(name):
+    """Decorator recording each call of a function as the named stage"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def httpx_event_hooks(api):
+    """httpx.Client event hooks that count request and response bytes for api"""
+    def on_request(request):
+        metrics.add_bytes(api, sent=len(request.content))
+
+    def on_response(response):
+        response.read()
+        metrics.add_bytes(api, received=len(response.content))
+
+    return {'request': [on_request], 'response': [on_response]}
+
+
+def httpx_async_event_hooks(api):
+    """httpx.AsyncClient counterpart of httpx_event_hooks()"""
+    async def on_request(request):
+        metrics.add_bytes(api, sent=len(request.content))
+
+    async def on_response(response):
+        await response.aread()
+        metrics.add_bytes(api, received=len(response.content))
+
+    return {'request': [on_request], 'response': [on_response]}
+
+
+def write_json_report(path, report):
+    """Write the run report to path, replacing any previous report atomically"""
+    write_json_atomic(path, report, indent=2)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def format_prometheus(report):
+    """Render the run report in the Prometheus text exposition format"""
+    samples = {}
+
+    def add(name, help_text, value, labels=None):
+        metric = f'{PROMETHEUS_PREFIX}_{name}'
+        entry = samples.setdefault(metric, (help_text, []))
+        entry[1].append((labels, value))
+
+    add('last_run_timestamp_seconds', 'Unix time the last sync run started',
+        calendar.timegm(time.strptime(report['started_at'], '%Y-%m-%dT%H:%M:%SZ')))
+    add('last_run_success', '1 if the last sync run succeeded', 1 if report['status'] == 'ok' else 0)
+    add('last_run_duration_seconds', 'Wall time of the last sync run', report['duration_seconds'])
+    for name, span in report['spans'].items():
+        add('span_seconds', 'Wall time spent in each stage', span['seconds'], {'span': name})
+    for endpoint, counts in report['api'].items():
+        add('api_calls', 'API requests made, including retries', counts['calls'], {'endpoint': endpoint})
+        add('api_errors', 'API requests that failed', counts['errors'], {'endpoint': endpoint})
+        add('api_retries', 'API requests retried after a transient failure', counts['retries'],
+            {'endpoint': endpoint})
+    for api, counts in report['bytes'].items():
+        add('bytes_sent', 'Request body bytes sent', counts['sent'], {'api': api})
+        add('bytes_received', 'Response body bytes received', counts['received'], {'api': api})
+    for stage, count in report['rows'].items():
+        add('rows', 'Orders fetched and rows produced', count, {'stage': stage})
+    for name, cache in report['caches'].items():
+        add('cache_hits', 'Cache lookups answered from the cache', cache['hits'], {'cache': name})
+        add('cache_misses', 'Cache lookups that fell through to the API', cache['misses'], {'cache': name})
+
+    lines = []
+    for metric, (help_text, values) in samples.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} gauge')
+        for labels, value in values:
+            lines.append(f'{metric}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(path, report):
+    """Write the run report as a Prometheus textfile; the collector must never see a partial file"""
+    write_text_atomic(path, format_prometheus(report))
+
+
+def format_markdown(report):
+    """Render the run report as a Markdown summary, e.g. for a GitHub Actions job summary"""
+    lines = [
+        f"Run **{report['status']}** in {report['duration_seconds']:.2f}s",
+        '',
+        '| Stage | Seconds | Count |',
+        '|---|---|---|'
+    ]
+    for name, span in report['spans'].items():
+        lines.append(f"| {name} | {span['seconds']:.2f} | {span['count']} |")
+    lines += ['', '| Endpoint | Calls | Errors | Retries |', '|---|---|---|---|']
+    for endpoint, counts in report['api'].items():
+        lines.append(f"| {endpoint} | {counts['calls']} | {counts['errors']} | {counts['retries']} |")
+    lines.append('')
+    lines.append(', '.join(f'{stage}: {count}' for stage, count in report['rows'].items()))
+    for name, cache in report['caches'].items():
+        hit_rate = 'n/a' if cache['hit_rate'] is None else f"{cache['hit_rate']:.0%}"
+        lines.append(f"{name} cache hit rate: {hit_rate}")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print a JSON run report as a Markdown summary')
+    parser.add_argument('report', help='Path of the JSON run report')
+    args = parser.parse_args()
+
+    with open(args.report) as f:
+        print(format_markdown(json.load(f)), end='')
+
+
+if __name__ == "__main__":
+    main()
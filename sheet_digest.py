@@ -0,0 +1,90 @@
+"""
+Content digests of the tables last written to Google Sheets.
+
+Each tab's digest state holds one digest per sheet row (header included) and
+one for the whole table. Comparing a new table against it tells whether a
+write can be skipped entirely, or which rows need to be sent.
+"""
+
+import hashlib
+import json
+import os
+
+from sync_state import write_json_atomic
+
+# Separates values inside a row digest so ('ab', 'c') and ('a', 'bc') differ
+VALUE_SEPARATOR = '\x1f'
+
+
+def row_digest(row):
+    """Return a short, stable hex digest of one row of sheet values"""
+    text = VALUE_SEPARATOR.join('' if value is None else str(value) for value in row)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def table_digest(row_digests):
+    """Return the digest of a whole table from its row digests, in order"""
+    return hashlib.blake2b(''.join(row_digests).encode('ascii'), digest_size=16).hexdigest()
+
+
+def digest_rows(rows):
+    """Return {'table': ..., 'rows': [...]} for a table of sheet values"""
+    row_digests = [row_digest(row) for row in rows]
+    return {'table': table_digest(row_digests), 'rows': row_digests}
+
+
+def changed_row_runs(old_rows, new_rows):
+    """
+    Return (start, end) row index ranges where new_rows digests differ from old_rows
+
+    Rows past the end of old_rows count as changed. Adjacent changed rows
+    are merged into one range so each can be written with one request.
+    """
+    runs = []
+    for index, digest in enumerate(new_rows):
+        if index < len(old_rows) and old_rows[index] == digest:
+            continue
+        if runs and runs[-1][1] == index:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+    return [tuple(run) for run in runs]
+
+
+def digest_key(sheet_id, sheet_name):
+    return f'{sheet_id}/{sheet_name}'
+
+
+def load_digests(path):
+    """Load the digest state saved after the last write, or an empty one"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading sheet digests from {path}, rewriting the sheet in full: {e}")
+        return {}
+
+
+def save_digests(path, digests):
+    """Atomically persist the digest state after a successful write"""
+    write_json_atomic(path, digests)
+
+
+def forget_digests(path, sheet_id, sheet_names):
+    """
+    Drop the saved digests of tabs written other than by an overwrite
+
+    Appends and upserts change a tab without recording its contents, so the
+    next overwrite must rewrite those tabs in full rather than trust stale
+    digests.
+    """
+    if not path:
+        return
+    digests = load_digests(path)
+    keys = [digest_key(sheet_id, sheet_name) for sheet_name in sheet_names]
+    if any(key in digests for key in keys):
+        for key in keys:
+            digests.pop(key, None)
+        save_digests(path, digests)
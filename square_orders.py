@@ -1,18 +1,89 @@
-import csv
 import sys
 import argparse
-from square import Square
-from square.environment import SquareEnvironment
+import queue
+import threading
 from collections import defaultdict
 from config import Config
+from catalog_cache import CatalogCache
+from order_store import OrderStore
+from location_routing import load_location_routes, route_rows
+from sync_state import Watermark, load_watermark, save_watermark
+from modifier_mapping import load_modifier_mapper
+from order_row import OrderRow
+from csv_export import write_csv
+from rate_limit import SQUARE_REQUEST_OPTIONS, execute
+from run_metrics import httpx_event_hooks, metrics, write_json_report, write_prometheus_textfile
 
-client = Square(
-    environment=SquareEnvironment.PRODUCTION,
-    token=Config.SQUARE_ACCESS_TOKEN
-)
+def create_square_client(base_url=None, token=None):
+    """Create a Square client for production, or for base_url / SQUARE_BASE_URL when set"""
+    # The SDK and httpx take most of the startup time, so they load on first use
+    import httpx
+    from square import Square
+    from square.environment import SquareEnvironment
+
+    # The hooks count bytes for the run report, and record responses with --capture
+    event_hooks = httpx_event_hooks('square')
+    if response_capture is not None:
+        event_hooks['response'].append(response_capture.on_response)
+
+    return Square(
+        environment=SquareEnvironment.PRODUCTION,
+        token=token or Config.SQUARE_ACCESS_TOKEN,
+        base_url=base_url or Config.SQUARE_BASE_URL or None,
+        # Same timeout as the SDK default
+        httpx_client=httpx.Client(timeout=60, event_hooks=event_hooks)
+    )
+
+# Square client, created on first use by get_client() (tests swap in mocks)
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the shared Square client, creating it on first use"""
+    global client
+    with _client_lock:
+        if client is None:
+            client = create_square_client()
+        return client
 
 FETCH_LIMIT = Config.SQUARE_FETCH_LIMIT
 
+# Persistent catalog object cache, opened by main() when enabled
+catalog_cache = None
+
+# Index of the current modifiers and modifier lists, loaded or prewarmed by main()
+catalog_index = None
+
+# Local SQLite order store, opened by main() when enabled
+order_store = None
+
+# Raw response capture file, opened by main() with --capture
+response_capture = None
+
+# Location -> (sheet ID, tab) routes for Sheets output, loaded by main()
+location_routes = {}
+
+# Location ID of each fetched order, recorded only when rows are routed by location
+order_locations = None
+
+# Locations whose orders search reached its last page in this run; an
+# incremental run saves its watermark only once every location has
+completed_locations = set()
+
+# Modifier-to-column rules, loaded on first use by get_modifier_mapper()
+modifier_mapper = None
+
+# Maximum number of object IDs Square accepts in a single catalog batch_get request
+CATALOG_BATCH_LIMIT = 1000
+
+# Resolved modifiers kept in memory between pages before one-off modifiers are dropped
+MODIFIER_DETAILS_MAX = 5000
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 def extract_modifier_list_ids(orders):
     """Extract modifier list IDs from orders"""
     modifier_list_ids = []
@@ -28,30 +99,144 @@ def extract_modifier_list_ids(orders):
     
     return dict(catalog_versions)
 
+def parse_catalog_result(result, catalog_version):
+    """Report API errors in a batch_get response and return the objects it contains"""
+    objects = []
+
+    if hasattr(result, 'errors') and result.errors:
+        print(f"API returned errors for catalog version {catalog_version}: {result.errors}", file=sys.stderr)
+
+    if hasattr(result, 'objects') and result.objects:
+        for obj in result.objects:
+            if hasattr(obj, 'id') and obj.id:
+                objects.append(obj)
+
+    return objects
+
+def fetch_catalog_chunk(catalog_version, object_ids, description='catalog objects'):
+    """Make one batch_get call for object_ids at catalog_version and return the objects"""
+    try:
+        result = execute(
+            'square.catalog.batch_get', get_client().catalog.batch_get,
+            object_ids=object_ids,
+            catalog_version=catalog_version,
+            request_options=SQUARE_REQUEST_OPTIONS
+        )
+        return parse_catalog_result(result, catalog_version)
+
+    except Exception as e:
+        print(f"Error fetching {description} for catalog version {catalog_version}: {e}", file=sys.stderr)
+        return []
+
+def plan_catalog_fetch(catalog_versions_dict):
+    """
+    Split a catalog lookup into index and cache hits and batch_get tasks
+
+    Returns (resolved, tasks) where resolved is {catalog_version: {object_id: obj}}
+    pre-filled from the catalog index and the local cache and tasks is a list of
+    (catalog_version, chunk) pairs still to fetch, each chunk at most
+    CATALOG_BATCH_LIMIT IDs.
+    """
+    resolved = {}
+    tasks = []
+
+    for catalog_version, object_ids in catalog_versions_dict.items():
+        # Remove duplicates while preserving order
+        unique_object_ids = list(dict.fromkeys(object_ids))
+        resolved[catalog_version] = {}
+
+        if catalog_index is not None:
+            resolved[catalog_version].update(catalog_index.get_many(catalog_version, unique_object_ids))
+            unique_object_ids = [
+                object_id for object_id in unique_object_ids
+                if object_id not in resolved[catalog_version]
+            ]
+
+        if catalog_cache is not None:
+            resolved[catalog_version].update(catalog_cache.get_many(catalog_version, unique_object_ids))
+            unique_object_ids = [
+                object_id for object_id in unique_object_ids
+                if object_id not in resolved[catalog_version]
+            ]
+
+        for chunk in chunked(unique_object_ids, CATALOG_BATCH_LIMIT):
+            tasks.append((catalog_version, chunk))
+
+    return resolved, tasks
+
+def merge_catalog_results(resolved, tasks, results):
+    """Merge fetched objects into resolved in task order and store them in the cache"""
+    # The SQLite cache connection belongs to this thread, so store results here
+    for (catalog_version, _), objects in zip(tasks, results):
+        for obj in objects:
+            resolved[catalog_version][obj.id] = obj
+        if catalog_cache is not None:
+            catalog_cache.put_many(catalog_version, objects)
+
+    return resolved
+
+def resolve_catalog_objects(catalog_versions_dict, description='catalog objects', max_workers=None):
+    """
+    Fetch catalog objects for each catalog version, consulting the local cache first
+
+    Misses are split into CATALOG_BATCH_LIMIT sized chunks and fetched on up to
+    max_workers threads. Results are merged in catalog version then chunk order,
+    so the outcome is the same as fetching them one after another. Returns
+    {catalog_version: {object_id: obj}}.
+    """
+    max_workers = max_workers or Config.CATALOG_MAX_WORKERS
+    resolved, tasks = plan_catalog_fetch(catalog_versions_dict)
+
+    if len(tasks) > 1 and max_workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            results = list(executor.map(
+                lambda task: fetch_catalog_chunk(task[0], task[1], description),
+                tasks
+            ))
+    else:
+        results = [fetch_catalog_chunk(catalog_version, chunk, description) for catalog_version, chunk in tasks]
+
+    return merge_catalog_results(resolved, tasks, results)
+
+def iter_catalog_objects(types):
+    """Yield every current catalog object of the given types, one ListCatalog page at a time"""
+    cursor = None
+    while True:
+        page = execute(
+            'square.catalog.list', get_client().catalog.list,
+            types=','.join(types), cursor=cursor,
+            request_options=SQUARE_REQUEST_OPTIONS
+        )
+        yield from page.items or []
+        cursor = getattr(page.response, 'cursor', None)
+        if not cursor:
+            return
+
+def prewarm_catalog_index():
+    """
+    Build a catalog index of every current modifier and modifier list
+
+    Item variations are listed too, since line items carry their variation's
+    catalog version: an item edited after the last modifier change must not
+    put its orders past the index's catalog version.
+    """
+    from catalog_index import CatalogIndex, INDEXED_TYPES
+
+    index = CatalogIndex()
+    with metrics.span('catalog_prewarm'):
+        for obj in iter_catalog_objects(INDEXED_TYPES + ('ITEM_VARIATION',)):
+            index.add(obj)
+    return index
+
 def get_modifier_details(catalog_versions_dict):
     """Get modifier details from Square API for each catalog version"""
     modifier_details = {}
     
-    for catalog_version, object_ids in catalog_versions_dict.items(): 
-        # Remove duplicates while preserving order
-        unique_object_ids = list(dict.fromkeys(object_ids))
-        
-        try:
-            result = client.catalog.batch_get(
-                object_ids=unique_object_ids,
-                catalog_version=catalog_version
-            )
-            
-            if hasattr(result, 'errors') and result.errors:
-                print(f"API returned errors for catalog version {catalog_version}: {result.errors}")
-            
-            if hasattr(result, 'objects') and result.objects:
-                for obj in result.objects:
-                    if hasattr(obj, 'id') and obj.id:
-                        modifier_details[obj.id] = obj
-                        
-        except Exception as e:
-            print(f"Error fetching modifier details for catalog version {catalog_version}: {e}")
+    resolved = resolve_catalog_objects(catalog_versions_dict, 'modifier details')
+    for catalog_version in catalog_versions_dict:
+        modifier_details.update(resolved[catalog_version])
     
     return modifier_details
 
@@ -67,43 +252,363 @@ def get_modifier_list_details(modifier_list_ids):
     for item in modifier_list_ids:
         catalog_versions[item['catalog_version']].append(item['object_id'])
     
-    # Make separate API calls for each catalog version
-    for catalog_version, object_ids in catalog_versions.items():
+    # Versions are fetched concurrently by resolve_catalog_objects
+    resolved = resolve_catalog_objects(catalog_versions, 'modifier list details')
+    for catalog_version in catalog_versions:
+        modifier_list_details.update(resolved[catalog_version])
+
+    return modifier_list_details
+
+def get_modifier_list_id(modifier, modifier_details):
+    """Return the modifier_list_id of a resolved modifier, or None"""
+    obj = modifier_details.get(modifier.catalog_object_id)
+    modifier_data = getattr(obj, 'modifier_data', None)
+    return getattr(modifier_data, 'modifier_list_id', None)
+
+def extract_modifier_list_refs(orders, modifier_details):
+    """Collect distinct (catalog_version, modifier_list_id) pairs referenced by orders"""
+    refs = {}
+
+    for order in orders:
+        if hasattr(order, 'line_items') and order.line_items:
+            for line_item in order.line_items:
+                if hasattr(line_item, 'modifiers') and line_item.modifiers:
+                    for modifier in line_item.modifiers:
+                        modifier_list_id = get_modifier_list_id(modifier, modifier_details)
+                        if modifier_list_id:
+                            refs[(line_item.catalog_version, modifier_list_id)] = None
+
+    return list(refs)
+
+def find_missing_modifier_lists(orders, modifier_details, known=None):
+    """Group modifier list IDs referenced by orders but not in known by catalog version"""
+    known = known or {}
+    missing = defaultdict(list)
+
+    for catalog_version, modifier_list_id in extract_modifier_list_refs(orders, modifier_details):
+        if (catalog_version, modifier_list_id) not in known:
+            missing[catalog_version].append(modifier_list_id)
+
+    return dict(missing)
+
+def index_modifier_lists(resolved):
+    """Key resolved modifier lists by (catalog_version, modifier_list_id)"""
+    modifier_list_details = {}
+    for catalog_version, objects in resolved.items():
+        for object_id, obj in objects.items():
+            modifier_list_details[(catalog_version, object_id)] = obj
+    return modifier_list_details
+
+def prefetch_modifier_list_details(orders, modifier_details, known=None):
+    """Resolve every modifier list referenced by orders in batched calls
+
+    Returns a dict keyed by (catalog_version, modifier_list_id). Pairs already
+    present in known are not requested again.
+    """
+    missing = find_missing_modifier_lists(orders, modifier_details, known)
+    return index_modifier_lists(resolve_catalog_objects(missing, 'modifier list details'))
+
+def build_updated_since_query(updated_at=None):
+    """Build a search query for orders updated at or after updated_at, oldest first"""
+    query = {
+        'sort': {
+            'sort_field': 'UPDATED_AT',
+            'sort_order': 'ASC'
+        }
+    }
+    if updated_at:
+        query['filter'] = {
+            'date_time_filter': {
+                'updated_at': {'start_at': updated_at}
+            }
+        }
+    return query
+
+def iter_order_pages(page_size=None, query=None, location_id=None):
+    """
+    Yield pages of orders from Square API for one location, following the cursor to the end
+
+    Raises if a search fails after its retries or returns errors.
+    """
+    page_size = page_size or FETCH_LIMIT
+    search_kwargs = {
+        'location_ids': [location_id or Config.SQUARE_LOCATION_ID],
+        'limit': page_size
+    }
+    if query:
+        search_kwargs['query'] = query
+
+    while True:
+        # A search that still fails after its retries ends the run: a partial
+        # order set would otherwise replace the sheet and advance the watermark
         try:
-            result = client.catalog.batch_get(
-                object_ids=object_ids,
-                catalog_version=catalog_version
-            )
-            
-            if hasattr(result, 'errors') and result.errors:
-                print(f"API returned errors for catalog version {catalog_version}: {result.errors}")
-            
-            if hasattr(result, 'objects') and result.objects:
-                for obj in result.objects:
-                    if hasattr(obj, 'id') and obj.id:
-                        modifier_list_details[obj.id] = obj
-                        
+            with metrics.span('orders_search'):
+                result = execute(
+                    'square.orders.search', get_client().orders.search,
+                    request_options=SQUARE_REQUEST_OPTIONS, **search_kwargs
+                )
         except Exception as e:
-            print(f"Error fetching modifier list details for catalog version {catalog_version}: {e}")
-    
-    return modifier_list_details
+            print(f"Error fetching orders: {e}", file=sys.stderr)
+            raise
 
-def get_recent_orders():
-    """Fetch the most recent orders from Square API"""
-    try:
-        result = client.orders.search(
-            location_ids=[Config.SQUARE_LOCATION_ID],
-            limit=FETCH_LIMIT
-        )
         if hasattr(result, 'errors') and result.errors:
-            print(f"API returned errors: {result.errors}")
-        return result.orders if hasattr(result, 'orders') and result.orders else []
-    except Exception as e:
-        print(f"Error fetching orders: {e}")
-        return []
+            raise RuntimeError(f"API returned errors: {result.errors}")
+
+        orders = result.orders if hasattr(result, 'orders') and result.orders else []
+        if orders:
+            metrics.add_rows('orders_fetched', len(orders))
+            record_order_locations(orders)
+            yield orders
+
+        cursor = result.cursor if hasattr(result, 'cursor') else None
+        if not cursor:
+            completed_locations.add(search_kwargs['location_ids'][0])
+            return
+        search_kwargs['cursor'] = cursor
+
+def iter_location_order_pages(location_ids, page_size=None, query=None):
+    """
+    Yield pages of orders for several locations, fetching the locations concurrently
+
+    Each location follows its own cursor on a worker thread. Pages that are
+    already waiting when the consumer asks for the next one are merged into a
+    single page, so their catalog objects are resolved in one batch rather
+    than one round of lookups per location.
+    """
+    if len(location_ids) == 1:
+        yield from iter_order_pages(page_size, query, location_ids[0])
+        return
+
+    sources = [
+        lambda location_id=location_id: iter_order_pages(page_size, query, location_id)
+        for location_id in location_ids
+    ]
+    for pages in iter_concurrently(sources, Config.SQUARE_MAX_CONCURRENCY):
+        merged = [order for page in pages for order in page]
+        if merged:
+            yield merged
+
+def iter_concurrently(sources, max_workers):
+    """
+    Run each source() on a worker thread and yield the items they produce
+
+    Items that are already waiting when the consumer asks for more are
+    yielded together as one list, in the order they were produced. At most
+    one item per worker is held at a time. If the consumer stops early the
+    workers are told to stop after their current item.
+    """
+    workers = min(len(sources), max(1, max_workers))
+    items = queue.Queue(maxsize=workers)
+    stopped = threading.Event()
+    done = object()
+
+    def run_source(source):
+        try:
+            if stopped.is_set():
+                return
+            for item in source():
+                items.put(item)
+                if stopped.is_set():
+                    return
+        finally:
+            items.put(done)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    remaining = len(sources)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(run_source, source) for source in sources]
+    try:
+        while remaining:
+            batch = []
+            item = items.get()
+            while True:
+                if item is done:
+                    remaining -= 1
+                else:
+                    batch.append(item)
+                try:
+                    item = items.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                yield batch
+    finally:
+        # If the consumer stopped early, unblock the workers and let them finish
+        stopped.set()
+        while remaining:
+            if items.get() is done:
+                remaining -= 1
+        executor.shutdown()
+    for future in futures:
+        future.result()
+
+def record_order_locations(orders):
+    """Remember the location of each order when rows are being routed by location"""
+    if order_locations is None:
+        return
+    for order in orders:
+        order_locations[order.id] = getattr(order, 'location_id', None)
+
+def filter_changed_orders(orders, watermark, next_watermark):
+    """Drop orders already seen at the watermark and advance next_watermark past the page"""
+    changed = [order for order in orders if watermark.is_new(order)]
+    for order in orders:
+        next_watermark.advance(order)
+    return changed
+
+def iter_changed_order_pages(order_pages, watermark, next_watermark):
+    """Filter each page with filter_changed_orders() as pages arrive"""
+    for orders in order_pages:
+        changed = filter_changed_orders(orders, watermark, next_watermark)
+        if changed:
+            yield changed
+
+def get_recent_orders():
+    """Fetch all orders from Square API as a single list"""
+    orders = []
+    for page in iter_order_pages():
+        orders.extend(page)
+    return orders
+
+def find_missing_modifiers(orders, modifier_details):
+    """Group modifier IDs referenced by orders but not yet in modifier_details by catalog version"""
+    catalog_versions_dict = {}
+    for catalog_version, object_ids in extract_modifier_list_ids(orders).items():
+        missing = [object_id for object_id in object_ids if object_id not in modifier_details]
+        if missing:
+            catalog_versions_dict[catalog_version] = missing
+    return catalog_versions_dict
+
+def trim_modifier_details(modifier_details, max_entries=None):
+    """
+    Bound the modifiers remembered between pages
+
+    Free-text answers are usually one catalog object per order, so once more
+    than max_entries are held only modifiers belonging to a modifier list
+    (shared choices such as Rank or Patrol) are kept. Anything dropped that
+    shows up again is looked up again, from the catalog cache when enabled.
+    """
+    max_entries = MODIFIER_DETAILS_MAX if max_entries is None else max_entries
+    if len(modifier_details) <= max_entries:
+        return
+    for modifier_id in [
+        modifier_id for modifier_id, obj in modifier_details.items() if not describe_catalog_modifier(obj)[1]
+    ]:
+        del modifier_details[modifier_id]
+
+def store_order_page(orders, modifier_details, modifier_list_details, rows):
+    """Save a processed page of orders and its rows to the order store, when one is open"""
+    if order_store is None:
+        return
+    with metrics.span('store_write'):
+        order_store.upsert_orders(orders, modifier_details, modifier_list_details, rows)
+
+def iter_stored_rows():
+    """Yield the stored rows of the configured locations; the store may also hold other locations' orders"""
+    return order_store.iter_rows(location_ids=Config.location_ids() or None)
+
+def rebuild_store_rows(workers=None):
+    """
+    Rebuild every stored row with the current modifier mapping, without calling Square
+
+    With more than one worker (TRANSFORM_WORKERS by default, 0 for one per
+    CPU) the orders are transformed on a process pool by transform_pool.
+    """
+    mapper = get_modifier_mapper()
+    workers = Config.TRANSFORM_WORKERS if workers is None else workers
+    with metrics.span('store_rebuild'):
+        if workers != 1:
+            from transform_pool import rebuild_rows_parallel
+            count = rebuild_rows_parallel(order_store, mapper, workers)
+        else:
+            count = order_store.rebuild_rows(
+                lambda orders, modifier_details, modifier_list_details: extract_order_data(
+                    orders, modifier_details, modifier_list_details, mapper=mapper
+                )
+            )
+    metrics.add_rows('rows_built', count)
+    return count
+
+def iter_order_rows(order_pages):
+    """Yield order data rows page by page, resolving catalog details as pages arrive"""
+    modifier_details = {}
+    modifier_list_details = {}
+
+    for orders in order_pages:
+        with metrics.span('catalog_resolve'):
+            # Only look up modifiers that earlier pages have not already resolved
+            catalog_versions_dict = find_missing_modifiers(orders, modifier_details)
+
+            modifier_details.update(get_modifier_details(catalog_versions_dict))
+            modifier_list_details.update(
+                prefetch_modifier_list_details(orders, modifier_details, known=modifier_list_details)
+            )
+
+        with metrics.span('row_build'):
+            rows = extract_order_data(orders, modifier_details, modifier_list_details)
+        metrics.add_rows('rows_built', len(rows))
+        store_order_page(orders, modifier_details, modifier_list_details, rows)
+        trim_modifier_details(modifier_details)
+
+        for row in rows:
+            yield row
+
+def iter_replay_rows(path):
+    """Yield order data rows built from a --capture file, without calling Square"""
+    from response_capture import iter_captured_order_pages, load_captured_catalog
+
+    modifier_details, modifier_list_details = load_captured_catalog(path)
+    missing = set()
+
+    for orders in iter_captured_order_pages(path):
+        record_order_locations(orders)
+        for object_ids in find_missing_modifiers(orders, modifier_details).values():
+            missing.update(object_ids)
+
+        with metrics.span('row_build'):
+            rows = extract_order_data(orders, modifier_details, modifier_list_details)
+        metrics.add_rows('rows_built', len(rows))
+
+        for row in rows:
+            yield row
+
+    if missing:
+        print(f"Warning: {path} has no catalog objects for {len(missing)} modifiers; "
+              f"their rows use the names stored on the orders", file=sys.stderr)
+
+def get_modifier_mapper():
+    """Return the modifier mapper, loading MODIFIER_RULES_FILE on first use"""
+    global modifier_mapper
+    if modifier_mapper is None:
+        modifier_mapper = load_modifier_mapper(Config.MODIFIER_RULES_FILE)
+    return modifier_mapper
+
+def describe_catalog_modifier(obj):
+    """Return (catalog name or None, modifier_list_id or None) for a resolved modifier"""
+    modifier_data = getattr(obj, 'modifier_data', None)
+    if modifier_data is None or not hasattr(modifier_data, 'name'):
+        return None, None
+    return modifier_data.name, getattr(modifier_data, 'modifier_list_id', None)
+
+def extract_order_data(orders, modifier_details, modifier_list_details=None, mapper=None):
+    """Extract order data into a structured format for table creation
+
+    modifier_list_details maps (catalog_version, modifier_list_id) to the
+    catalog object, as returned by prefetch_modifier_list_details(). When it
+    is not supplied the lists are prefetched here in one batched pass.
+    Modifier names are mapped to row fields by mapper, which defaults to the
+    rules loaded by get_modifier_mapper().
+    """
+    if modifier_list_details is None:
+        modifier_list_details = prefetch_modifier_list_details(orders, modifier_details)
+    mapper = mapper or get_modifier_mapper()
+
+    # Catalog lookups per modifier ID and modifier list name per (version, ID),
+    # resolved once per call
+    catalog_modifiers = {}
+    modifier_list_names = {}
 
-def extract_order_data(orders, modifier_details):
-    """Extract order data into a structured format for table creation"""
     order_data = []
     
     for order in orders:
@@ -115,185 +620,49 @@ def extract_order_data(orders, modifier_details):
         
         if hasattr(order, 'line_items') and order.line_items:
             for line_item in order.line_items:
-                line_item_name = line_item.name
-                
                 # Initialize row with basic info
-                row = {
-                    'order_id': order_id,
-                    'total_money': total_money,
-                    'line_item_name': line_item_name,
-                    'scout_name': '',
-                    'scouter_name': '',
-                    'rank': '',
-                    'patrol': '',
-                    'emergency_contact': '',
-                    'emergency_contact_phone': '',
-                    'cell_phone': '',
-                    'travel_to_campout': ''
-                }
+                row = OrderRow(order_id, total_money, line_item.name)
                 
                 # Extract modifier information
                 if hasattr(line_item, 'modifiers') and line_item.modifiers:
                     for modifier in line_item.modifiers:
-                        modifier_name = modifier.name
-                        if modifier.catalog_object_id in modifier_details:
-                            obj = modifier_details[modifier.catalog_object_id]
-                            if hasattr(obj, 'modifier_data') and hasattr(obj.modifier_data, 'name'):
-                                modifier_name = obj.modifier_data.name
-                        
-                        # Check if modifier has modifier_list_id
-                        has_modifier_list = (
-                            modifier.catalog_object_id in modifier_details and
-                            hasattr(modifier_details[modifier.catalog_object_id], 'modifier_data') and
-                            hasattr(modifier_details[modifier.catalog_object_id].modifier_data, 'modifier_list_id') and
-                            modifier_details[modifier.catalog_object_id].modifier_data.modifier_list_id
-                        )
-                        
-                        if has_modifier_list:
-                            obj = modifier_details[modifier.catalog_object_id]
-                            modifier_list_id = obj.modifier_data.modifier_list_id
-                            # Get modifier list details
-                            modifier_list_details = get_modifier_list_details([{
-                                'catalog_version': line_item.catalog_version,
-                                'object_id': modifier_list_id
-                            }])
-                            
-                            if modifier_list_id in modifier_list_details:
-                                modifier_list_obj = modifier_list_details[modifier_list_id]
-                                if hasattr(modifier_list_obj, 'modifier_list_data') and hasattr(modifier_list_obj.modifier_list_data, 'name'):
-                                    modifier_list_name = modifier_list_obj.modifier_list_data.name
-                                    # Split modifier list name into key and value if it contains ":"
-                                    if ":" in modifier_list_name:
-                                        key, value = modifier_list_name.split(":", 1)
-                                        key = key.strip()
-                                        value = value.strip()
-                                        # If modifier name is not already in the value, append it
-                                        if modifier_name not in value:
-                                            combined_value = f"{value} - {modifier_name}"
-                                        else:
-                                            combined_value = value
-                                    else:
-                                        # If no colon in modifier list name, treat it as key and modifier name as value
-                                        key = modifier_list_name
-                                        combined_value = modifier_name
-                                    
-                                    # Map the key to the appropriate column
-                                    if key == "Scout Name":
-                                        row['scout_name'] = combined_value
-                                    elif key == "Scouter Name":
-                                        row['scouter_name'] = combined_value
-                                    elif key == "Rank":
-                                        row['rank'] = combined_value
-                                    elif key == "Patrol":
-                                        row['patrol'] = combined_value
-                                    elif key == "Emergency Contact":
-                                        row['emergency_contact'] = combined_value
-                                    elif key == "Emergency Contact Phone Number":
-                                        row['emergency_contact_phone'] = combined_value
-                                    elif key == "Cell phone number":
-                                        row['cell_phone'] = combined_value
-                                    elif key == "Will you travel with the troop to the campout?":
-                                        row['travel_to_campout'] = combined_value
-                        
+                        catalog_object_id = modifier.catalog_object_id
+                        try:
+                            catalog_name, modifier_list_id = catalog_modifiers[catalog_object_id]
+                        except KeyError:
+                            catalog_name, modifier_list_id = catalog_modifiers[catalog_object_id] = (
+                                describe_catalog_modifier(modifier_details.get(catalog_object_id))
+                            )
+                        modifier_name = catalog_name if catalog_name is not None else modifier.name
+
+                        if modifier_list_id:
+                            modifier_list_key = (line_item.catalog_version, modifier_list_id)
+                            try:
+                                modifier_list_name = modifier_list_names[modifier_list_key]
+                            except KeyError:
+                                modifier_list_data = getattr(
+                                    modifier_list_details.get(modifier_list_key), 'modifier_list_data', None
+                                )
+                                modifier_list_name = modifier_list_names[modifier_list_key] = (
+                                    getattr(modifier_list_data, 'name', None)
+                                )
+                            if modifier_list_name is None:
+                                continue
+                            mapping = mapper.map_list_modifier(modifier_list_name, modifier_name)
                         else:
-                            # For modifiers without modifier list, split modifier name into key and value if it contains ":"
-                            if ":" in modifier_name:
-                                key, value = modifier_name.split(":", 1)
-                                key = key.strip()
-                                value = value.strip()
-                                
-                                # Map the key to the appropriate column
-                                if key == "Scout Name":
-                                    row['scout_name'] = value
-                                elif key == "Scouter Name":
-                                    row['scouter_name'] = value
-                                elif key == "Rank":
-                                    row['rank'] = value
-                                elif key == "Patrol":
-                                    row['patrol'] = value
-                                elif key == "Emergency Contact":
-                                    row['emergency_contact'] = value
-                                elif key == "Emergency Contact Phone Number":
-                                    row['emergency_contact_phone'] = value
-                                elif key == "Cell phone number":
-                                    row['cell_phone'] = value
-                                elif key == "Will you travel with the troop to the campout?":
-                                    row['travel_to_campout'] = value
-                            else:
-                                # Handle modifiers without colons
-                                if modifier_name == "Scout Name":
-                                    row['scout_name'] = "Unknown"
-                                elif modifier_name == "Scouter Name":
-                                    row['scouter_name'] = "Unknown"
-                                elif modifier_name == "Rank":
-                                    row['rank'] = "Unknown"
-                                elif modifier_name == "Patrol":
-                                    row['patrol'] = "Unknown"
-                                else:
-                                    # For other modifiers, check if the modifier name itself contains a colon
-                                    if ":" in modifier_name:
-                                        key, value = modifier_name.split(":", 1)
-                                        key = key.strip()
-                                        value = value.strip()
-                                        
-                                        # Map the key to the appropriate column
-                                        if key == "Scout Name":
-                                            row['scout_name'] = value
-                                        elif key == "Scouter Name":
-                                            row['scouter_name'] = value
-                                        elif key == "Rank":
-                                            row['rank'] = value
-                                        elif key == "Patrol":
-                                            row['patrol'] = value
-                                        elif key == "Emergency Contact":
-                                            row['emergency_contact'] = value
-                                        elif key == "Emergency Contact Phone Number":
-                                            row['emergency_contact_phone'] = value
-                                        elif key == "Cell phone number":
-                                            row['cell_phone'] = value
-                                        elif key == "Will you travel with the troop to the campout?":
-                                            row['travel_to_campout'] = value
+                            mapping = mapper.map_modifier(modifier_name)
+
+                        if mapping:
+                            setattr(row, mapping[0], mapping[1])
                 
                 order_data.append(row)
     
     return order_data
 
 def write_csv_to_stdout(order_data):
-    """Write order data as CSV to stdout"""
-    if not order_data:
-        print("No order data to write to CSV.")
-        return
-
-    # Define column headers with combined 'Name' column
-    headers = ['Order ID', 'Total Money', 'Line Item Name', 'Name', 'Rank', 'Patrol',
-               'Emergency Contact', 'Emergency Contact Phone', 'Cell Phone', 'Travel to Campout']
-
-    # Create a CSV writer that writes to stdout
-    writer = csv.DictWriter(sys.stdout, fieldnames=headers)
-
-    # Write the header row
-    writer.writeheader()
-
-    # Write data rows
-    for row in order_data:
-        # Combine scout_name and scouter_name into a single Name field
-        name = row['scout_name'] if row['scout_name'] else row['scouter_name']
-        patrol = row['patrol'] if row['patrol'] else 'Rocking Chair'
-
-        # Create a new dictionary with properly formatted keys
-        csv_row = {
-            'Order ID': row['order_id'],
-            'Total Money': row['total_money'],
-            'Line Item Name': row['line_item_name'],
-            'Name': name,
-            'Rank': row['rank'],
-            'Patrol': patrol,
-            'Emergency Contact': row['emergency_contact'],
-            'Emergency Contact Phone': row['emergency_contact_phone'],
-            'Cell Phone': row['cell_phone'],
-            'Travel to Campout': row['travel_to_campout']
-        }
-        writer.writerow(csv_row)
+    """Write order data as CSV to stdout, row by row as it is produced"""
+    if not write_csv(order_data):
+        print("No order data to write to CSV.", file=sys.stderr)
 
 def main():
     """Main function to fetch and display recent orders with modifier details"""
@@ -301,47 +670,393 @@ def main():
     parser = argparse.ArgumentParser(
         description='Fetch Square orders and output to CSV or Google Sheets'
     )
+    parser.add_argument(
+        'command',
+        nargs='?',
+        choices=['sync', 'backfill'],
+        default='sync',
+        help='sync (default) fetches the newest orders; backfill loads every order created '
+             'from --since to --until into the order store, resuming an unfinished backfill'
+    )
     parser.add_argument(
         '--output',
-        choices=['stdout', 'sheets'],
+        choices=['stdout', 'sheets', 'parquet', 'arrow'],
         default='stdout',
-        help='Output mode: stdout (CSV to console) or sheets (Google Sheets)'
+        help='Output mode: stdout (CSV to console), sheets (Google Sheets), '
+             'or parquet / arrow (typed columnar file, needs pyarrow)'
+    )
+    parser.add_argument(
+        '--no-catalog-cache',
+        action='store_true',
+        help='Always fetch catalog objects from Square instead of the local cache'
+    )
+    parser.add_argument(
+        '--prewarm-catalog',
+        action='store_true',
+        help='List every modifier and modifier list first and save them to CATALOG_INDEX_PATH; '
+             'lookups are then answered from the index, except for older catalog versions'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Overlap order fetching, catalog resolution and Sheets writes using asyncio'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only fetch orders updated since the last successful incremental run'
+    )
+    parser.add_argument(
+        '--no-order-store',
+        action='store_true',
+        help='Do not save fetched orders to the local order store or read outputs from it'
+    )
+    parser.add_argument(
+        '--from-store',
+        action='store_true',
+        help='Rebuild rows from the local order store with the current modifier rules instead of calling Square'
+    )
+    parser.add_argument(
+        '--capture',
+        metavar='PATH',
+        help='Append the raw Square order and catalog responses of this run to PATH for --replay '
+             '(the catalog cache is bypassed so every catalog object is recorded)'
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='PATH',
+        help='Build rows from a --capture file instead of calling Square'
+    )
+    parser.add_argument(
+        '--since',
+        help='backfill: first created_at date or RFC 3339 timestamp to load (UTC)'
+    )
+    parser.add_argument(
+        '--until',
+        help='backfill: created_at date or timestamp to stop before (default now)'
+    )
+    parser.add_argument(
+        '--shard-days',
+        type=int,
+        help='backfill: days of orders per shard, each fetched with its own cursor (default 30)'
+    )
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        help='backfill: orders per search page (default 500, at most 1000)'
+    )
+    parser.add_argument(
+        '--time-limit',
+        type=float,
+        metavar='MINUTES',
+        help='backfill: stop fetching after MINUTES, write the output and exit with status 3; '
+             'run again to resume'
+    )
+    parser.add_argument(
+        '--transform-workers',
+        type=int,
+        default=Config.TRANSFORM_WORKERS,
+        help='Worker processes that rebuild rows for --from-store (0 for one per CPU)'
+    )
+    parser.add_argument(
+        '--output-file',
+        help='Write CSV output to this file instead of stdout (a .gz suffix compresses it), '
+             'or the parquet / arrow file path (default orders.parquet / orders.arrow)'
+    )
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        help='Gzip-compress CSV output'
+    )
+    parser.add_argument(
+        '--metrics-report',
+        default=Config.METRICS_REPORT_PATH,
+        help='Write a JSON run report with stage timings and API counts to this path'
+    )
+    parser.add_argument(
+        '--prometheus-textfile',
+        default=Config.METRICS_PROMETHEUS_PATH,
+        help='Also write the run metrics as a Prometheus textfile to this path'
     )
     args = parser.parse_args()
+    if args.replay and (args.from_store or args.incremental or args.capture):
+        parser.error('--replay cannot be combined with --from-store, --incremental or --capture')
+    # A replay reads only the capture file and leaves the order store alone
+    use_order_store = Config.ORDER_STORE_PATH and not args.no_order_store and not args.replay
+    if args.from_store and not use_order_store:
+        parser.error('--from-store needs the order store (ORDER_STORE_PATH, without --no-order-store)')
+    if args.from_store and args.incremental:
+        parser.error('--from-store cannot be combined with --incremental')
+    if args.from_store and args.capture:
+        parser.error('--from-store makes no Square requests to --capture')
+    if args.prewarm_catalog and (args.from_store or args.replay or args.capture or args.no_catalog_cache):
+        parser.error('--prewarm-catalog cannot be combined with --from-store, --replay, --capture '
+                     'or --no-catalog-cache')
+    if args.prewarm_catalog and not Config.CATALOG_INDEX_PATH:
+        parser.error('--prewarm-catalog needs CATALOG_INDEX_PATH')
+    if args.command == 'backfill':
+        if args.from_store or args.replay or args.incremental or args.use_async:
+            parser.error('backfill cannot be combined with --from-store, --replay, --incremental or --async')
+        if not use_order_store:
+            parser.error('backfill needs the order store (ORDER_STORE_PATH, without --no-order-store)')
+        if args.shard_days is not None and args.shard_days < 1:
+            parser.error('--shard-days must be at least 1')
+        if args.page_size is not None and not 1 <= args.page_size <= 1000:
+            parser.error('--page-size must be between 1 and 1000')
+    elif args.since or args.until or args.shard_days or args.page_size or args.time_limit:
+        parser.error('--since, --until, --shard-days, --page-size and --time-limit are only used by backfill')
 
     # Validate configuration based on output mode
     if args.output == 'sheets':
         Config.validate_google_sheets_config()
-    Config.validate_square_config()
+    elif args.output in ('parquet', 'arrow'):
+        from columnar_export import require_pyarrow
+        require_pyarrow()
+    if not args.from_store and not args.replay:
+        Config.validate_square_config()
 
-    print("Fetching recent orders from Square API...", file=sys.stderr)
-    orders = get_recent_orders()
+    global catalog_cache, catalog_index, order_store, response_capture, location_routes, order_locations
+    if args.output == 'sheets':
+        location_routes = load_location_routes(Config.LOCATION_ROUTES_FILE)
+    if location_routes and not use_order_store:
+        order_locations = {}
+    if args.capture:
+        from response_capture import ResponseCapture
+        try:
+            response_capture = ResponseCapture(args.capture)
+        except (OSError, ValueError) as e:
+            print(f"Error opening capture file {args.capture}: {e}", file=sys.stderr)
+            sys.exit(1)
+    if Config.CATALOG_CACHE_PATH and not args.no_catalog_cache and not args.capture and not args.replay:
+        catalog_cache = CatalogCache(
+            Config.CATALOG_CACHE_PATH,
+            max_bytes=Config.CATALOG_CACHE_MAX_MB * 1024 * 1024,
+            persist=Config.CATALOG_CACHE_PERSIST
+        )
+    if use_order_store:
+        order_store = OrderStore(Config.ORDER_STORE_PATH)
 
-    if not orders:
-        print("No orders found.", file=sys.stderr)
-        return
+    metrics.reset()
+    status = 'failed'
+    try:
+        # The index is bypassed like the cache, so captures record every catalog object
+        if (Config.CATALOG_INDEX_PATH and not args.no_catalog_cache and not args.capture and
+                not args.replay and not args.from_store):
+            catalog_index = open_catalog_index(args.prewarm_catalog)
+        status = run_sync(args)
+    finally:
+        if catalog_cache is not None:
+            metrics.set_cache('catalog', catalog_cache.hits, catalog_cache.misses)
+            catalog_cache.close()
+            catalog_cache = None
+        if catalog_index is not None:
+            metrics.set_cache('catalog_index', catalog_index.hits, catalog_index.misses)
+            catalog_index = None
+        if order_store is not None:
+            order_store.close()
+            order_store = None
+        if response_capture is not None:
+            print(f"Captured {response_capture.records} responses to {response_capture.path}", file=sys.stderr)
+            response_capture.close()
+            response_capture = None
+        order_locations = None
+        write_run_report(metrics.report(status), args.metrics_report, args.prometheus_textfile)
+    if status == 'incomplete':
+        from backfill import BACKFILL_INCOMPLETE_EXIT
+        sys.exit(BACKFILL_INCOMPLETE_EXIT)
+
+def open_catalog_index(prewarm=False):
+    """Return the saved catalog index, or with prewarm a freshly listed one that replaces it"""
+    from catalog_index import load_catalog_index, save_catalog_index
+
+    if prewarm:
+        try:
+            index = prewarm_catalog_index()
+        except Exception as e:
+            print(f"Error prewarming the catalog index, using the saved one: {e}", file=sys.stderr)
+        else:
+            save_catalog_index(Config.CATALOG_INDEX_PATH, index)
+            print(f"Indexed {len(index.objects)} modifiers and modifier lists "
+                  f"up to catalog version {index.catalog_version}", file=sys.stderr)
+            return index
+    return load_catalog_index(Config.CATALOG_INDEX_PATH)
+
+def write_run_report(report, report_path=None, prometheus_path=None):
+    """Print a one-line run summary to stderr and write the report files that are configured"""
+    api_calls = sum(counts['calls'] for counts in report['api'].values())
+    retries = sum(counts['retries'] for counts in report['api'].values())
+    print(f"Run {report['status']} in {report['duration_seconds']:.2f}s: "
+          f"{report['rows'].get('rows_built', 0)} rows, {api_calls} API calls, {retries} retries",
+          file=sys.stderr)
+    if report_path:
+        write_json_report(report_path, report)
+    if prometheus_path:
+        write_prometheus_textfile(prometheus_path, report)
+
+def run_sync(args):
+    """
+    Fetch orders, build rows and write them to the selected output
+
+    Returns the run status: 'ok', or 'incomplete' for a backfill stopped by its time limit.
+    """
+    watermark = next_watermark = checkpoint = None
+    if args.command == 'backfill':
+        from backfill import run_backfill
+        checkpoint = run_backfill(args)
+        order_rows = iter_stored_rows()
+    elif args.from_store:
+        print("Rebuilding rows from the local order store...", file=sys.stderr)
+        print(f"Rebuilt {rebuild_store_rows(args.transform_workers)} rows", file=sys.stderr)
+        order_rows = iter_stored_rows()
+    elif args.replay:
+        print(f"Replaying captured responses from {args.replay}...", file=sys.stderr)
+        order_rows = iter_replay_rows(args.replay)
+    else:
+        order_rows, watermark, next_watermark = fetch_order_rows(args)
 
-    # Extract modifier list IDs from orders
-    catalog_versions_dict = extract_modifier_list_ids(orders)
+    write_output(args, order_rows)
 
-    # Get modifier details
-    modifier_details = get_modifier_details(catalog_versions_dict)
+    if args.incremental:
+        save_incremental_watermark(next_watermark)
+    if checkpoint is not None:
+        from backfill import finish_backfill
+        if not finish_backfill(checkpoint):
+            return 'incomplete'
+    return 'ok'
+
+def save_incremental_watermark(next_watermark):
+    """
+    Save an incremental run's watermark once every location's orders were fetched to the end
+
+    All locations advance one watermark, so saving it after one location's
+    search stopped early would skip that location's orders up to the point
+    the others reached.
+    """
+    unfinished = [location_id for location_id in Config.location_ids() if location_id not in completed_locations]
+    if unfinished:
+        raise RuntimeError(f"Orders for {', '.join(unfinished)} were not fetched to the end; "
+                           f"the sync watermark was not saved")
+    save_watermark(Config.SYNC_STATE_PATH, next_watermark)
+
+def fetch_order_rows(args):
+    """Return (order rows, watermark, next watermark) for a run that fetches from Square"""
+    completed_locations.clear()
+    print("Fetching recent orders from Square API...", file=sys.stderr)
 
     print("\nOrder Details:", file=sys.stderr)
     print("-" * 50, file=sys.stderr)
 
-    # Extract structured data for table
-    order_data = extract_order_data(orders, modifier_details)
+    # Orders are fetched, resolved and transformed one page at a time
+    query = None
+    watermark = next_watermark = None
+    if args.incremental:
+        watermark = load_watermark(Config.SYNC_STATE_PATH)
+        if (watermark.updated_at and order_store is not None and
+                not order_store.count_orders(Config.location_ids() or None)):
+            # The store feeds the full table, so from an empty store (say, a
+            # lost cache) only changed orders would replace the sheet
+            print("The order store has no orders for these locations; running a full sync", file=sys.stderr)
+            watermark = Watermark()
+        next_watermark = Watermark(watermark.updated_at, watermark.order_ids)
+        query = build_updated_since_query(watermark.updated_at)
+        print(f"Incremental sync from updated_at {watermark.updated_at or 'the beginning'}", file=sys.stderr)
+
+    location_ids = Config.location_ids()
+    if len(location_ids) > 1:
+        print(f"Fetching {len(location_ids)} locations concurrently", file=sys.stderr)
+    if args.use_async:
+        from async_pipeline import stream_order_rows
+        order_rows = stream_order_rows(query, watermark, next_watermark, location_ids=location_ids)
+    elif args.incremental:
+        order_rows = iter_order_rows(iter_changed_order_pages(
+            iter_location_order_pages(location_ids, query=query), watermark, next_watermark
+        ))
+    else:
+        order_rows = iter_order_rows(iter_location_order_pages(location_ids))
+
+    if order_store is not None and (args.incremental or location_routes):
+        # Pages are saved to the store as they are processed. An incremental
+        # run fetches only the changed orders, so drain the pipeline and read
+        # the full table back from the store; sheet digests then tell which
+        # rows actually changed. Routed rows are looked up by stored location.
+        # Other runs stream each page's rows to the output as it is stored
+        for _ in order_rows:
+            pass
+        order_rows = iter_stored_rows()
+
+    return order_rows, watermark, next_watermark
 
-    # Output based on mode
-    if args.output == 'stdout':
-        write_csv_to_stdout(order_data)
+def write_output(args, order_rows):
+    """Write order rows to the output selected by args.output"""
+    if args.output == 'stdout' and (args.output_file or args.gzip):
+        rows_written = write_csv(order_rows, args.output_file, compress=True if args.gzip else None)
+        print(f"Wrote {rows_written} rows to {args.output_file or 'stdout'}", file=sys.stderr)
+    elif args.output == 'stdout':
+        write_csv_to_stdout(order_rows)
+    elif args.output in ('parquet', 'arrow'):
+        from columnar_export import write_columnar
+        path = args.output_file or f'orders.{args.output}'
+        rows_written = write_columnar(order_rows, path, args.output)
+        print(f"Wrote {rows_written} rows to {path}", file=sys.stderr)
     elif args.output == 'sheets':
+        order_data = list(order_rows)
+        # Without the store an incremental run only has the changed rows, so
+        # they are upserted into the sheet rather than replacing it
+        changed_rows_only = args.incremental and order_store is None
+        if not order_data and not changed_rows_only:
+            print("No orders found.", file=sys.stderr)
+            return
+        write_mode = resolve_sheet_write_mode(changed_rows_only)
         from google_sheets import write_to_google_sheet, log_last_update
-        success = write_to_google_sheet(order_data)
-        if not success:
-            sys.exit(1)
-        log_last_update()
+        if not order_data:
+            print("No changed orders since last sync.", file=sys.stderr)
+            log_last_update()
+        elif location_routes:
+            if not write_routed_sheets(order_data, write_mode):
+                sys.exit(1)
+        elif args.use_async:
+            import asyncio
+            from async_pipeline import write_sheets_async
+            if not asyncio.run(write_sheets_async(order_data, write_mode)):
+                sys.exit(1)
+        else:
+            # The LastUpdate timestamp goes out in the same request as the data
+            if not write_to_google_sheet(order_data, write_mode=write_mode, log_update=True):
+                sys.exit(1)
+
+def resolve_sheet_write_mode(changed_rows_only=False):
+    """
+    Return the Sheets write mode for this run: 'upsert' for changed rows only, else WRITE_MODE
+
+    With the order store open every run writes the full table, so 'append'
+    would add every row again on each run; it overwrites instead.
+    """
+    if changed_rows_only:
+        return 'upsert'
+    if Config.WRITE_MODE == 'append' and order_store is not None:
+        print("WRITE_MODE=append would add every stored row again on each run; overwriting instead "
+              "(use --no-order-store to append)", file=sys.stderr)
+        return 'overwrite'
+    return Config.WRITE_MODE
+
+def write_routed_sheets(order_data, write_mode):
+    """Write each location's rows to its routed tab, with one batched write per spreadsheet"""
+    from google_sheets import write_tabs_to_google_sheet
+
+    if order_store is not None:
+        locations = order_store.order_locations(Config.location_ids() or None)
+    else:
+        locations = order_locations
+    targets = route_rows(order_data, locations, location_routes, Config.GOOGLE_SHEET_ID, Config.SHEET_NAME)
+    success = True
+    for sheet_id, tab_data in targets.items():
+        if not write_tabs_to_google_sheet(tab_data, sheet_id, write_mode, log_update=True):
+            success = False
+    return success
 
 if __name__ == "__main__":
-    main()
+    # Run the imported module rather than __main__ so that async_pipeline,
+    # which imports square_orders, sees the same catalog cache and settings
+    import square_orders
+    square_orders.main()
@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+
+
+class Watermark:
+    """
+    High-water mark of the last successful incremental sync
+
+    updated_at is the largest order updated_at seen so far and order_ids are the
+    orders seen at exactly that timestamp. Square's date-time filter is inclusive,
+    so those orders come back on the next run and are skipped unless they changed.
+    """
+
+    def __init__(self, updated_at=None, order_ids=None):
+        self.updated_at = updated_at
+        self.order_ids = set(order_ids or [])
+
+    def is_new(self, order):
+        """Return True if the order changed since the watermark was recorded"""
+        updated_at = getattr(order, 'updated_at', None)
+        if self.updated_at is None or updated_at is None:
+            return True
+        if updated_at > self.updated_at:
+            return True
+        return updated_at == self.updated_at and order.id not in self.order_ids
+
+    def advance(self, order):
+        """Move the watermark forward past the given order"""
+        updated_at = getattr(order, 'updated_at', None)
+        if updated_at is None:
+            return
+        if self.updated_at is None or updated_at > self.updated_at:
+            self.updated_at = updated_at
+            self.order_ids = {order.id}
+        elif updated_at == self.updated_at:
+            self.order_ids.add(order.id)
+
+    def to_dict(self):
+        return {
+            'updated_at': self.updated_at,
+            'order_ids': sorted(self.order_ids)
+        }
+
+
+def load_watermark(path):
+    """Load the watermark saved by the last successful run, or an empty one"""
+    if not path or not os.path.exists(path):
+        return Watermark()
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return Watermark(data.get('updated_at'), data.get('order_ids'))
+    except (OSError, ValueError) as e:
+        print(f"Error reading sync state from {path}, starting a full sync: {e}", file=sys.stderr)
+        return Watermark()
+
+
+def save_watermark(path, watermark):
+    """Atomically persist the watermark after a successful run"""
+    write_json_atomic(path, watermark.to_dict())
+
+
+class BackfillCheckpoint:
+    """
+    Progress of a backfill over a created_at range
+
+    The range is split into shards of shard_days days per location. shards maps
+    each shard's key to the cursor to continue it from, or to DONE once its last
+    page is stored; shards that are not listed have not started.
+    """
+
+    DONE = True
+
+    def __init__(self, since, until, shard_days, location_ids, shards=None):
+        self.since = since
+        self.until = until
+        self.shard_days = shard_days
+        self.location_ids = list(location_ids)
+        self.shards = dict(shards or {})
+
+    def advance(self, key, cursor):
+        """Record that the shard's pages up to cursor are stored; no cursor means the shard is done"""
+        self.shards[key] = cursor or self.DONE
+
+    def cursor(self, key):
+        """Return the cursor to continue the shard from, or None to start it"""
+        cursor = self.shards.get(key)
+        return cursor if cursor is not self.DONE else None
+
+    def is_done(self, key):
+        return self.shards.get(key) is self.DONE
+
+    def to_dict(self):
+        return {
+            'since': self.since,
+            'until': self.until,
+            'shard_days': self.shard_days,
+            'location_ids': self.location_ids,
+            'shards': self.shards
+        }
+
+
+def load_backfill_checkpoint(path):
+    """Load the checkpoint of an unfinished backfill, or None if there is none"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return BackfillCheckpoint(data['since'], data['until'], data['shard_days'],
+                                  data['location_ids'], data.get('shards'))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading backfill checkpoint from {path}, starting the backfill over: {e}", file=sys.stderr)
+        return None
+
+
+def save_backfill_checkpoint(path, checkpoint):
+    """Atomically persist backfill progress"""
+    write_json_atomic(path, checkpoint.to_dict())
+
+
+def write_text_atomic(path, text):
+    """Write text to path, replacing it in one step so a crash or a reader never sees it half written"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write data as JSON to path atomically; indented JSON ends with a newline"""
+    write_text_atomic(path, json.dumps(data, indent=indent) + ('\n' if indent is not None else ''))
@@ -0,0 +1,170 @@
+"""
+Test file for backfill.py.
+This file backfills orders from fake_api_server.py into a temporary store, stopping part way and resuming from the checkpoint.
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import square_orders
+from backfill import count_shards, format_timestamp, iter_backfill_pages, open_checkpoint, plan_shards
+from fake_api_server import FakeAPIState, server_url, start_server
+from order_store import OrderStore
+from square_orders import create_square_client, iter_order_rows
+from sync_state import BackfillCheckpoint, load_backfill_checkpoint, save_backfill_checkpoint
+
+
+def backfill_args(since=None, until=None, shard_days=None):
+    return argparse.Namespace(since=since, until=until, shard_days=shard_days)
+
+
+def test_plan_shards():
+    """Test that shards cover the range without gaps, the last one shorter"""
+    print("Testing shard planning...")
+
+    shards = plan_shards('2023-01-01', '2023-03-15T12:00:00Z', 30)
+    single = plan_shards('2024-05-01T00:00:00Z', '2024-05-02T00:00:00Z', 30)
+    empty = plan_shards('2024-05-01', '2024-05-01', 30)
+
+    assert (shards == [('2023-01-01T00:00:00Z', '2023-01-31T00:00:00Z'),
+                   ('2023-01-31T00:00:00Z', '2023-03-02T00:00:00Z'),
+                   ('2023-03-02T00:00:00Z', '2023-03-15T12:00:00Z')] and
+            single == [('2024-05-01T00:00:00Z', '2024-05-02T00:00:00Z')] and empty == []), (
+        f"Shards {shards}, single {single}, empty {empty}")
+    print("✓ shard planning test passed")
+
+
+def test_backfill_resumes_from_checkpoint():
+    """Test that a backfill stopped after its first pages resumes from the checkpoint and loads every order once"""
+    print("\nTesting an interrupted backfill resuming from its checkpoint...")
+
+    from benchmark import generate_workload
+
+    orders, modifier_details, modifier_list_details = generate_workload(60, catalog_versions=1)
+    state = FakeAPIState(
+        orders, list(modifier_details.values()) + list(modifier_list_details.values()),
+        locations=['LOC_A', 'LOC_B'], history_days=120
+    )
+    server = start_server(state)
+    now = datetime.now(timezone.utc)
+    checkpoint = BackfillCheckpoint(
+        format_timestamp(now - timedelta(days=125)), format_timestamp(now), 30, ['LOC_A', 'LOC_B']
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'backfill.json')
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        original_client = square_orders.client
+        original_store = square_orders.order_store
+        square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+        square_orders.order_store = store
+        try:
+            # A deadline that has already passed stops the run after the first pages
+            for _ in iter_order_rows(iter_backfill_pages(checkpoint, path, page_size=4, deadline=0)):
+                pass
+            first_searches = state.requests['orders.search']
+            first_stored = store.count_orders()
+            saved = load_backfill_checkpoint(path)
+            first_done, total = count_shards(saved)
+
+            for _ in iter_order_rows(iter_backfill_pages(saved, path, page_size=4)):
+                pass
+            second_searches = state.requests['orders.search'] - first_searches
+            stored_ids = sorted({row.order_id for row in store.iter_rows()})
+            stored = store.count_orders()
+            done, _ = count_shards(saved)
+        finally:
+            square_orders.client = original_client
+            square_orders.order_store = original_store
+            store.close()
+            server.shutdown()
+
+    # A fresh run makes one search per page of each shard, and one for an empty shard
+    fresh_searches = 0
+    for location_id in ('LOC_A', 'LOC_B'):
+        for start_at, end_at in plan_shards(checkpoint.since, checkpoint.until, 30):
+            count = sum(1 for order in state.orders if order['location_id'] == location_id and
+                        start_at <= order['created_at'][:19] + 'Z' < end_at)
+            fresh_searches += max(1, -(-count // 4))
+
+    assert (0 < first_stored < 60 and first_done < total == 10 and saved.shards and
+            stored == 60 and stored_ids == sorted(order['id'] for order in state.orders) and done == total and
+            second_searches < fresh_searches <= first_searches + second_searches), (
+        f"First run stored {first_stored} orders, {first_done}/{total} shards done, "
+        f"{first_searches} searches; second run {second_searches} searches, fresh {fresh_searches}\n"
+        f"Stored {stored} orders, {done}/{total} shards done")
+    print("✓ backfill resume test passed")
+
+
+def test_checkpoint_must_match_request():
+    """Test that a saved checkpoint resumes without options but is not resumed for a different range"""
+    print("\nTesting backfill checkpoint matching...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'backfill.json')
+        started = open_checkpoint(backfill_args('2022-01-01', '2024-01-01', 14), path, ['LOC_A'])
+        started.advance('LOC_A 2022-01-01T00:00:00Z', None)
+        started.advance('LOC_A 2022-01-15T00:00:00Z', 'CURSOR_3')
+        save_backfill_checkpoint(path, started)
+
+        resumed = open_checkpoint(backfill_args(), path, ['LOC_A'])
+        same = open_checkpoint(backfill_args('2022-01-01T00:00:00Z'), path, ['LOC_A'])
+        rejected = []
+        for args, location_ids in ((backfill_args('2021-01-01'), ['LOC_A']),
+                                   (backfill_args(shard_days=30), ['LOC_A']),
+                                   (backfill_args(), ['LOC_A', 'LOC_B'])):
+            try:
+                open_checkpoint(args, path, location_ids)
+            except SystemExit:
+                rejected.append(True)
+
+    assert (started.since == '2022-01-01T00:00:00Z' and started.until == '2024-01-01T00:00:00Z' and
+            resumed.to_dict() == same.to_dict() == started.to_dict() and
+            resumed.is_done('LOC_A 2022-01-01T00:00:00Z') and
+            resumed.cursor('LOC_A 2022-01-15T00:00:00Z') == 'CURSOR_3' and
+            resumed.cursor('LOC_A 2022-01-01T00:00:00Z') is None and rejected == [True, True, True]), (
+        f"Started {started.to_dict()}, resumed {resumed.to_dict()}, rejected {rejected}")
+    print("✓ backfill checkpoint matching test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the historical backfill...")
+    print("=" * 60)
+
+    tests = [
+        test_plan_shards,
+        test_backfill_resumes_from_checkpoint,
+        test_checkpoint_must_match_request,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
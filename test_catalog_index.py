@@ -0,0 +1,167 @@
+"""
+Test file for catalog_index.py.
+This file prewarms the index from fake_api_server.py and checks that lookups only reach batch_get for older catalog versions.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_square_data import (
+    MockCatalogObject,
+    MockModifierData,
+    MockModifierListData
+)
+
+import square_orders
+from catalog_index import CatalogIndex, load_catalog_index, save_catalog_index
+from fake_api_server import FakeAPIState, server_url, start_server
+from square_orders import create_square_client, iter_order_rows, prewarm_catalog_index
+
+
+def test_prewarmed_sync():
+    """Test that a prewarmed index resolves current versions without batch_get and rows are unchanged"""
+    print("Testing a sync with a prewarmed catalog index...")
+
+    from benchmark import generate_workload
+
+    # Two catalog versions: the modifier lists changed in version 2. The item
+    # was then edited in version 3, and later orders carry that version
+    orders, modifier_details, modifier_list_details = generate_workload(300, modifiers_per_item=6, catalog_versions=2)
+    for order in orders:
+        for line_item in order.line_items:
+            if line_item.catalog_version == 2:
+                line_item.catalog_version = 3
+    variation = MockCatalogObject(id='CATALOG_ITEM_1', type='ITEM_VARIATION', version=3)
+    state = FakeAPIState(orders, list(modifier_details.values()) + list(modifier_list_details.values()) + [variation])
+    server = start_server(state)
+    pages = [orders[start:start + 50] for start in range(0, len(orders), 50)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'catalog_index.json')
+        original_client = square_orders.client
+        original_index = square_orders.catalog_index
+        square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+        try:
+            expected = list(iter_order_rows(iter(pages)))
+            unindexed_calls = state.requests['catalog.batch_get']
+
+            save_catalog_index(path, prewarm_catalog_index())
+            square_orders.catalog_index = load_catalog_index(path)
+            list_calls = state.requests['catalog.list']
+            rows = list(iter_order_rows(iter(pages)))
+            indexed_calls = state.requests['catalog.batch_get'] - unindexed_calls
+            index = square_orders.catalog_index
+        finally:
+            square_orders.client = original_client
+            square_orders.catalog_index = original_index
+            server.shutdown()
+
+    # Only objects whose current version is newer than the order's catalog version are looked up:
+    # both modifier lists, and modifiers first listed at version 2, for orders placed at version 1
+    stale = {
+        modifier.catalog_object_id
+        for order in orders for line_item in order.line_items if line_item.catalog_version == 1
+        for modifier in line_item.modifiers if state.catalog[modifier.catalog_object_id]['version'] > 1
+    }
+    assert (rows == expected and len(index.objects) == len(state.catalog) - 1 > 100 and list_calls > 1 and
+            'CATALOG_ITEM_1' not in index.objects and
+            indexed_calls == 2 and unindexed_calls > indexed_calls and index.catalog_version == 3 and
+            index.misses == len(stale) + 2 and index.hits > 0 and
+            {obj.id for obj in index.modifiers_in_list('LIST_RANK')} ==
+            {obj_id for obj_id, obj in modifier_details.items() if obj.modifier_data.modifier_list_id == 'LIST_RANK'}), (
+        f"Rows match {rows == expected}, {len(index.objects)} indexed of {len(state.catalog)}, "
+        f"{list_calls} list calls, batch_get calls {unindexed_calls} without and {indexed_calls} with the index, "
+        f"hits {index.hits}, misses {index.misses}, version {index.catalog_version}")
+    print("✓ prewarmed sync test passed")
+
+
+def test_index_versions():
+    """Test which catalog versions an indexed object answers for, and loading a damaged file"""
+    print("\nTesting catalog index version rules...")
+
+    index = CatalogIndex()
+    index.add(MockCatalogObject(
+        id='LIST_1', type='MODIFIER_LIST', version=20,
+        modifier_list_data=MockModifierListData(name='Patrol: Eagle Patrol', modifiers=[
+            MockCatalogObject(id='MODIFIER_1', type='MODIFIER', version=10,
+                              modifier_data=MockModifierData(name='Eagle', modifier_list_id='LIST_1'))
+        ])
+    ))
+    index.add(MockCatalogObject(id='MODIFIER_2', type='MODIFIER', version=30,
+                                modifier_data=MockModifierData(name='Hawk', modifier_list_id='LIST_1')))
+    # An item variation edited later is not indexed but extends the versions the index answers for
+    index.add(MockCatalogObject(id='VARIATION_1', type='ITEM_VARIATION', version=35))
+
+    answered = {
+        catalog_version: sorted(index.get_many(catalog_version, ['MODIFIER_1', 'MODIFIER_2', 'LIST_1', 'GONE']))
+        for catalog_version in (5, 10, 25, 30, 35, 40, None)
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'catalog_index.json')
+        save_catalog_index(path, index)
+        loaded = load_catalog_index(path)
+        with open(path, 'w') as f:
+            f.write('{"objects": [')
+        damaged = load_catalog_index(path)
+        missing = load_catalog_index(os.path.join(tmpdir, 'missing.json'))
+
+    expected = {
+        5: [],
+        10: ['MODIFIER_1'],
+        25: ['LIST_1', 'MODIFIER_1'],
+        30: ['LIST_1', 'MODIFIER_1', 'MODIFIER_2'],
+        35: ['LIST_1', 'MODIFIER_1', 'MODIFIER_2'],
+        # Newer than anything the index has seen: the objects may have changed since
+        40: [],
+        None: ['LIST_1', 'MODIFIER_1', 'MODIFIER_2']
+    }
+    modifier = loaded.get_many(30, ['MODIFIER_2'])['MODIFIER_2']
+    assert (answered == expected and loaded.to_dict() == index.to_dict() and loaded.catalog_version == 35 and
+            'VARIATION_1' not in loaded.objects and
+            modifier.modifier_data.name == 'Hawk' and modifier.modifier_data.modifier_list_id == 'LIST_1' and
+            loaded.objects['LIST_1'].modifier_list_data.name == 'Patrol: Eagle Patrol' and
+            [obj.id for obj in loaded.modifiers_in_list('LIST_1')] == ['MODIFIER_1', 'MODIFIER_2'] and
+            damaged is None and missing is None), (
+        f"Answered {answered}, loaded {loaded.to_dict()}, damaged {damaged}, missing {missing}")
+    print("✓ catalog index version test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the catalog index...")
+    print("=" * 60)
+
+    tests = [
+        test_prewarmed_sync,
+        test_index_versions,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
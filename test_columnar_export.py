@@ -0,0 +1,114 @@
+"""
+Test file for columnar_export.py.
+This file writes order data rows to Parquet and Arrow IPC files and reads them back.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from columnar_export import parse_money, write_columnar
+from order_row import OrderRow
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def make_rows(count):
+    return [
+        OrderRow(f'ORDER_{number}', f'{15000 + 10000 * (number % 2)} USD', 'Camp Registration',
+                 scout_name=f'Scout {number}', rank='Scout',
+                 patrol='Eagle Patrol' if number % 3 else '')
+        for number in range(count)
+    ]
+
+
+def test_parquet_export():
+    """Test that Parquet output has typed money and dictionary-encoded columns"""
+    print("Testing Parquet export...")
+    if pyarrow is None:
+        print("✓ Parquet export test skipped (pyarrow not installed)")
+        return
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'orders.parquet')
+        rows_written = write_columnar(iter(make_rows(25)), path, 'parquet', batch_rows=10)
+        table = pq.read_table(path)
+
+    first = table.slice(0, 1).to_pylist()[0]
+    assert (rows_written == 25 and table.num_rows == 25 and
+            table.schema.field('total_money').type == pyarrow.int64() and
+            pyarrow.types.is_dictionary(table.schema.field('patrol').type) and
+            first['total_money'] == 15000 and first['currency'] == 'USD' and
+            first['patrol'] == 'Rocking Chair' and first['name'] == 'Scout 0' and
+            parse_money('0 USD') == (0, 'USD')), (
+        f"Rows written {rows_written}, schema {table.schema}, first row {first}")
+    print("✓ Parquet export test passed")
+
+
+def test_arrow_export():
+    """Test that Arrow IPC output spanning several batches can be memory-mapped and read"""
+    print("\nTesting Arrow IPC export...")
+    if pyarrow is None:
+        print("✓ Arrow IPC export test skipped (pyarrow not installed)")
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'orders.arrow')
+        # Later batches add dictionary values, which must be written as deltas
+        rows = make_rows(20) + [OrderRow('ORDER_LAST', '5000 CAD', 'Day Pass', patrol='Hawk Patrol')]
+        rows_written = write_columnar(iter(rows), path, 'arrow', batch_rows=10)
+        with pyarrow.memory_map(path) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+            last = table.slice(20, 1).to_pylist()[0]
+
+    assert (rows_written == 21 and table.num_rows == 21 and
+            last == {
+                'order_id': 'ORDER_LAST', 'total_money': 5000, 'currency': 'CAD',
+                'line_item_name': 'Day Pass', 'name': '', 'rank': '', 'patrol': 'Hawk Patrol',
+                'emergency_contact': '', 'emergency_contact_phone': '', 'cell_phone': '',
+                'travel_to_campout': ''
+            }), f"Rows written {rows_written}, last row {last}"
+    print("✓ Arrow IPC export test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the columnar export...")
+    print("=" * 60)
+
+    tests = [
+        test_parquet_export,
+        test_arrow_export,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+End-to-end test of square_orders.py and google_sheets.py against fake_api_server.py.
+The real Square client and googleapiclient service talk HTTP to a local stand-in server.
+"""
+
+import sys
+import os
+import csv
+import gzip
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_square_data import (
+    mock_orders_response,
+    mock_catalog_modifiers_response
+)
+
+import square_orders
+from config import Config
+from fake_api_server import FakeAPIState, server_url, start_server
+from run_metrics import metrics
+from async_pipeline import stream_order_rows
+from csv_export import write_csv
+from order_row import OUTPUT_HEADERS, OrderRow
+from google_sheets import SHEET_HEADERS, reset_sheets_service, write_to_google_sheet
+from square_orders import (
+    create_square_client,
+    iter_location_order_pages,
+    iter_order_pages,
+    iter_order_rows,
+    write_routed_sheets
+)
+
+
+def test_end_to_end_with_faults():
+    """Test a full sync against the fake server while it injects 429s and 500s"""
+    print("Testing end-to-end sync against the fake API server...")
+
+    state = FakeAPIState(
+        mock_orders_response.orders,
+        mock_catalog_modifiers_response.objects,
+        throttle_rate=0.2,
+        error_rate=0.1,
+        retry_after=0,
+        seed=3
+    )
+    server = start_server(state)
+
+    original_client = square_orders.client
+    original_endpoint = Config.SHEETS_API_ENDPOINT
+    original_credentials = Config.GOOGLE_CREDENTIALS_JSON
+    square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+    Config.SHEETS_API_ENDPOINT = server_url(server)
+    Config.GOOGLE_CREDENTIALS_JSON = ''
+    reset_sheets_service()
+    metrics.reset()
+    try:
+        order_data = list(iter_order_rows(iter_order_pages(page_size=2)))
+        success = write_to_google_sheet(order_data, sheet_id='FAKE_SHEET', sheet_name='Sheet1')
+    finally:
+        square_orders.client = original_client
+        Config.SHEETS_API_ENDPOINT = original_endpoint
+        Config.GOOGLE_CREDENTIALS_JSON = original_credentials
+        reset_sheets_service()
+        server.shutdown()
+
+    sheet = state.sheets.get('Sheet1', [])
+    injected = sum(state.faults.values())
+    traffic = metrics.report()['bytes']
+    served_searches = (state.requests['orders.search'] - state.faults[('orders.search', 429)] -
+                       state.faults[('orders.search', 500)])
+
+    assert (success and [row['order_id'] for row in order_data] == ['ORDER_1', 'ORDER_2', 'ORDER_3'] and
+            order_data[0]['rank'] == 'Tenderfoot' and
+            sheet[0] == SHEET_HEADERS and len(sheet) == 4 and
+            served_searches == 2 and injected > 0 and
+            traffic['square']['received'] > 0 and traffic['sheets']['sent'] > 0), (
+        f"Rows {order_data}, sheet {sheet}, requests {dict(state.requests)}, faults {dict(state.faults)}\n"
+        f"Bytes {traffic}")
+    print(f"✓ end-to-end test passed ({injected} injected faults retried)")
+
+
+def test_streaming_csv_export():
+    """Test that rows streamed from the async pipeline can be exported to a gzip CSV file"""
+    print("\nTesting streaming CSV export from the async pipeline...")
+
+    state = FakeAPIState(mock_orders_response.orders, mock_catalog_modifiers_response.objects)
+    server = start_server(state)
+
+    original_base_url = Config.SQUARE_BASE_URL
+    original_token = Config.SQUARE_ACCESS_TOKEN
+    original_fetch_limit = square_orders.FETCH_LIMIT
+    Config.SQUARE_BASE_URL = server_url(server)
+    Config.SQUARE_ACCESS_TOKEN = 'FAKE_TOKEN'
+    square_orders.FETCH_LIMIT = 1
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'orders.csv.gz')
+            rows_written = write_csv(stream_order_rows(), path)
+            with gzip.open(path, 'rt', newline='') as f:
+                lines = list(csv.reader(f))
+    finally:
+        Config.SQUARE_BASE_URL = original_base_url
+        Config.SQUARE_ACCESS_TOKEN = original_token
+        square_orders.FETCH_LIMIT = original_fetch_limit
+        server.shutdown()
+
+    assert (rows_written == 3 and lines[0] == OUTPUT_HEADERS and
+            [line[0] for line in lines[1:]] == ['ORDER_1', 'ORDER_2', 'ORDER_3'] and
+            state.requests['orders.search'] == 3), (
+        f"Rows written {rows_written}, lines {lines}, requests {dict(state.requests)}")
+    print("✓ streaming CSV export test passed")
+
+
+def test_multi_location_routed_sync():
+    """Test that several locations are fetched in one run and each lands on its routed tab"""
+    print("\nTesting multi-location sync with routed tabs...")
+
+    from benchmark import generate_workload
+
+    orders, modifier_details, modifier_list_details = generate_workload(9, catalog_versions=1)
+    locations = ['LOC_A', 'LOC_B', 'LOC_C']
+    state = FakeAPIState(
+        orders, list(modifier_details.values()) + list(modifier_list_details.values()), locations=locations,
+        tabs=('Sheet1', 'Troop 12', 'Pack 40', 'LastUpdate')
+    )
+    server = start_server(state)
+
+    original_client = square_orders.client
+    original_routes = square_orders.location_routes
+    original_locations = square_orders.order_locations
+    original_settings = (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON,
+                         Config.GOOGLE_SHEET_ID, Config.SHEET_NAME)
+    square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+    # LOC_C has no route, so its orders go to the default tab
+    square_orders.location_routes = {'LOC_A': (None, 'Troop 12'), 'LOC_B': (None, 'Pack 40')}
+    square_orders.order_locations = {}
+    Config.SHEETS_API_ENDPOINT = server_url(server)
+    Config.GOOGLE_CREDENTIALS_JSON = ''
+    Config.GOOGLE_SHEET_ID = 'FAKE_SHEET'
+    Config.SHEET_NAME = 'Sheet1'
+    reset_sheets_service()
+    try:
+        order_data = list(iter_order_rows(iter_location_order_pages(locations, page_size=2)))
+        success = write_routed_sheets(order_data, 'overwrite')
+    finally:
+        square_orders.client = original_client
+        square_orders.location_routes = original_routes
+        square_orders.order_locations = original_locations
+        (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON,
+         Config.GOOGLE_SHEET_ID, Config.SHEET_NAME) = original_settings
+        reset_sheets_service()
+        server.shutdown()
+
+    expected = {
+        tab: [order['id'] for order in state.orders if order['location_id'] == location_id]
+        for tab, location_id in (('Troop 12', 'LOC_A'), ('Pack 40', 'LOC_B'), ('Sheet1', 'LOC_C'))
+    }
+    tabs = {tab: sorted({row[0] for row in state.sheets.get(tab, [])[1:]}) for tab in expected}
+
+    assert (success and len(order_data) == 9 and tabs == {tab: sorted(ids) for tab, ids in expected.items()} and
+            all(state.sheets[tab][0] == SHEET_HEADERS for tab in expected) and
+            state.requests['orders.search'] == 6 and state.sheets['LastUpdate'] and
+            state.requests['sheets.get'] == 1 and state.requests['sheets.batchUpdate'] == 1 and
+            sum(state.requests.values()) == 6 + state.requests['catalog.batch_get'] + 2), (
+        f"Tabs {tabs}, expected {expected}, requests {dict(state.requests)}")
+    print("✓ multi-location routed sync test passed")
+
+
+def test_overwrite_in_one_request():
+    """Test that an overwrite replaces the tab, truncates stale rows and stamps LastUpdate in one batchUpdate"""
+    print("\nTesting single-request overwrite...")
+
+    state = FakeAPIState([], [])
+    # A longer table from an earlier run, in a grid too small for the new rows
+    for number in range(8):
+        state.write_values(f'Sheet1!A{number + 1}', [[f'STALE_{number}', 'x', 'y']])
+    state.grids['Sheet1'][1:] = [2, 3]
+    server = start_server(state)
+
+    original_endpoint = Config.SHEETS_API_ENDPOINT
+    original_credentials = Config.GOOGLE_CREDENTIALS_JSON
+    Config.SHEETS_API_ENDPOINT = server_url(server)
+    Config.GOOGLE_CREDENTIALS_JSON = ''
+    reset_sheets_service()
+    try:
+        first = write_to_google_sheet(
+            [OrderRow(f'ORDER_{number}', '15000 USD', 'Camp Registration') for number in range(3)],
+            sheet_id='FAKE_SHEET', sheet_name='Sheet1', log_update=True
+        )
+        missing_tab = write_to_google_sheet(
+            [OrderRow('ORDER_1', '15000 USD', 'Camp Registration')],
+            sheet_id='FAKE_SHEET', sheet_name='No Such Tab'
+        )
+    finally:
+        Config.SHEETS_API_ENDPOINT = original_endpoint
+        Config.GOOGLE_CREDENTIALS_JSON = original_credentials
+        reset_sheets_service()
+        server.shutdown()
+
+    sheet = state.sheets['Sheet1']
+    assert (first and not missing_tab and sheet[0] == SHEET_HEADERS and
+            [row[0] for row in sheet[1:]] == ['ORDER_0', 'ORDER_1', 'ORDER_2'] and
+            state.grids['Sheet1'][1:] == [4, len(SHEET_HEADERS)] and
+            len(state.sheets['LastUpdate']) == 1 and state.sheets['LastUpdate'][0][0] and
+            dict(state.requests) == {'sheets.get': 2, 'sheets.batchUpdate': 1}), (
+        f"Sheet {sheet}, grid {state.grids['Sheet1']}, LastUpdate {state.sheets['LastUpdate']}, "
+        f"requests {dict(state.requests)}")
+    print("✓ single-request overwrite test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running end-to-end tests against the fake API server...")
+    print("=" * 60)
+
+    tests = [
+        test_end_to_end_with_faults,
+        test_streaming_csv_export,
+        test_multi_location_routed_sync,
+        test_overwrite_in_one_request,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Test file for google_sheets.py using an in-memory stand-in for the Sheets API.
+This file exercises the sheet writers without credentials or network access.
+"""
+
+import sys
+import os
+import threading
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import google_sheets
+from google.oauth2 import service_account
+from googleapiclient import discovery
+from google_sheets import (
+    SHEET_HEADERS,
+    build_sheet_rows,
+    plan_replace_requests,
+    plan_tab_writes,
+    plan_upsert,
+    write_to_google_sheet,
+    get_sheets_service,
+    reset_sheets_service
+)
+from config import Config
+from order_row import OrderRow
+
+
+class FakeRequest:
+    """Mirrors the HttpRequest attributes run_request() uses: body, postproc and execute()"""
+    def __init__(self, response):
+        self.response = response
+        self.body = None
+        self.postproc = lambda resp, content: self.response
+
+    def execute(self):
+        return self.postproc(None, b'')
+
+
+class FakeValues:
+    """Records every values() call and keeps the sheet contents in memory"""
+    def __init__(self, values=None):
+        self.values = [list(row) for row in (values or [])]
+        self.calls = []
+
+    def get(self, spreadsheetId, range):
+        self.calls.append(('get', range))
+        return FakeRequest({'values': [list(row) for row in self.values]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        self.calls.append(('batchUpdate', body))
+        cells = 0
+        rows = 0
+        for entry in body['data']:
+            start = int(entry['range'].split('!A')[1]) - 1
+            for offset, row in enumerate(entry['values']):
+                while len(self.values) <= start + offset:
+                    self.values.append([])
+                self.values[start + offset] = [str(value) for value in row]
+                cells += len(row)
+                rows += 1
+        return FakeRequest({'totalUpdatedRows': rows, 'totalUpdatedCells': cells})
+
+
+class LostResponseError(Exception):
+    """A server error returned after the write had already been applied"""
+    status_code = 503
+
+
+class FlakyValues(FakeValues):
+    """Applies the first batchUpdate but fails its response, as after a timeout, so the caller retries it"""
+    def __init__(self, values=None):
+        super().__init__(values)
+        self.failed = False
+
+    def batchUpdate(self, spreadsheetId, body):
+        request = FakeRequest(None)
+        write = super().batchUpdate
+
+        def execute():
+            response = write(spreadsheetId, body).execute()
+            if not self.failed:
+                self.failed = True
+                raise LostResponseError("Service unavailable")
+            return response
+
+        request.execute = execute
+        return request
+
+
+class FakeSheetsService:
+    def __init__(self, values=None, fake_values=None):
+        self.fake_values = fake_values or FakeValues(values)
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self.fake_values
+
+
+def make_row(order_id, line_item_name='Camp Registration', scout_name='', patrol=''):
+    return OrderRow(order_id, '15000 USD', line_item_name, scout_name=scout_name, patrol=patrol)
+
+
+def test_plan_upsert():
+    """Test that upsert only rewrites changed rows and appends new ones"""
+    print("Testing plan_upsert...")
+
+    existing = build_sheet_rows([
+        make_row('ORDER_1', scout_name='John Smith'),
+        make_row('ORDER_2', scout_name='Jane Doe'),
+    ])
+    rows = build_sheet_rows([
+        make_row('ORDER_1', scout_name='John Smith'),
+        make_row('ORDER_2', scout_name='Jane Doe', patrol='Eagle Patrol'),
+        make_row('ORDER_3', scout_name='New Scout'),
+    ])
+
+    updates = plan_upsert(existing, rows, 'Sheet1')
+    ranges = [entry['range'] for entry in updates]
+
+    assert ranges == ['Sheet1!A3', 'Sheet1!A4'] and updates[1]['values'][0][0] == 'ORDER_3', f"Got ranges {ranges}"
+    print("✓ plan_upsert test passed")
+
+
+def test_upsert_write_mode():
+    """Test that upsert mode reads the sheet once and writes in a single batchUpdate"""
+    print("\nTesting write_to_google_sheet upsert mode...")
+
+    service = FakeSheetsService(build_sheet_rows([make_row('ORDER_1', scout_name='John Smith')]))
+    original_get_service = google_sheets.get_sheets_service
+    google_sheets.get_sheets_service = lambda: service
+    try:
+        first = write_to_google_sheet(
+            [make_row('ORDER_1', scout_name='John Smith'), make_row('ORDER_2')],
+            sheet_id='SHEET', sheet_name='Sheet1', write_mode='upsert'
+        )
+        # A second identical run should not write anything
+        second = write_to_google_sheet(
+            [make_row('ORDER_1', scout_name='John Smith'), make_row('ORDER_2')],
+            sheet_id='SHEET', sheet_name='Sheet1', write_mode='upsert'
+        )
+    finally:
+        google_sheets.get_sheets_service = original_get_service
+
+    call_types = [call[0] for call in service.fake_values.calls]
+
+    assert (first and second and call_types == ['get', 'batchUpdate', 'get'] and
+            service.fake_values.values[0] == SHEET_HEADERS and
+            service.fake_values.values[2][5] == 'Rocking Chair'), (
+        f"Calls {call_types}, sheet {service.fake_values.values}")
+    print("✓ upsert write mode test passed")
+
+
+def test_append_write_mode_retry():
+    """Test that append mode writes after the existing rows, and retrying a lost response adds no rows"""
+    print("\nTesting write_to_google_sheet append mode with a retried write...")
+
+    values = FlakyValues(build_sheet_rows([make_row('ORDER_1', scout_name='John Smith')]))
+    service = FakeSheetsService(fake_values=values)
+    original_get_service = google_sheets.get_sheets_service
+    google_sheets.get_sheets_service = lambda: service
+    try:
+        success = write_to_google_sheet(
+            [make_row('ORDER_2'), make_row('ORDER_3')], sheet_id='SHEET', sheet_name='Sheet1', write_mode='append'
+        )
+    finally:
+        google_sheets.get_sheets_service = original_get_service
+
+    call_types = [call[0] for call in values.calls]
+
+    assert (success and values.failed and call_types == ['get', 'batchUpdate', 'batchUpdate'] and
+            [row[0] for row in values.values] == [SHEET_HEADERS[0], 'ORDER_1', 'ORDER_2', 'ORDER_3']), (
+        f"Calls {call_types}, sheet {values.values}")
+    print("✓ append write mode retry test passed")
+
+
+def test_plan_tab_writes():
+    """Test that several tabs are written in one batch, appending after existing rows without the header"""
+    print("\nTesting plan_tab_writes...")
+
+    tab_rows = {
+        'Troop 12': build_sheet_rows([make_row('ORDER_1'), make_row('ORDER_2')]),
+        'Pack 40': build_sheet_rows([make_row('ORDER_3')])
+    }
+    existing = {'Troop 12': build_sheet_rows([make_row('ORDER_0')])}
+    properties = {
+        'Troop 12': {'sheetId': 7, 'gridProperties': {'rowCount': 1000, 'columnCount': 26}},
+        'Pack 40': {'sheetId': 8, 'gridProperties': {'rowCount': 1, 'columnCount': 5}},
+        'LastUpdate': {'sheetId': 9}
+    }
+
+    overwrite = plan_replace_requests(tab_rows, properties, timestamp='2025-08-23 10:00:00 CDT')
+    append = plan_tab_writes(tab_rows, existing, 'append')
+
+    assert ([next(iter(request)) for request in overwrite] ==
+            ['updateCells', 'appendDimension', 'appendDimension', 'updateCells', 'updateCells'] and
+            overwrite[0]['updateCells']['range'] == {'sheetId': 7} and
+            [request['appendDimension']['length'] for request in overwrite[1:3]] == [1, 5] and
+            overwrite[4]['updateCells']['range']['endRowIndex'] == 1 and
+            [entry['range'] for entry in append] == ['Troop 12!A3', 'Pack 40!A1'] and
+            [row[0] for row in append[0]['values']] == ['ORDER_1', 'ORDER_2'] and
+            append[1]['values'][0] == SHEET_HEADERS), f"Overwrite {overwrite}, append {append}"
+    print("✓ plan_tab_writes test passed")
+
+
+def test_sheets_service_cache():
+    """Test that credentials are built once per process and services once per thread"""
+    print("\nTesting Sheets service cache...")
+
+    built = []
+    credentials_created = []
+
+    class FakeCredentials:
+        expired = False
+
+    def fake_from_service_account_info(info, scopes=None):
+        credentials_created.append(info)
+        return FakeCredentials()
+
+    def fake_build(*args, **kwargs):
+        built.append(kwargs)
+        return object()
+
+    # google_sheets imports these on first use, so patch them where they are defined
+    original_build = discovery.build
+    original_from_info = service_account.Credentials.from_service_account_info
+    original_credentials_json = Config.GOOGLE_CREDENTIALS_JSON
+    discovery.build = fake_build
+    service_account.Credentials.from_service_account_info = fake_from_service_account_info
+    Config.GOOGLE_CREDENTIALS_JSON = '{"type": "service_account"}'
+    reset_sheets_service()
+    try:
+        first = get_sheets_service()
+        second = get_sheets_service()
+
+        other_thread = []
+        thread = threading.Thread(target=lambda: other_thread.append(get_sheets_service()))
+        thread.start()
+        thread.join()
+    finally:
+        discovery.build = original_build
+        service_account.Credentials.from_service_account_info = original_from_info
+        Config.GOOGLE_CREDENTIALS_JSON = original_credentials_json
+        reset_sheets_service()
+
+    assert (first is second and other_thread[0] is not first and
+            len(credentials_created) == 1 and len(built) == 2 and
+            built[0].get('static_discovery') is True), (
+        f"Credentials created {len(credentials_created)}, services built {len(built)}")
+    print("✓ Sheets service cache test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for Google Sheets writers with a fake service...")
+    print("=" * 60)
+
+    tests = [
+        test_plan_upsert,
+        test_upsert_write_mode,
+        test_append_write_mode_retry,
+        test_plan_tab_writes,
+        test_sheets_service_cache,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
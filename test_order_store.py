@@ -0,0 +1,362 @@
+"""
+Test file for order_store.py.
+This file syncs mock orders into a temporary store and checks rows, rebuilds and indexed queries.
+"""
+
+import sys
+import os
+import argparse
+import copy
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_square_data import (
+    mock_orders_response,
+    mock_orders_with_refund_response,
+    mock_orders_with_modifier_lists_response,
+    mock_catalog_modifiers_response,
+    mock_catalog_modifiers_with_list_response,
+    MockCatalogObject,
+    MockModifierListData,
+    MockSquareClient
+)
+
+import square_orders
+from modifier_mapping import ModifierMapper, DEFAULT_COLUMNS
+from order_store import OrderStore
+from config import Config
+from fake_api_server import FakeAPIState, server_url, start_server
+from square_orders import create_square_client, fetch_order_rows, iter_order_rows, iter_stored_rows, rebuild_store_rows
+from transform_pool import rebuild_rows_parallel
+
+ORDER_PAGES = [
+    mock_orders_response.orders,
+    mock_orders_with_refund_response.orders,
+    mock_orders_with_modifier_lists_response.orders
+]
+
+CATALOG_OBJECTS = mock_catalog_modifiers_response.objects + mock_catalog_modifiers_with_list_response.objects + [
+    MockCatalogObject(
+        id="MODIFIER_LIST_1",
+        type="MODIFIER_LIST",
+        version=2,
+        modifier_list_data=MockModifierListData(name="Patrol: Eagle Patrol")
+    )
+]
+
+
+class NoAPIClient:
+    """Square client stand-in that fails the test if any API is called"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"Unexpected Square API access: {name}")
+
+
+def sync_into_store(store):
+    """Run mock pages through iter_order_rows() with the store open; returns the rows produced"""
+    original_client = square_orders.client
+    original_store = square_orders.order_store
+    square_orders.client = MockSquareClient(catalog_objects=CATALOG_OBJECTS)
+    square_orders.order_store = store
+    try:
+        return list(iter_order_rows(iter(ORDER_PAGES)))
+    finally:
+        square_orders.client = original_client
+        square_orders.order_store = original_store
+
+
+def test_store_round_trip():
+    """Test that rows read back from the store match the rows built during the sync"""
+    print("Testing order store round trip...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        try:
+            synced = sync_into_store(store)
+            # Syncing the same orders again replaces them instead of duplicating them
+            sync_into_store(store)
+            stored = list(store.iter_rows())
+            changed = list(store.iter_rows(order_ids={'ORDER_2', 'ORDER_REFUNDED'}))
+            order_count = store.count_orders()
+        finally:
+            store.close()
+
+    # ORDER_1 comes back on the refund page; the store keeps one copy, at its first position
+    assert (stored == synced[:3] + synced[4:] and len(synced) == 6 and order_count == 5 and
+            [row.order_id for row in changed] == ['ORDER_2', 'ORDER_REFUNDED'] and
+            changed[1].total_money == '0 USD' and
+            stored[-1].patrol == 'Eagle Patrol - Special Accommodation'), (
+        f"Synced {synced}\n"
+        f"Stored {stored}")
+    print("✓ order store round trip test passed")
+
+
+def test_rebuild_after_mapping_change():
+    """Test that rows are rebuilt under new modifier rules without calling Square"""
+    print("\nTesting row rebuild after a mapping change...")
+
+    # Emergency contacts no longer get their own column
+    columns = {key: field for key, field in DEFAULT_COLUMNS.items() if field != 'emergency_contact'}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        original_client = square_orders.client
+        original_store = square_orders.order_store
+        original_mapper = square_orders.modifier_mapper
+        try:
+            before = {row.order_id: row.emergency_contact for row in sync_into_store(store)}
+            square_orders.client = NoAPIClient()
+            square_orders.order_store = store
+            square_orders.modifier_mapper = ModifierMapper(columns)
+            rebuilt = rebuild_store_rows()
+            after = {row.order_id: row for row in store.iter_rows()}
+        finally:
+            square_orders.client = original_client
+            square_orders.order_store = original_store
+            square_orders.modifier_mapper = original_mapper
+            store.close()
+
+    assert (rebuilt == 5 and before['ORDER_2'] == 'Alice Doe' and after['ORDER_2'].emergency_contact == '' and
+            after['ORDER_2'].scout_name == 'Jane Doe' and after['ORDER_1'].rank == 'Tenderfoot'), (
+        f"Rebuilt {rebuilt}, before {before}, after {after}")
+    print("✓ row rebuild test passed")
+
+
+def test_parallel_rebuild():
+    """Test that a rebuild on worker processes writes the same rows, in the same order, as a serial one"""
+    print("\nTesting parallel row rebuild...")
+
+    columns = {key: field for key, field in DEFAULT_COLUMNS.items() if field != 'emergency_contact'}
+    mapper = ModifierMapper(columns)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        original_store = square_orders.order_store
+        original_mapper = square_orders.modifier_mapper
+        try:
+            sync_into_store(store)
+            square_orders.order_store = store
+            square_orders.modifier_mapper = mapper
+            serial_count = rebuild_store_rows(workers=1)
+            serial = list(store.iter_rows())
+            store.conn.execute('DELETE FROM order_rows')
+            store.conn.commit()
+            # Batches of two orders, so the rows come back from several tasks
+            parallel_count = rebuild_rows_parallel(store, mapper, workers=2, batch_size=2)
+            parallel = list(store.iter_rows())
+        finally:
+            square_orders.order_store = original_store
+            square_orders.modifier_mapper = original_mapper
+            store.close()
+
+    assert (parallel_count == serial_count == 5 and parallel == serial and
+            all(row.emergency_contact == '' for row in parallel)), (
+        f"Serial {serial_count} {serial}\n"
+        f"Parallel {parallel_count} {parallel}")
+    print("✓ parallel row rebuild test passed")
+
+
+def test_indexed_queries():
+    """Test patrol and name lookups and that they use the order_rows indexes"""
+    print("\nTesting indexed queries...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        try:
+            sync_into_store(store)
+            by_patrol = [row.order_id for row in store.iter_rows(patrol='Eagle Patrol')]
+            by_name = [row.order_id for row in store.iter_rows(name='Jane Doe')]
+            by_scouter = [row.order_id for row in store.iter_rows(name='Bob Doe')]
+            plans = ' '.join(
+                str(step) for sql in (
+                    "SELECT * FROM order_rows WHERE patrol = 'Eagle Patrol'",
+                    "SELECT * FROM order_rows WHERE COALESCE(NULLIF(scout_name, ''), scouter_name) = 'Jane Doe'",
+                    "SELECT * FROM orders WHERE updated_at > '2025-01-01'"
+                )
+                for step in store.conn.execute(f'EXPLAIN QUERY PLAN {sql}')
+            )
+        finally:
+            store.close()
+
+    assert (by_patrol == ['ORDER_3'] and by_name == ['ORDER_2'] and by_scouter == [] and
+            'idx_order_rows_patrol' in plans and 'idx_order_rows_name' in plans and
+            'idx_orders_updated_at' in plans), (
+        f"By patrol {by_patrol}, by name {by_name}, by scouter {by_scouter}, plans {plans}")
+    print("✓ indexed queries test passed")
+
+
+def test_location_filter():
+    """Test that a run only reads back the stored orders of its own locations"""
+    print("\nTesting stored rows filtered by location...")
+
+    # The same orders synced once for each of two locations sharing one store
+    pages = []
+    for location_id in ('LOC_A', 'LOC_B'):
+        page = [copy.copy(order) for order in mock_orders_response.orders]
+        for order in page:
+            order.id = f"{location_id}_{order.id}"
+            order.location_id = location_id
+        pages.append(page)
+
+    original_client = square_orders.client
+    original_store = square_orders.order_store
+    original_location_id = Config.SQUARE_LOCATION_ID
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        square_orders.client = MockSquareClient(catalog_objects=CATALOG_OBJECTS)
+        square_orders.order_store = store
+        try:
+            synced = list(iter_order_rows(iter(pages)))
+            Config.SQUARE_LOCATION_ID = 'LOC_B'
+            only_b = [row.order_id for row in iter_stored_rows()]
+            Config.SQUARE_LOCATION_ID = 'LOC_A, LOC_B'
+            both = [row.order_id for row in iter_stored_rows()]
+            locations = store.order_locations(['LOC_A'])
+        finally:
+            Config.SQUARE_LOCATION_ID = original_location_id
+            square_orders.client = original_client
+            square_orders.order_store = original_store
+            store.close()
+
+    assert (only_b == [row.order_id for row in synced if row.order_id.startswith('LOC_B_')] and only_b and
+            both == [row.order_id for row in synced] and
+            set(locations.values()) == {'LOC_A'} and len(locations) == len(mock_orders_response.orders)), (
+        f"LOC_B rows {only_b}, both {both}, LOC_A locations {locations}")
+    print("✓ location filter test passed")
+
+
+def test_fetch_streams_with_store():
+    """Test that a full sync streams rows into the open store and an incremental one reads them back"""
+    print("\nTesting streaming with the order store open...")
+
+    from benchmark import generate_workload
+
+    orders, modifier_details, modifier_list_details = generate_workload(60, catalog_versions=1)
+    state = FakeAPIState(
+        orders, list(modifier_details.values()) + list(modifier_list_details.values()), locations=['LOC_A']
+    )
+    server = start_server(state)
+
+    original_client = square_orders.client
+    original_store = square_orders.order_store
+    original_fetch_limit = square_orders.FETCH_LIMIT
+    original_location_id = Config.SQUARE_LOCATION_ID
+    original_state_path = Config.SYNC_STATE_PATH
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+        square_orders.order_store = store
+        square_orders.FETCH_LIMIT = 10
+        Config.SQUARE_LOCATION_ID = 'LOC_A'
+        Config.SYNC_STATE_PATH = os.path.join(tmpdir, 'sync_state.json')
+        try:
+            rows, _, _ = fetch_order_rows(argparse.Namespace(incremental=False, use_async=False))
+            first = next(rows)
+            searches_at_first_row = state.requests['orders.search']
+            streamed = [first] + list(rows)
+            full_searches = state.requests['orders.search']
+
+            rows, _, _ = fetch_order_rows(argparse.Namespace(incremental=True, use_async=False))
+            searches_before_rows = state.requests['orders.search'] - full_searches
+            read_back = list(rows)
+        finally:
+            Config.SQUARE_LOCATION_ID = original_location_id
+            Config.SYNC_STATE_PATH = original_state_path
+            square_orders.FETCH_LIMIT = original_fetch_limit
+            square_orders.client = original_client
+            square_orders.order_store = original_store
+            store.close()
+            server.shutdown()
+
+    assert (searches_at_first_row == 1 and full_searches == 6 and searches_before_rows == 6 and
+            len({row.order_id for row in streamed}) == 60 and read_back == streamed), (
+        f"{searches_at_first_row} searches at the first row, {full_searches} in total, "
+        f"{searches_before_rows} before incremental rows; {len(streamed)} streamed, {len(read_back)} read back")
+    print("✓ streaming with store test passed")
+
+
+def test_incremental_with_empty_store():
+    """Test that an incremental run over an empty store ignores the watermark and fetches every order"""
+    print("\nTesting an incremental run with an empty order store...")
+
+    from benchmark import generate_workload
+    from sync_state import Watermark, save_watermark
+
+    orders, modifier_details, modifier_list_details = generate_workload(30, catalog_versions=1)
+    state = FakeAPIState(
+        orders, list(modifier_details.values()) + list(modifier_list_details.values()), locations=['LOC_A']
+    )
+    server = start_server(state)
+
+    original_client = square_orders.client
+    original_store = square_orders.order_store
+    original_location_id = Config.SQUARE_LOCATION_ID
+    original_state_path = Config.SYNC_STATE_PATH
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = OrderStore(os.path.join(tmpdir, 'orders.sqlite'))
+        square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+        square_orders.order_store = store
+        Config.SQUARE_LOCATION_ID = 'LOC_A'
+        Config.SYNC_STATE_PATH = os.path.join(tmpdir, 'sync_state.json')
+        # A watermark restored without its store: no order is newer than it
+        save_watermark(Config.SYNC_STATE_PATH, Watermark('2999-01-01T00:00:00Z'))
+        args = argparse.Namespace(incremental=True, use_async=False)
+        try:
+            rows, empty_watermark, _ = fetch_order_rows(args)
+            rows = list(rows)
+            _, stored_watermark, _ = fetch_order_rows(args)
+        finally:
+            Config.SQUARE_LOCATION_ID = original_location_id
+            Config.SYNC_STATE_PATH = original_state_path
+            square_orders.client = original_client
+            square_orders.order_store = original_store
+            store.close()
+            server.shutdown()
+
+    assert (len({row.order_id for row in rows}) == 30 and empty_watermark.updated_at is None and
+            stored_watermark.updated_at == '2999-01-01T00:00:00Z'), (
+        f"{len(rows)} rows, watermarks {empty_watermark.updated_at} and {stored_watermark.updated_at}")
+    print("✓ incremental with empty store test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the local order store...")
+    print("=" * 60)
+
+    tests = [
+        test_store_round_trip,
+        test_rebuild_after_mapping_change,
+        test_parallel_rebuild,
+        test_indexed_queries,
+        test_location_filter,
+        test_fetch_streams_with_store,
+        test_incremental_with_empty_store,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Test file for rate_limit.py.
+This file checks retry, Retry-After and token bucket behaviour without network access.
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from square.core.api_error import ApiError
+
+import rate_limit
+from rate_limit import EndpointPolicy, TokenBucket, execute, get_retry_after, is_retryable
+
+
+def flaky_call(failures):
+    """Return a function that raises each error in failures in turn, then returns 'ok'"""
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return 'ok'
+
+    return call, calls
+
+
+def test_retry_after_and_backoff():
+    """Test that throttled calls are retried, honouring Retry-After"""
+    print("Testing retry with Retry-After...")
+
+    rate_limit.ENDPOINTS['test'] = EndpointPolicy('test', rate=None, burst=None, max_concurrency=1,
+                                                  max_retries=3, base_delay=0.001)
+    call, calls = flaky_call([
+        ApiError(status_code=429, headers={'retry-after': '0.05'}, body=None),
+        ApiError(status_code=503, body=None)
+    ])
+    try:
+        result = execute('test', call)
+        retries = rate_limit.ENDPOINTS['test'].retries
+    finally:
+        del rate_limit.ENDPOINTS['test']
+
+    waited = calls[1] - calls[0]
+
+    assert result == 'ok' and len(calls) == 3 and retries == 2 and waited >= 0.05, (
+        f"Result {result}, calls {len(calls)}, retries {retries}, waited {waited:.3f}s")
+    print("✓ retry with Retry-After test passed")
+
+
+def test_non_retryable_error():
+    """Test that client errors are raised without retrying"""
+    print("\nTesting non-retryable errors...")
+
+    rate_limit.ENDPOINTS['test'] = EndpointPolicy('test', rate=None, burst=None, max_concurrency=1,
+                                                  max_retries=3, base_delay=0.001)
+    call, calls = flaky_call([ApiError(status_code=400, body=None)])
+    raised = False
+    try:
+        execute('test', call)
+    except ApiError:
+        raised = True
+    finally:
+        del rate_limit.ENDPOINTS['test']
+
+    assert raised and len(calls) == 1 and is_retryable(ConnectionError()) and get_retry_after(ValueError()) is None, (
+        f"Raised {raised}, calls {len(calls)}")
+    print("✓ non-retryable error test passed")
+
+
+def test_token_bucket():
+    """Test that the token bucket allows a burst and then paces requests"""
+    print("\nTesting token bucket pacing...")
+
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # Two requests ride the burst, the other three wait 1/50s each
+    assert 0.05 <= elapsed < 0.5, f"Five requests took {elapsed:.3f}s"
+    print("✓ token bucket test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the shared rate limit and retry layer...")
+    print("=" * 60)
+
+    tests = [
+        test_retry_after_and_backoff,
+        test_non_retryable_error,
+        test_token_bucket,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Test file for response_capture.py.
+This file captures a sync against fake_api_server.py and checks that replaying the capture builds the same rows.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_square_data import (
+    mock_orders_response,
+    mock_orders_with_modifier_lists_response,
+    mock_catalog_modifiers_response,
+    mock_catalog_modifiers_with_list_response,
+    MockCatalogObject,
+    MockModifierListData
+)
+
+import square_orders
+from fake_api_server import FakeAPIState, server_url, start_server
+from response_capture import (
+    CATALOG_BATCH_GET,
+    ORDERS_SEARCH,
+    ResponseCapture,
+    iter_records,
+    load_captured_catalog
+)
+from square_orders import create_square_client, iter_order_pages, iter_order_rows, iter_replay_rows
+
+
+def test_capture_and_replay():
+    """Test that a captured sync replays to the same rows, without the throttled attempts"""
+    print("Testing capture and replay against the fake API server...")
+
+    catalog_objects = (
+        mock_catalog_modifiers_response.objects + mock_catalog_modifiers_with_list_response.objects + [
+            MockCatalogObject(
+                id="MODIFIER_LIST_1",
+                type="MODIFIER_LIST",
+                version=2,
+                modifier_list_data=MockModifierListData(name="Patrol: Eagle Patrol")
+            )
+        ]
+    )
+    state = FakeAPIState(
+        mock_orders_response.orders + mock_orders_with_modifier_lists_response.orders, catalog_objects,
+        throttle_rate=0.3, retry_after=0, seed=1
+    )
+    server = start_server(state)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'capture.bin')
+        original_client = square_orders.client
+        original_capture = square_orders.response_capture
+        # The capture hook is attached when the client is created
+        square_orders.response_capture = ResponseCapture(path)
+        square_orders.client = create_square_client(base_url=server_url(server), token='FAKE_TOKEN')
+        try:
+            live = list(iter_order_rows(iter_order_pages(page_size=2)))
+            records = square_orders.response_capture.records
+        finally:
+            square_orders.response_capture.close()
+            square_orders.response_capture = original_capture
+            square_orders.client = original_client
+            server.shutdown()
+
+        replayed = list(iter_replay_rows(path))
+        kinds = [kind for kind, _, _ in iter_records(path, {ORDERS_SEARCH, CATALOG_BATCH_GET})]
+        modifier_details, modifier_list_details = load_captured_catalog(path)
+
+    successful_calls = sum(state.requests.values()) - sum(state.faults.values())
+    assert (replayed == live and len(live) == 4 and records == successful_calls == len(kinds) and
+            kinds.count(ORDERS_SEARCH) == 2 and sum(state.faults.values()) > 0 and
+            ('MODIFIER_LIST_1' in {list_id for _, list_id in modifier_list_details}) and
+            live[-1].patrol == 'Eagle Patrol - Special Accommodation' and
+            'MODIFIER_1' in modifier_details), (
+        f"Live {live}\n"
+        f"Replayed {replayed}\n"
+        f"Records {records}, kinds {kinds}, requests {dict(state.requests)}, faults {dict(state.faults)}")
+    print("✓ capture and replay test passed")
+
+
+def test_capture_file_format():
+    """Test appending across runs, skipping and then dropping a truncated last record and rejecting other files"""
+    print("\nTesting the capture file format...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'capture.bin')
+        # Two runs append to the same file
+        for response in (b'{"orders": [{"id": "ORDER_1", "line_items": []}], "cursor": "1"}',
+                         b'{"orders": [{"id": "ORDER_2", "line_items": []}]}'):
+            capture = ResponseCapture(path)
+            capture.append(ORDERS_SEARCH, b'{"limit": 1}', response)
+            capture.close()
+        # An interrupted run leaves part of a record behind
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x05\x00\x00\x00\x40\x00\x00\x00{"lim')
+
+        records = list(iter_records(path, {ORDERS_SEARCH}))
+        order = records[0][2].orders[0]
+        # The next run cuts the partial record off before appending its own
+        capture = ResponseCapture(path)
+        capture.append(ORDERS_SEARCH, b'', b'{"orders": [{"id": "ORDER_3"}]}')
+        capture.close()
+        resumed = [r[2].orders[0].id for r in iter_records(path, {ORDERS_SEARCH})]
+
+        other_path = os.path.join(tmpdir, 'other.bin')
+        with open(other_path, 'wb') as f:
+            f.write(b'not a capture')
+        rejected = []
+        for open_capture in (lambda: ResponseCapture(other_path), lambda: list(iter_records(other_path, {1}))):
+            try:
+                open_capture()
+            except ValueError:
+                rejected.append(True)
+
+    assert (len(records) == 2 and [r[2].orders[0].id for r in records] == ['ORDER_1', 'ORDER_2'] and
+            records[0][1].limit == 1 and records[0][2].cursor == '1' and records[1][2].cursor is None and
+            order.total_money is None and order.line_items == [] and rejected == [True, True] and
+            resumed == ['ORDER_1', 'ORDER_2', 'ORDER_3']), f"Records {records}, rejected {rejected}, resumed {resumed}"
+    print("✓ capture file format test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for response capture and replay...")
+    print("=" * 60)
+
+    tests = [
+        test_capture_and_replay,
+        test_capture_file_format,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
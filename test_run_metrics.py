@@ -0,0 +1,117 @@
+"""
+Test file for run_metrics.py.
+This file checks the run report, the Prometheus textfile and the API call counters.
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from square.core.api_error import ApiError
+
+import rate_limit
+from rate_limit import EndpointPolicy, execute
+from run_metrics import RunMetrics, format_prometheus, metrics, write_json_report
+
+
+def test_run_report():
+    """Test that spans, counters and cache stats end up in the JSON report and textfile"""
+    print("Testing run report and Prometheus textfile...")
+
+    run = RunMetrics()
+    for _ in range(3):
+        with run.span('orders_search'):
+            pass
+    run.count_call('square.orders.search')
+    run.count_call('square.orders.search')
+    run.count_error('square.orders.search')
+    run.count_retry('square.orders.search')
+    run.add_bytes('square', sent=120, received=4000)
+    run.add_rows('rows_built', 42)
+    run.set_cache('catalog', hits=3, misses=1)
+    report = run.report()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'run_report.json')
+        write_json_report(path, report)
+        with open(path) as f:
+            written = json.load(f)
+
+    textfile = format_prometheus(report)
+
+    assert (written == report and report['status'] == 'ok' and
+            report['spans']['orders_search']['count'] == 3 and
+            report['api']['square.orders.search'] == {'calls': 2, 'errors': 1, 'retries': 1} and
+            report['bytes']['square'] == {'sent': 120, 'received': 4000} and
+            report['rows'] == {'rows_built': 42} and
+            report['caches']['catalog']['hit_rate'] == 0.75 and
+            'square_sync_api_calls{endpoint="square.orders.search"} 2' in textfile and
+            'square_sync_rows{stage="rows_built"} 42' in textfile and
+            'square_sync_last_run_success 1' in textfile and
+            textfile.count('# TYPE square_sync_span_seconds gauge') == 1), f"Report {report}\n{textfile}"
+    print("✓ run report test passed")
+
+
+def test_execute_counts_calls():
+    """Test that execute() counts every attempt, failure and retry per endpoint"""
+    print("\nTesting API call counters...")
+
+    rate_limit.ENDPOINTS['test'] = EndpointPolicy('test', rate=None, burst=None, max_concurrency=1,
+                                                  max_retries=3, base_delay=0.001)
+    failures = [ApiError(status_code=500, body=None)]
+
+    def call():
+        if failures:
+            raise failures.pop()
+        return 'ok'
+
+    metrics.reset()
+    try:
+        result = execute('test', call)
+        counts = metrics.report()['api']['test']
+    finally:
+        del rate_limit.ENDPOINTS['test']
+        metrics.reset()
+
+    assert result == 'ok' and counts == {'calls': 2, 'errors': 1, 'retries': 1}, f"Result {result}, counts {counts}"
+    print("✓ API call counter test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for the run metrics and report...")
+    print("=" * 60)
+
+    tests = [
+        test_run_report,
+        test_execute_counts_calls,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
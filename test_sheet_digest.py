@@ -0,0 +1,151 @@
+"""
+Test file for sheet_digest.py.
+This file checks row digests and that overwrites against fake_api_server.py skip unchanged rows.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the current directory to the Python path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from fake_api_server import FakeAPIState, server_url, start_server
+from google_sheets import SHEET_HEADERS, reset_sheets_service, write_to_google_sheet
+from order_row import OrderRow
+from run_metrics import metrics
+from sheet_digest import changed_row_runs, digest_key, digest_rows, load_digests, row_digest
+
+
+def make_rows(count, patrol='Eagle Patrol'):
+    return [OrderRow(f'ORDER_{number}', '15000 USD', 'Camp Registration', patrol=patrol) for number in range(count)]
+
+
+def test_changed_row_runs():
+    """Test that digests are stable and changed rows are grouped into contiguous runs"""
+    print("Testing changed_row_runs...")
+
+    old = digest_rows([['a', 'b'], ['c', 'd'], ['e', 'f'], ['g', 'h']])
+    new = digest_rows([['a', 'b'], ['c', 'X'], ['e', 'X'], ['g', 'h'], ['i', 'j'], ['k', 'l']])
+    runs = changed_row_runs(old['rows'], new['rows'])
+
+    assert (runs == [(1, 3), (4, 6)] and row_digest(['ab', 'c']) != row_digest(['a', 'bc']) and
+            digest_rows([['a', 'b']]) == digest_rows([('a', 'b')]) and old['table'] != new['table']), f"Runs {runs}"
+    print("✓ changed_row_runs test passed")
+
+
+def test_skip_unchanged_writes():
+    """Test that repeat overwrites send nothing and changed tables send only the changed rows"""
+    print("\nTesting digest-based overwrite skipping...")
+
+    state = FakeAPIState([], [])
+    server = start_server(state)
+
+    original_settings = (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON, Config.SHEET_DIGEST_PATH)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Config.SHEETS_API_ENDPOINT = server_url(server)
+        Config.GOOGLE_CREDENTIALS_JSON = ''
+        Config.SHEET_DIGEST_PATH = os.path.join(tmpdir, 'digests.json')
+        reset_sheets_service()
+        try:
+            writes = [write_to_google_sheet(make_rows(5), sheet_id='FAKE_SHEET', log_update=True)]
+            requests_after_first = sum(state.requests.values())
+            writes.append(write_to_google_sheet(make_rows(5), sheet_id='FAKE_SHEET', log_update=True))
+            requests_after_repeat = sum(state.requests.values())
+            timestamp_after_repeat = list(state.sheets['LastUpdate'])
+
+            # ORDER_1 changes and ORDER_4 goes away
+            rows = make_rows(4)
+            rows[1].patrol = 'Wolf Patrol'
+            state.requests.clear()
+            metrics.reset()
+            writes.append(write_to_google_sheet(rows, sheet_id='FAKE_SHEET', log_update=True))
+            # The changed row and the LastUpdate cell
+            rows_sent = metrics.report()['rows'].get('sheet_rows_written')
+        finally:
+            (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON, Config.SHEET_DIGEST_PATH) = original_settings
+            reset_sheets_service()
+            server.shutdown()
+
+    sheet = state.sheets['Sheet1']
+    assert (all(writes) and requests_after_first == 2 and requests_after_repeat == 2 and timestamp_after_repeat and
+            rows_sent == 2 and dict(state.requests) == {'sheets.get': 1, 'sheets.batchUpdate': 1} and
+            sheet[0] == SHEET_HEADERS and
+            [row[0] for row in sheet[1:]] == ['ORDER_0', 'ORDER_1', 'ORDER_2', 'ORDER_3'] and
+            sheet[2][5] == 'Wolf Patrol' and sheet[1][5] == 'Eagle Patrol'), (
+        f"Writes {writes}, requests {requests_after_first}/{requests_after_repeat} then {dict(state.requests)}, "
+        f"rows sent {rows_sent}\n"
+        f"Sheet {sheet}")
+    print("✓ digest-based overwrite skipping test passed")
+
+
+def test_upsert_drops_digest():
+    """Test that an upsert drops the tab's digest so the next overwrite rewrites it"""
+    print("\nTesting digest invalidation after an upsert...")
+
+    state = FakeAPIState([], [])
+    server = start_server(state)
+
+    original_settings = (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON, Config.SHEET_DIGEST_PATH)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Config.SHEETS_API_ENDPOINT = server_url(server)
+        Config.GOOGLE_CREDENTIALS_JSON = ''
+        Config.SHEET_DIGEST_PATH = os.path.join(tmpdir, 'digests.json')
+        reset_sheets_service()
+        try:
+            writes = [write_to_google_sheet(make_rows(3), sheet_id='FAKE_SHEET')]
+            saved_keys = list(load_digests(Config.SHEET_DIGEST_PATH))
+            writes.append(write_to_google_sheet(make_rows(3, patrol='Wolf Patrol'), sheet_id='FAKE_SHEET',
+                                                write_mode='upsert'))
+            keys_after_upsert = list(load_digests(Config.SHEET_DIGEST_PATH))
+            # The same rows as the first overwrite must still reach the sheet
+            writes.append(write_to_google_sheet(make_rows(3), sheet_id='FAKE_SHEET'))
+        finally:
+            (Config.SHEETS_API_ENDPOINT, Config.GOOGLE_CREDENTIALS_JSON, Config.SHEET_DIGEST_PATH) = original_settings
+            reset_sheets_service()
+            server.shutdown()
+
+    sheet = state.sheets['Sheet1']
+    assert (all(writes) and saved_keys == [digest_key('FAKE_SHEET', 'Sheet1')] and keys_after_upsert == [] and
+            [row[5] for row in sheet[1:]] == ['Eagle Patrol'] * 3), (
+        f"Writes {writes}, digests {saved_keys} then {keys_after_upsert}\n"
+        f"Sheet {sheet}")
+    print("✓ digest invalidation after upsert test passed")
+
+
+def main():
+    """Run all tests"""
+    print("Running tests for sheet digests...")
+    print("=" * 60)
+
+    tests = [
+        test_changed_row_runs,
+        test_skip_unchanged_writes,
+        test_upsert_drops_digest,
+    ]
+    test_results = []
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
+
+    print("\n" + "=" * 60)
+    print("Test Summary:")
+    passed_tests = sum(test_results)
+    total_tests = len(test_results)
+    print(f"Passed: {passed_tests}/{total_tests}")
+
+    if passed_tests == total_tests:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+    return passed_tests == total_tests
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,17 @@ Test file for square_orders.py using mock data.
 This file demonstrates how to test the Square API integration code without making actual API calls.
 """
 
+import argparse
+import asyncio
+import contextlib
+import io
 import sys
 import os
+import subprocess
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
 
 # Add the current directory to the Python path so we can import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -16,15 +25,43 @@ from mock_square_data import (
     get_mock_catalog_modifier_lists_response,
     mock_catalog_modifiers_response,
     mock_catalog_modifier_lists_response,
-    mock_orders_with_refund_response
+    mock_orders_with_refund_response,
+    mock_orders_with_modifier_lists_response,
+    mock_catalog_modifiers_with_list_response,
+    MockCatalogObject,
+    MockLineItem,
+    MockModifier,
+    MockMoney,
+    MockOrder,
+    MockModifierData,
+    MockModifierListData,
+    MockSquareClient,
+    MockAsyncSquareClient
 )
 
 # Import the functions we want to test
+import square_orders
+from catalog_cache import CatalogCache
+from sync_state import Watermark, load_watermark, save_watermark
+from async_pipeline import collect_order_rows
+from modifier_mapping import load_modifier_mapper
+from order_row import OUTPUT_HEADERS, OrderRow
 from square_orders import (
     extract_modifier_list_ids,
     get_modifier_details,
     get_modifier_list_details,
-    extract_order_data
+    extract_order_data,
+    iter_order_pages,
+    iter_order_rows,
+    prefetch_modifier_list_details,
+    build_updated_since_query,
+    iter_changed_order_pages,
+    iter_location_order_pages,
+    save_incremental_watermark,
+    resolve_catalog_objects,
+    trim_modifier_details,
+    write_csv_to_stdout,
+    write_output
 )
 
 def test_extract_modifier_list_ids():
@@ -43,14 +80,10 @@ def test_extract_modifier_list_ids():
     # Verify we got the expected results
     expected_catalog_versions = {1: ['MODIFIER_1', 'MODIFIER_2', 'MODIFIER_3', 'MODIFIER_4', 'MODIFIER_5', 'MODIFIER_6', 'MODIFIER_7']}
     
-    if catalog_versions_dict == expected_catalog_versions:
-        print("✓ extract_modifier_list_ids test passed")
-        return True
-    else:
-        print("✗ extract_modifier_list_ids test failed")
-        print(f"Expected: {expected_catalog_versions}")
-        print(f"Got: {catalog_versions_dict}")
-        return False
+    assert catalog_versions_dict == expected_catalog_versions, (
+        f"Expected: {expected_catalog_versions}\n"
+        f"Got: {catalog_versions_dict}")
+    print("✓ extract_modifier_list_ids test passed")
 
 def test_get_modifier_details():
     """Test the get_modifier_details function with mock data"""
@@ -70,13 +103,9 @@ def test_get_modifier_details():
     print(f"Modifier details keys: {list(modifier_details.keys())}")
     
     # Verify we have the expected number of modifier details
-    if len(modifier_details) == 7:  # We have 7 mock modifiers
-        print("✓ get_modifier_details test passed")
-        return True
-    else:
-        print("✗ get_modifier_details test failed")
-        print(f"Expected 7 modifier details, got {len(modifier_details)}")
-        return False
+    # We have 7 mock modifiers
+    assert len(modifier_details) == 7, f"Expected 7 modifier details, got {len(modifier_details)}"
+    print("✓ get_modifier_details test passed")
 
 def test_extract_order_data():
     """Test the extract_order_data function with mock data"""
@@ -104,13 +133,8 @@ def test_extract_order_data():
     
     # Verify we have the expected number of rows (3 orders, but some have multiple line items)
     # In our mock data, each order has 1 line item, so we should have 3 rows
-    if len(order_data) == 3:
-        print("✓ extract_order_data test passed")
-        return True
-    else:
-        print("✗ extract_order_data test failed")
-        print(f"Expected 3 order data rows, got {len(order_data)}")
-        return False
+    assert len(order_data) == 3, f"Expected 3 order data rows, got {len(order_data)}"
+    print("✓ extract_order_data test passed")
 
 def test_refunded_order():
     """Test that refunded orders with None total_money are handled gracefully"""
@@ -132,16 +156,484 @@ def test_refunded_order():
     # Find the refunded order row
     refunded_rows = [r for r in order_data if r['order_id'] == 'ORDER_REFUNDED']
 
-    if len(refunded_rows) == 1 and refunded_rows[0]['total_money'] == '0 USD':
-        print("✓ refunded order test passed (total_money handled as '0 USD')")
-        return True
-    else:
-        print("✗ refunded order test failed")
-        if refunded_rows:
-            print(f"Got total_money: {refunded_rows[0]['total_money']}")
-        else:
-            print("No refunded order row found")
-        return False
+    assert len(refunded_rows) == 1, "No refunded order row found"
+    assert refunded_rows[0]['total_money'] == '0 USD', f"Got total_money: {refunded_rows[0]['total_money']}"
+    print("✓ refunded order test passed (total_money handled as '0 USD')")
+
+def test_iter_order_pages():
+    """Test that iter_order_pages follows the cursor until the last page"""
+    print("\nTesting iter_order_pages cursor pagination...")
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(page_size=2)
+    try:
+        pages = list(iter_order_pages(page_size=2))
+        calls = square_orders.client.orders.calls
+    finally:
+        square_orders.client = original_client
+
+    page_sizes = [len(page) for page in pages]
+    cursors = [call['cursor'] for call in calls]
+
+    assert page_sizes == [2, 1] and cursors == [None, '2'], f"Got page sizes {page_sizes} and cursors {cursors}"
+    print("✓ iter_order_pages test passed")
+
+class SearchFailure(Exception):
+    """A non-retryable orders.search error"""
+    status_code = 400
+
+def failing_search(search, fail_at_cursor):
+    """Wrap a mock orders.search so the request for fail_at_cursor fails"""
+    def call(**kwargs):
+        if kwargs.get('cursor') == fail_at_cursor:
+            raise SearchFailure("Bad request")
+        return search(**kwargs)
+    return call
+
+def test_search_failure_fails_run():
+    """Test that a search failing after the first page raises instead of ending the order stream early"""
+    print("\nTesting a failed search after the first page...")
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(page_size=1)
+    square_orders.client.orders.search = failing_search(square_orders.client.orders.search, '2')
+    pages = []
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            for page in iter_order_pages(page_size=1):
+                pages.append(page)
+        sync_raised = False
+    except SearchFailure:
+        sync_raised = True
+    finally:
+        square_orders.client = original_client
+
+    async_client = MockAsyncSquareClient(page_size=1)
+    search = MockAsyncSquareClient(page_size=1).orders.search
+
+    async def search_or_fail(**kwargs):
+        if kwargs.get('cursor') == '2':
+            raise SearchFailure("Bad request")
+        return await search(**kwargs)
+
+    async_client.orders.search = search_or_fail
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            asyncio.run(collect_order_rows(async_client, page_size=1))
+        async_raised = False
+    except SearchFailure:
+        async_raised = True
+
+    assert sync_raised and async_raised and len(pages) == 2, (
+        f"Sync raised {sync_raised} after {len(pages)} pages, async raised {async_raised}")
+    print("✓ failed search test passed")
+
+def test_iter_order_rows():
+    """Test that iter_order_rows streams rows and only resolves new modifiers per page"""
+    print("\nTesting iter_order_rows streaming...")
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(page_size=1)
+    try:
+        order_data = list(iter_order_rows(iter_order_pages(page_size=1)))
+        catalog_calls = square_orders.client.catalog.calls
+    finally:
+        square_orders.client = original_client
+
+    requested_ids = [object_id for call in catalog_calls for object_id in call['object_ids']]
+    expected_order_ids = ['ORDER_1', 'ORDER_2', 'ORDER_3']
+
+    assert ([row['order_id'] for row in order_data] == expected_order_ids and
+            len(requested_ids) == len(set(requested_ids)) and
+            order_data[0]['rank'] == 'Tenderfoot'), f"Got rows {order_data} and catalog calls {catalog_calls}"
+    print("✓ iter_order_rows test passed")
+
+def test_prefetch_modifier_list_details():
+    """Test that modifier lists are resolved in one batch and the transform makes no calls"""
+    print("\nTesting prefetch_modifier_list_details batching...")
+
+    # Two orders referencing the same modifier list at the same catalog version
+    orders = mock_orders_with_modifier_lists_response.orders * 2
+    modifier_details = {obj.id: obj for obj in mock_catalog_modifiers_with_list_response.objects}
+    modifier_list = MockCatalogObject(
+        id="MODIFIER_LIST_1",
+        type="MODIFIER_LIST",
+        version=2,
+        modifier_list_data=MockModifierListData(name="Patrol: Eagle Patrol")
+    )
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(catalog_objects=[modifier_list])
+    try:
+        modifier_list_details = prefetch_modifier_list_details(orders, modifier_details)
+        prefetch_calls = list(square_orders.client.catalog.calls)
+        order_data = extract_order_data(orders, modifier_details, modifier_list_details)
+        transform_calls = square_orders.client.catalog.calls[len(prefetch_calls):]
+    finally:
+        square_orders.client = original_client
+
+    expected_calls = [{'object_ids': ['MODIFIER_LIST_1'], 'catalog_version': 2}]
+
+    assert (prefetch_calls == expected_calls and not transform_calls and
+            list(modifier_list_details) == [(2, 'MODIFIER_LIST_1')] and
+            order_data[0]['patrol'] == 'Eagle Patrol - Special Accommodation'), (
+        f"Prefetch calls: {prefetch_calls}, transform calls: {transform_calls}")
+    print("✓ prefetch_modifier_list_details test passed")
+
+def test_catalog_cache():
+    """Test that a warm catalog cache answers get_modifier_details without API calls"""
+    print("\nTesting persistent catalog cache...")
+
+    catalog_versions_dict = {1: ['MODIFIER_1', 'MODIFIER_2', 'MODIFIER_3']}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_path = os.path.join(tmpdir, 'catalog.sqlite')
+        original_client = square_orders.client
+        original_cache = square_orders.catalog_cache
+        try:
+            # Cold run populates the cache
+            square_orders.client = MockSquareClient()
+            square_orders.catalog_cache = CatalogCache(cache_path)
+            get_modifier_details(catalog_versions_dict)
+            cold_calls = len(square_orders.client.catalog.calls)
+            square_orders.catalog_cache.close()
+
+            # Warm run in a fresh process-like state reads it back
+            square_orders.client = MockSquareClient()
+            square_orders.catalog_cache = CatalogCache(cache_path)
+            modifier_details = get_modifier_details(catalog_versions_dict)
+            warm_calls = len(square_orders.client.catalog.calls)
+            hits = square_orders.catalog_cache.hits
+            square_orders.catalog_cache.close()
+
+            # A tiny cache evicts down to its size limit
+            small_cache = CatalogCache(os.path.join(tmpdir, 'small.sqlite'), max_bytes=200)
+            small_cache.put_many(1, mock_catalog_modifiers_response.objects)
+            small_size = small_cache.size()
+            small_cache.close()
+        finally:
+            square_orders.client = original_client
+            square_orders.catalog_cache = original_cache
+
+    assert (cold_calls == 1 and warm_calls == 0 and hits == 3 and
+            modifier_details['MODIFIER_2'].modifier_data.name == 'Rank: Tenderfoot' and
+            small_size <= 200), (
+        f"Cold calls {cold_calls}, warm calls {warm_calls}, hits {hits}, small cache size {small_size}")
+    print("✓ catalog cache test passed")
+
+def test_incremental_watermark():
+    """Test that incremental sync skips orders already seen at the watermark"""
+    print("\nTesting incremental sync watermark...")
+
+    watermark = Watermark('2025-06-01T10:00:00Z', ['ORDER_A'])
+    next_watermark = Watermark(watermark.updated_at, watermark.order_ids)
+    pages = [
+        [
+            MockOrder('ORDER_A', MockMoney(100, 'USD'), updated_at='2025-06-01T10:00:00Z'),
+            MockOrder('ORDER_B', MockMoney(100, 'USD'), updated_at='2025-06-01T10:00:00Z')
+        ],
+        [
+            MockOrder('ORDER_C', MockMoney(100, 'USD'), updated_at='2025-06-01T11:00:00Z')
+        ]
+    ]
+
+    changed = [order.id for page in iter_changed_order_pages(pages, watermark, next_watermark) for order in page]
+    query = build_updated_since_query(watermark.updated_at)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        state_path = os.path.join(tmpdir, 'state.json')
+        save_watermark(state_path, next_watermark)
+        reloaded = load_watermark(state_path)
+
+    assert (changed == ['ORDER_B', 'ORDER_C'] and
+            reloaded.to_dict() == {'updated_at': '2025-06-01T11:00:00Z', 'order_ids': ['ORDER_C']} and
+            query['filter']['date_time_filter']['updated_at']['start_at'] == '2025-06-01T10:00:00Z' and
+            query['sort']['sort_field'] == 'UPDATED_AT'), (
+        f"Changed orders {changed}, reloaded watermark {reloaded.to_dict()}")
+    print("✓ incremental watermark test passed")
+
+def test_watermark_needs_every_location():
+    """Test that the watermark is not saved when one location's orders were not fetched to the end"""
+    print("\nTesting the watermark with a location stopped early...")
+
+    original_client = square_orders.client
+    original_location_id = square_orders.Config.SQUARE_LOCATION_ID
+    original_state_path = square_orders.Config.SYNC_STATE_PATH
+    square_orders.client = MockSquareClient(page_size=1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        square_orders.Config.SQUARE_LOCATION_ID = 'LOC_A,LOC_B'
+        square_orders.Config.SYNC_STATE_PATH = os.path.join(tmpdir, 'state.json')
+        next_watermark = Watermark()
+        try:
+            square_orders.completed_locations.clear()
+            # The consumer stops after the first page, as when a run is interrupted
+            pages = iter_location_order_pages(['LOC_A', 'LOC_B'], page_size=1)
+            for order in next(pages):
+                next_watermark.advance(order)
+            pages.close()
+            try:
+                save_incremental_watermark(next_watermark)
+                refused = False
+            except RuntimeError:
+                refused = True
+            saved_early = os.path.exists(square_orders.Config.SYNC_STATE_PATH)
+
+            square_orders.completed_locations.clear()
+            for page in iter_location_order_pages(['LOC_A', 'LOC_B'], page_size=1):
+                for order in page:
+                    next_watermark.advance(order)
+            save_incremental_watermark(next_watermark)
+            saved = os.path.exists(square_orders.Config.SYNC_STATE_PATH)
+        finally:
+            square_orders.client = original_client
+            square_orders.Config.SQUARE_LOCATION_ID = original_location_id
+            square_orders.Config.SYNC_STATE_PATH = original_state_path
+            square_orders.completed_locations.clear()
+
+    assert refused and not saved_early and saved, (
+        f"Refused {refused}, saved early {saved_early}, saved after a full fetch {saved}")
+    print("✓ watermark location test passed")
+
+def test_concurrent_catalog_resolution():
+    """Test that catalog chunks run in parallel and merge in a deterministic order"""
+    print("\nTesting concurrent catalog resolution...")
+
+    class SlowCatalogClient(MockSquareClient):
+        def __init__(self):
+            super().__init__()
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.lock = threading.Lock()
+            batch_get = self.catalog.batch_get
+
+            def slow_batch_get(**kwargs):
+                with self.lock:
+                    self.in_flight += 1
+                    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                time.sleep(0.02)
+                with self.lock:
+                    self.in_flight -= 1
+                return batch_get(**kwargs)
+
+            self.catalog.batch_get = slow_batch_get
+
+    catalog_versions_dict = {
+        1: ['MODIFIER_1', 'MODIFIER_2', 'MODIFIER_3', 'MODIFIER_4', 'MODIFIER_5'],
+        2: ['MODIFIER_6', 'MODIFIER_7']
+    }
+
+    original_client = square_orders.client
+    original_limit = square_orders.CATALOG_BATCH_LIMIT
+    square_orders.client = SlowCatalogClient()
+    square_orders.CATALOG_BATCH_LIMIT = 2
+    try:
+        resolved = resolve_catalog_objects(catalog_versions_dict, max_workers=2)
+        calls = len(square_orders.client.catalog.calls)
+        max_in_flight = square_orders.client.max_in_flight
+    finally:
+        square_orders.client = original_client
+        square_orders.CATALOG_BATCH_LIMIT = original_limit
+
+    assert (calls == 4 and max_in_flight == 2 and
+            list(resolved[1]) == catalog_versions_dict[1] and
+            list(resolved[2]) == catalog_versions_dict[2]), (
+        f"Calls {calls}, max in flight {max_in_flight}, resolved {resolved}")
+    print("✓ concurrent catalog resolution test passed")
+
+def test_async_pipeline():
+    """Test that the asyncio pipeline produces the same rows as the synchronous one"""
+    print("\nTesting asyncio pipeline...")
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(page_size=1)
+    try:
+        expected = list(iter_order_rows(iter_order_pages(page_size=1)))
+    finally:
+        square_orders.client = original_client
+
+    async_client = MockAsyncSquareClient(page_size=1)
+    order_data = asyncio.run(collect_order_rows(async_client, page_size=1))
+
+    assert order_data == expected and len(async_client.orders.calls) == 3, f"Expected {expected}, got {order_data}"
+    print("✓ asyncio pipeline test passed")
+
+def test_modifier_rules_from_config():
+    """Test that modifier-to-column rules can be loaded from a JSON file"""
+    print("\nTesting modifier rules loaded from config...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        rules_path = os.path.join(tmpdir, 'rules.json')
+        with open(rules_path, 'w') as f:
+            f.write('{"columns": {"Youth Name": "scout_name", "Patrol": "patrol"}}')
+        mapper = load_modifier_mapper(rules_path)
+
+    orders = [MockOrder('ORDER_X', MockMoney(100, 'USD'), line_items=[
+        make_line_item([
+            ('Youth Name: Sam Lee', 'MOD_X_1'),
+            ('patrol :  Hawk Patrol', 'MOD_X_2'),
+            ('Rank', 'MOD_X_3')
+        ])
+    ])]
+    order_data = extract_order_data(orders, {}, {}, mapper=mapper)
+    row = order_data[0]
+
+    assert row['scout_name'] == 'Sam Lee' and row['patrol'] == 'Hawk Patrol' and row['rank'] == '', f"Got row {row}"
+    print("✓ modifier rules from config test passed")
+
+def test_mapping_caches_are_bounded():
+    """Test that the mapper's parse caches stay bounded however many distinct free-text answers it sees"""
+    print("\nTesting bounded modifier mapping caches...")
+
+    import modifier_mapping
+
+    original_max = modifier_mapping.MAPPING_CACHE_MAX
+    modifier_mapping.MAPPING_CACHE_MAX = 100
+    try:
+        mapper = load_modifier_mapper()
+        for number in range(1000):
+            mapper.map_modifier('Rank: Scout')
+            mapper.map_modifier(f'Scout Name: Scout {number}')
+            mapper.map_list_modifier('Patrol', 'Eagle Patrol')
+            mapper.map_list_modifier('Emergency Contact', f'Parent {number}')
+        sizes = (len(mapper._modifier_cache), len(mapper._list_cache))
+        mappings = (mapper.map_modifier('Rank: Scout'), mapper.map_modifier('Scout Name: Scout 3'),
+                    mapper.map_list_modifier('Patrol', 'Eagle Patrol'))
+    finally:
+        modifier_mapping.MAPPING_CACHE_MAX = original_max
+
+    # The shared answers are used on every order, so they stay cached
+    assert (sizes == (100, 100) and 'Rank: Scout' in mapper._modifier_cache and
+            mappings == (('rank', 'Scout'), ('scout_name', 'Scout 3'), ('patrol', 'Eagle Patrol'))), (
+        f"Cache sizes {sizes}, mappings {mappings}")
+    print("✓ bounded mapping caches test passed")
+
+def test_csv_output_schema():
+    """Test that CSV output merges names and defaults the patrol from compact rows"""
+    print("\nTesting CSV output from compact rows...")
+
+    rows = [
+        OrderRow('ORDER_1', '15000 USD', 'Camp Registration', scout_name='John Smith', patrol='Eagle Patrol'),
+        OrderRow('ORDER_2', '15000 USD', 'Camp Registration', scouter_name='Pat Jones')
+    ]
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        write_csv_to_stdout(iter(rows))
+    lines = buffer.getvalue().splitlines()
+
+    assert (lines[0].split(',') == OUTPUT_HEADERS and
+            lines[1] == 'ORDER_1,15000 USD,Camp Registration,John Smith,,Eagle Patrol,,,,' and
+            lines[2] == 'ORDER_2,15000 USD,Camp Registration,Pat Jones,,Rocking Chair,,,,' and
+            rows[1]['scouter_name'] == 'Pat Jones'), f"Got lines {lines}"
+    print("✓ CSV output schema test passed")
+
+def test_diagnostics_stay_off_stdout():
+    """Test that catalog errors during a streamed CSV export go to stderr, not into the CSV"""
+    print("\nTesting diagnostics during a CSV export to stdout...")
+
+    def failing_batch_get(**kwargs):
+        raise SearchFailure("Bad request")
+
+    original_client = square_orders.client
+    square_orders.client = MockSquareClient(page_size=1)
+    square_orders.client.catalog.batch_get = failing_batch_get
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            write_csv_to_stdout(iter_order_rows(iter_order_pages(page_size=1)))
+    finally:
+        square_orders.client = original_client
+
+    lines = stdout.getvalue().splitlines()
+    assert (lines[0] == ','.join(OUTPUT_HEADERS) and len(lines) == 4 and
+            all(line.startswith('ORDER_') for line in lines[1:]) and 'Error fetching' in stderr.getvalue()), (
+        f"stdout {lines}, stderr {stderr.getvalue()!r}")
+    print("✓ diagnostics test passed")
+
+def test_trim_modifier_details():
+    """Test that one-off modifiers are dropped between pages once over the limit"""
+    print("\nTesting trim_modifier_details...")
+
+    def modifier(object_id, modifier_list_id=None):
+        return MockCatalogObject(id=object_id, type='MODIFIER', version=1,
+                                 modifier_data=MockModifierData(name=object_id, modifier_list_id=modifier_list_id))
+
+    modifier_details = {object_id: modifier(object_id) for object_id in ['TEXT_1', 'TEXT_2', 'TEXT_3']}
+    modifier_details['RANK_1'] = modifier('RANK_1', 'LIST_RANK')
+
+    trim_modifier_details(modifier_details, max_entries=4)
+    untrimmed = len(modifier_details)
+    trim_modifier_details(modifier_details, max_entries=3)
+
+    assert untrimmed == 4 and list(modifier_details) == ['RANK_1'], (
+        f"Untrimmed {untrimmed}, kept {list(modifier_details)}")
+    print("✓ trim_modifier_details test passed")
+
+def test_lazy_sdk_imports():
+    """Test that importing the pipeline modules loads no SDK or client until one is used"""
+    print("\nTesting lazy SDK imports...")
+
+    code = (
+        "import sys, square_orders, google_sheets, async_pipeline; "
+        "print(' '.join(name for name in ['square', 'googleapiclient', 'google.oauth2', 'httpx'] "
+        "if name in sys.modules), square_orders.client)"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+
+    assert result.returncode == 0 and result.stdout.split() == ['None'], (
+        f"Got {result.stdout!r} {result.stderr[-500:]!r}")
+    print("✓ lazy SDK imports test passed")
+
+def test_sheet_write_mode():
+    """Test that every Sheets path gets WRITE_MODE, with append overwritten while the store feeds the full table"""
+    print("\nTesting the Sheets write mode...")
+
+    import google_sheets
+
+    writes = []
+    original = (google_sheets.write_to_google_sheet, google_sheets.write_tabs_to_google_sheet,
+                square_orders.order_store, square_orders.location_routes, square_orders.order_locations,
+                square_orders.Config.WRITE_MODE)
+    google_sheets.write_to_google_sheet = lambda data, write_mode=None, **kwargs: writes.append(write_mode) or True
+    google_sheets.write_tabs_to_google_sheet = (
+        lambda tab_data, sheet_id, write_mode, **kwargs: writes.append(write_mode) or True
+    )
+    rows = [OrderRow('ORDER_1', '100 USD', 'Camp', *[''] * (len(OUTPUT_HEADERS) - 3))]
+    store = SimpleNamespace(order_locations=lambda location_ids=None: {'ORDER_1': 'LOC_A'})
+    routes = {'LOC_A': ('SHEET_A', 'Tab A')}
+    args = argparse.Namespace(output='sheets', incremental=False, use_async=False)
+    try:
+        square_orders.Config.WRITE_MODE = 'append'
+        for open_store, routed in ((None, None), (None, routes), (store, None), (store, routes)):
+            square_orders.order_store = open_store
+            square_orders.location_routes = routed
+            square_orders.order_locations = {'ORDER_1': 'LOC_A'}
+            with contextlib.redirect_stderr(io.StringIO()):
+                write_output(args, iter(rows))
+        square_orders.order_store = None
+        square_orders.location_routes = None
+        write_output(argparse.Namespace(output='sheets', incremental=True, use_async=False), iter(rows))
+    finally:
+        (google_sheets.write_to_google_sheet, google_sheets.write_tabs_to_google_sheet,
+         square_orders.order_store, square_orders.location_routes, square_orders.order_locations,
+         square_orders.Config.WRITE_MODE) = original
+
+    assert writes == ['append', 'append', 'overwrite', 'overwrite', 'upsert'], f"Write modes {writes}"
+    print("✓ Sheets write mode test passed")
+
+def make_line_item(modifiers):
+    """Build a mock line item from (modifier name, catalog object ID) pairs"""
+    return MockLineItem(
+        uid='LINE_ITEM_X',
+        name='Camp Registration',
+        catalog_object_id='CATALOG_ITEM_1',
+        catalog_version=1,
+        variation_name='Basic Registration',
+        modifiers=[MockModifier(f'UID_{object_id}', name, object_id) for name, object_id in modifiers]
+    )
 
 def test_with_modifier_lists():
     """Test with orders that have modifier lists"""
@@ -155,8 +647,6 @@ def test_with_modifier_lists():
     
     print("This test demonstrates how you would test with modifier lists")
     print("In a real test environment, you would mock the API calls to return the appropriate responses")
-    
-    return True
 
 def main():
     """Run all tests"""
@@ -164,12 +654,37 @@ def main():
     print("=" * 60)
     
     # Run individual tests
+    tests = [
+        test_extract_modifier_list_ids,
+        test_get_modifier_details,
+        test_extract_order_data,
+        test_refunded_order,
+        test_iter_order_pages,
+        test_search_failure_fails_run,
+        test_iter_order_rows,
+        test_prefetch_modifier_list_details,
+        test_catalog_cache,
+        test_incremental_watermark,
+        test_watermark_needs_every_location,
+        test_concurrent_catalog_resolution,
+        test_async_pipeline,
+        test_modifier_rules_from_config,
+        test_mapping_caches_are_bounded,
+        test_csv_output_schema,
+        test_diagnostics_stay_off_stdout,
+        test_trim_modifier_details,
+        test_lazy_sdk_imports,
+        test_sheet_write_mode,
+        test_with_modifier_lists,
+    ]
     test_results = []
-    test_results.append(test_extract_modifier_list_ids())
-    test_results.append(test_get_modifier_details())
-    test_results.append(test_extract_order_data())
-    test_results.append(test_refunded_order())
-    test_results.append(test_with_modifier_lists())
+    for test in tests:
+        try:
+            test()
+            test_results.append(True)
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            test_results.append(False)
     
     # Summary
     print("\n" + "=" * 60)